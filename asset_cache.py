@@ -0,0 +1,158 @@
+#! /usr/bin/env python3
+""" Load every image once, keep scaled copies of it and store the scaled pixels on disk so later
+startups don't have to decode and scale the images again. Run this file to time a cold and a warm
+startup. """
+
+import hashlib
+import os
+import struct
+import time
+
+import pygame
+
+from config import *
+
+# Magic bytes, source modification time, width, height and pixel format of a cached image.
+HEADER = struct.Struct("<4sqHH4s")
+MAGIC = b"PGAC"
+
+# Pygame 2.1.3 renamed tostring and fromstring to tobytes and frombytes.
+to_bytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+from_bytes = getattr(pygame.image, "frombytes", None) or pygame.image.fromstring
+
+class AssetCache:
+    """ Decodes each image file once and keeps every scaled copy of it by path and size. Scaled
+    copies are written to the cache directory and reused by later startups as long as the image
+    file hasn't been modified since. Images are converted to the pixel format of the screen if
+    there is one so drawing them doesn't need a conversion. """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.images = dict()
+        self.scaled = dict()
+
+    def load(self, path):
+        """ Return the decoded image, decoding it only the first time. """
+
+        if path not in self.images:
+            self.images[path] = pygame.image.load(path)
+
+        return self.images[path]
+
+    def get(self, path, size):
+        """ Return the image scaled to the size. """
+
+        key = (path, size)
+        if key not in self.scaled:
+            surface = self.read(path, size)
+            if surface is None:
+                surface = pygame.transform.scale(self.load(path), size)
+                self.write(path, size, surface)
+            self.scaled[key] = self.convert(surface)
+
+        return self.scaled[key]
+
+    def convert(self, surface):
+        """ Convert the surface to the pixel format of the screen, keeping transparency if it has any. """
+
+        if pygame.display.get_surface() is None:
+            return surface
+
+        if surface.get_flags() & pygame.SRCALPHA:
+            return surface.convert_alpha()
+
+        return surface.convert()
+
+    def cache_path(self, path, size):
+        """ Return where the scaled image is stored in the cache directory. The name has a short hash of
+        the image's full path so images with the same file name in different directories don't share it. """
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = hashlib.sha1(os.path.normcase(os.path.abspath(path)).encode()).hexdigest()[:8]
+        return os.path.join(self.cache_dir, "{}_{}_{}x{}.raw".format(name, digest, size[0], size[1]))
+
+    def read(self, path, size):
+        """ Return the scaled image from the cache directory or None if it isn't there or is older than the image file. """
+
+        if not self.cache_dir:
+            return None
+
+        try:
+            with open(self.cache_path(path, size), "rb") as cache_file:
+                data = cache_file.read()
+        except OSError:
+            return None
+
+        if len(data) < HEADER.size:
+            return None
+
+        magic, modified, width, height, pixel_format = HEADER.unpack_from(data)
+        if magic != MAGIC or modified != os.stat(path).st_mtime_ns or (width, height) != tuple(size):
+            return None
+
+        pixel_format = pixel_format.rstrip(b"_").decode()
+        pixels = data[HEADER.size:]
+        if len(pixels) != width * height * len(pixel_format):
+            return None
+
+        return from_bytes(pixels, (width, height), pixel_format)
+
+    def write(self, path, size, surface):
+        """ Store the scaled image in the cache directory along with the image file's modification time. """
+
+        if not self.cache_dir:
+            return
+
+        pixel_format = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+        header = HEADER.pack(MAGIC, os.stat(path).st_mtime_ns, size[0], size[1], pixel_format.ljust(4, "_").encode())
+
+        # Write to a temporary file first so a half written file is never read.
+        cache_path = self.cache_path(path, size)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_path + ".tmp", "wb") as cache_file:
+                cache_file.write(header)
+                cache_file.write(to_bytes(surface, pixel_format))
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """ Forget every loaded image and delete the cache directory's images. """
+
+        self.images.clear()
+        self.scaled.clear()
+
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".raw"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+def main():
+    import display
+
+    pygame.init()
+    pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+
+    # Cold startup: nothing in memory and nothing on disk.
+    AssetCache().clear()
+    start = time.perf_counter()
+    display.load_assets(AssetCache())
+    cold = time.perf_counter() - start
+
+    # Warm startup: nothing in memory but the scaled images are on disk.
+    start = time.perf_counter()
+    display.load_assets(AssetCache())
+    warm = time.perf_counter() - start
+
+    # Loading without the disk cache, like before the cache existed.
+    start = time.perf_counter()
+    display.load_assets(AssetCache(""))
+    uncached = time.perf_counter() - start
+
+    print("cold: {:.2f} ms".format(cold * 1000))
+    print("warm: {:.2f} ms".format(warm * 1000))
+    print("no disk cache: {:.2f} ms".format(uncached * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#! /usr/bin/env python3
+""" Time the enemy update, projectile movement, projectile collision, enemy projectiles and screen drawing
+for worlds with different numbers of enemies, projectiles, dead enemies and enemy projectiles. Results are written as JSON so they
+can be compared between commits, along with how each subsystem scales with the number of enemies.
+Capturing and restoring the whole state of the world is timed as well. With loopback clients, the
+time the server takes to send them snapshots and how big the snapshots are is measured too, and
+with --idle, how much CPU the menu uses while it waits for input. With --rollback, capturing a world
+and restoring it after it has run on for a few ticks is checked against ROLLBACK_BUDGET. """
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import pygame
+
+from config import *
+import camera
+import client
+import controls
+import display
+import hud
+import projectile
+import render
+import server
+import world
+
+# Most milliseconds capturing the world and restoring it a few ticks later may take together, a quarter
+# of a tick at 60 ticks a second, so a tick can still be simulated again in the same frame.
+ROLLBACK_BUDGET = 4.0
+
+class OffscreenUpdate:
+    """ Stands in for dirty rect tracking so draw_screen doesn't update a window. """
+
+    def update(self, rects, camera):
+        pass
+
+def populate(world_obj, enemy_count, projectile_count, dead_count, bullet_count=0):
+    """ Top up the world to the number of enemies, projectiles, dead enemies and enemy projectiles.
+    Enemies are placed anywhere in the map since thousands of them can't fit without overlapping. """
+
+    rng = world_obj.rng
+    enemy_handler = world_obj.enemy_handler
+    player_obj = world_obj.player
+    map_obj = world_obj.map
+
+    while len(enemy_handler.enemies) < enemy_count:
+        enemy_handler.add_enemy(rng.uniform(map_obj.left, map_obj.right - ENEMY_SIZE),
+                                rng.uniform(map_obj.top, map_obj.bottom - ENEMY_SIZE))
+
+    while len(player_obj.projectiles) < projectile_count:
+        player_obj.projectiles.spawn(player_obj.projectile_sprite,
+            rng.uniform(map_obj.left, map_obj.right), rng.uniform(map_obj.top, map_obj.bottom),
+            rng.uniform(-math.pi, math.pi))
+
+    while len(enemy_handler.dead_enemies) < dead_count:
+        enemy_handler.add_dead_enemy(rng.uniform(map_obj.left, map_obj.right - ENEMY_SIZE),
+            rng.uniform(map_obj.top, map_obj.bottom - ENEMY_SIZE), rng.uniform(-math.pi, math.pi))
+
+    bullets = enemy_handler.bullets
+    if bullets is not None and len(bullets) < bullet_count:
+        missing = range(bullet_count - len(bullets))
+        bullets.spawn([rng.uniform(map_obj.left, map_obj.right - PROJECTILE_SIZE) for bullet in missing],
+                      [rng.uniform(map_obj.top, map_obj.bottom - PROJECTILE_SIZE) for bullet in missing],
+                      [rng.uniform(-math.pi, math.pi) for bullet in missing])
+
+def measure(assets, font, tiles, enemy_count, projectile_count, dead_count, bullet_count, ticks, backend, pathfinding,
+            seed, client_count=0):
+    """ Run the subsystems for a number of ticks and return the time each took every tick in milliseconds,
+    the camera, which holds how many things the last frame drew and culled, the average bytes a
+    loopback client received every tick, or None without clients, and the size of the world's state. """
+
+    world_obj = world.World(assets, seed, controls.RemoteControls() if client_count else None, backend, tiles.map,
+                            pathfinding, bullet_count > 0)
+    hud_obj = hud.Hud(font)
+    screen = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
+    offscreen = OffscreenUpdate()
+    camera_obj = camera.Camera()
+    render_queue = render.RenderQueue()
+    player_obj = world_obj.player
+    enemy_handler = world_obj.enemy_handler
+
+    subsystems = {
+        "timers": lambda: world_obj.scheduler.advance(),
+        "enemy_update": lambda: enemy_handler.update(player_obj),
+        "move_projectiles": lambda: projectile.move_projectiles(player_obj),
+        "check_collisions": lambda: projectile.check_collisions(player_obj, enemy_handler),
+        "bullets": lambda: enemy_handler.update_bullets(player_obj),
+        "draw_screen": lambda: display.draw_screen(screen, player_obj, enemy_handler, tiles, hud_obj, offscreen,
+                                                   camera_obj=camera_obj, render_queue=render_queue),
+    }
+
+    # Capture the whole state and put it straight back like rolling back to the last tick would.
+    states = [world_obj.capture()]
+
+    def capture_state():
+        states[0] = world_obj.capture()
+
+    subsystems["capture"] = capture_state
+    subsystems["restore"] = lambda: world_obj.restore(states[0])
+
+    # Clients on the same machine that join the server and ask for a snapshot every tick.
+    server_obj = None
+    clients = []
+    if client_count:
+        server_obj = server.GameServer(world_obj, (NET_HOST, 0))
+        clients = [client.GameClient(server_obj.address) for index in range(client_count)]
+        no_keys = controls.PressedKeys()
+        no_clicks = (False, False, False)
+        center = (SCREEN_SIZE / 2, SCREEN_SIZE / 2)
+
+        for client_obj in clients:
+            client_obj.send_input(no_keys, no_clicks, center)
+        server_obj.receive()
+        for client_obj in clients:
+            client_obj.receive()
+
+        def send_input():
+            for client_obj in clients:
+                client_obj.send_input(no_keys, no_clicks, center)
+
+        def send_snapshots():
+            server_obj.receive()
+            server_obj.send_snapshots()
+
+        def receive_snapshots():
+            for client_obj in clients:
+                client_obj.receive()
+
+        subsystems["client_input"] = send_input
+        subsystems["snapshots"] = send_snapshots
+        subsystems["client_receive"] = receive_snapshots
+
+    timings = {name: [] for name in subsystems}
+
+    for tick in range(ticks):
+        populate(world_obj, enemy_count, projectile_count, dead_count, bullet_count)
+
+        # Keep the player alive so every tick does the same work.
+        player_obj.health = 100
+
+        for name, subsystem in subsystems.items():
+            start = time.perf_counter()
+            subsystem()
+            timings[name].append((time.perf_counter() - start) * 1000)
+
+    bandwidth = None
+    if clients:
+        bandwidth = sum(client_obj.bytes_received for client_obj in clients) / (len(clients) * ticks)
+        for client_obj in clients:
+            client_obj.close()
+        server_obj.close()
+
+    return timings, camera_obj, bandwidth, len(states[0])
+
+def measure_rollback(assets, tiles, enemy_count, projectile_count, dead_count, bullet_count, ticks_back, backend,
+                     pathfinding, seed, repeats=20):
+    """ Capture a world, let it run on for a number of ticks and return the fastest time in milliseconds
+    capturing and restoring the captured state took, out of a number of repeats, and the size of the state. """
+
+    world_obj = world.World(assets, seed, controls.ScriptedControls(controls.patrol_script), backend, tiles.map,
+                            pathfinding, bullet_count > 0)
+    populate(world_obj, enemy_count, projectile_count, dead_count, bullet_count)
+
+    state = world_obj.capture()
+    for tick in range(ticks_back):
+        world_obj.step()
+    later = world_obj.capture()
+
+    capture_times = []
+    restore_times = []
+    for repeat in range(repeats):
+        world_obj.restore(later)
+
+        start = time.perf_counter()
+        world_obj.capture()
+        capture_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        world_obj.restore(state)
+        restore_times.append((time.perf_counter() - start) * 1000)
+
+    return min(capture_times), min(restore_times), len(state)
+
+def measure_idle(assets, font, tiles, seconds):
+    """ Leave the game on the menu until a key press sent by a timer after a number of seconds starts
+    it, and return the idle meter. """
+
+    import main
+
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    game = main.Game(screen, world.World(assets, map_obj=tiles.map), tiles, hud.Hud(font), pygame.time.Clock())
+
+    # Timers can only send a plain event over and over before pygame 2.0.1, which the menu takes as a key
+    # press all the same, so the timer is stopped once the menu has been left.
+    if pygame.version.vernum >= (2, 0, 1):
+        pygame.time.set_timer(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE), int(seconds * 1000), 1)
+    else:
+        pygame.time.set_timer(pygame.KEYDOWN, int(seconds * 1000))
+    game.menu()
+    pygame.time.set_timer(pygame.KEYDOWN, 0)
+    return game.idle_meter
+
+def scaling(results, key, subsystem):
+    """ Return the slope of log time against log count for each group of results that only differ in
+    the key. A slope of 1 is linear and a slope of 2 is quadratic. """
+
+    groups = dict()
+    for result in results:
+        if result["subsystem"] != subsystem or result[key] == 0:
+            continue
+        group = tuple(result[other] for other in ("enemies", "projectiles", "dead_enemies", "bullets") if other != key)
+        groups.setdefault(group, []).append((math.log(result[key]), math.log(max(result["median_ms"], 1e-6))))
+
+    slopes = []
+    for points in groups.values():
+        if len(points) < 2:
+            continue
+        mean_x = statistics.mean(point[0] for point in points)
+        mean_y = statistics.mean(point[1] for point in points)
+        covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        slopes.append(covariance / variance)
+
+    return statistics.mean(slopes) if slopes else None
+
+def commit():
+    """ Return the current git commit or None if it can't be found. """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--enemies", type=int, nargs="+", default=[30, 300, 3000], help="enemy counts")
+    parser.add_argument("--projectiles", type=int, nargs="+", default=[10, 100], help="projectile counts")
+    parser.add_argument("--dead", type=int, nargs="+", default=[10, 100], help="dead enemy counts")
+    parser.add_argument("--bullets", type=int, nargs="+", default=[0], help="enemy projectile counts")
+    parser.add_argument("--clients", type=int, default=0, help="loopback clients sent snapshots every tick")
+    parser.add_argument("--ticks", type=int, default=30, help="ticks to time for each world")
+    parser.add_argument("--backend", choices=["object", "array"], default=ENEMY_BACKEND, help="enemy backend")
+    parser.add_argument("--pathfinding", choices=["direct", "flow_field"], default=ENEMY_PATHFINDING,
+                        help="how enemies find their way to the player")
+    parser.add_argument("--seed", type=int, default=0, help="seed used to place everything")
+    parser.add_argument("--idle", type=float, default=0, help="seconds to leave the menu waiting for input")
+    parser.add_argument("--rollback", type=int, default=0, help="ticks to roll back when timing capture and restore")
+    parser.add_argument("--output", default="benchmark_results.json", help="file to write the results to")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.font.init()
+    font = pygame.font.Font(None, 30)
+    assets = display.load_assets()
+    tiles = display.create_map(assets)
+
+    results = []
+    for enemy_count in args.enemies:
+        for projectile_count in args.projectiles:
+            for dead_count in args.dead:
+                for bullet_count in args.bullets:
+                    timings, camera_obj, bandwidth, state_size = measure(
+                        assets, font, tiles, enemy_count, projectile_count, dead_count, bullet_count, args.ticks,
+                        args.backend, args.pathfinding, args.seed, args.clients)
+                    for subsystem, times in timings.items():
+                        results.append({
+                            "enemies": enemy_count,
+                            "projectiles": projectile_count,
+                            "dead_enemies": dead_count,
+                            "bullets": bullet_count,
+                            "subsystem": subsystem,
+                            "mean_ms": statistics.mean(times),
+                            "median_ms": statistics.median(times),
+                            "max_ms": max(times),
+                        })
+                        if subsystem == "draw_screen":
+                            results[-1]["drawn"] = camera_obj.drawn
+                            results[-1]["culled"] = camera_obj.culled
+                        if subsystem == "snapshots":
+                            results[-1]["bytes_per_client"] = bandwidth
+                        if subsystem == "capture":
+                            results[-1]["state_bytes"] = state_size
+                        print("{:>6} enemies {:>5} projectiles {:>5} dead {:>6} bullets  {:<17} {:8.3f} ms".format(
+                            enemy_count, projectile_count, dead_count, bullet_count, subsystem,
+                            statistics.median(times)))
+
+                    # How many things the camera drew and culled in the last frame.
+                    print("{:>6} enemies {:>5} projectiles {:>5} dead {:>6} bullets  {:<17} {} drawn {} culled".format(
+                        enemy_count, projectile_count, dead_count, bullet_count, "camera", camera_obj.drawn,
+                        camera_obj.culled))
+
+                    # How big the captured state of the world is.
+                    print("{:>6} enemies {:>5} projectiles {:>5} dead {:>6} bullets  {:<17} {} bytes".format(
+                        enemy_count, projectile_count, dead_count, bullet_count, "state", state_size))
+
+                    # How much every loopback client received each tick.
+                    if bandwidth is not None:
+                        print("{:>6} enemies {:>5} projectiles {:>5} dead {:>6} bullets  {:<17} {:.0f} bytes".format(
+                            enemy_count, projectile_count, dead_count, bullet_count, "per client", bandwidth))
+
+    subsystems = sorted(set(result["subsystem"] for result in results))
+    curves = {subsystem: {key: scaling(results, key, subsystem)
+                          for key in ("enemies", "projectiles", "dead_enemies", "bullets")}
+              for subsystem in subsystems}
+
+    print()
+    print("Scaling exponents (1 is linear, 2 is quadratic)")
+    for subsystem, exponents in curves.items():
+        print("{:<17} ".format(subsystem) + "  ".join(
+            "{} {}".format(key, "-" if exponent is None else "{:.2f}".format(exponent))
+            for key, exponent in exponents.items()))
+
+    rollback = []
+    if args.rollback > 0:
+        print()
+        for enemy_count in args.enemies:
+            for bullet_count in args.bullets:
+                capture_time, restore_time, state_size = measure_rollback(
+                    assets, tiles, enemy_count, max(args.projectiles), max(args.dead), bullet_count, args.rollback,
+                    args.backend, args.pathfinding, args.seed)
+                rollback.append({
+                    "enemies": enemy_count,
+                    "projectiles": max(args.projectiles),
+                    "dead_enemies": max(args.dead),
+                    "bullets": bullet_count,
+                    "ticks_back": args.rollback,
+                    "capture_ms": capture_time,
+                    "restore_ms": restore_time,
+                    "state_bytes": state_size,
+                    "within_budget": capture_time + restore_time <= ROLLBACK_BUDGET,
+                })
+                print("{:>6} enemies {:>6} bullets  rollback {} ticks  capture {:.3f} ms  restore {:.3f} ms  {}".format(
+                    enemy_count, bullet_count, args.rollback, capture_time, restore_time,
+                    "within budget" if rollback[-1]["within_budget"] else "over the {} ms budget".format(ROLLBACK_BUDGET)))
+
+    idle = None
+    if args.idle > 0:
+        idle_meter = measure_idle(assets, font, tiles, args.idle)
+        idle = {"seconds": idle_meter.wall, "cpu_seconds": idle_meter.cpu, "usage": idle_meter.usage(),
+                "wakeups": idle_meter.wakeups}
+        print()
+        idle_meter.report()
+
+    with open(args.output, "w") as results_file:
+        json.dump({
+            "commit": commit(),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "backend": args.backend,
+            "pathfinding": args.pathfinding,
+            "ticks": args.ticks,
+            "clients": args.clients,
+            "idle": idle,
+            "rollback_budget_ms": ROLLBACK_BUDGET,
+            "rollback": rollback,
+            "results": results,
+            "scaling": curves,
+        }, results_file, indent=4)
+
+    # Fail when rolling back took too long so scripts running the benchmark notice
+    if not all(row["within_budget"] for row in rollback):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+""" Projectiles shot by enemies, kept in NumPy arrays so tens of thousands of them can be moved, culled
+and checked against the player at once. """
+
+import numpy
+
+from config import *
+import savestate
+
+class BulletBuffer:
+    """ Structure of arrays holding the position, previous position, velocity and id of every enemy projectile.
+    The arrays are allocated once for the capacity and live bullets are kept packed at the start of them,
+    so moving, culling and hitting the player are a few whole array operations each tick. Bullets are
+    squares of PROJECTILE_SIZE with their position at the top left corner. """
+
+    FIELDS = ("x", "y", "previous_x", "previous_y", "velocity_x", "velocity_y", "id")
+
+    def __init__(self, capacity=ENEMY_PROJECTILE_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.next_id = 0
+
+        for field in self.FIELDS:
+            setattr(self, field, numpy.zeros(capacity, dtype=numpy.int64 if field == "id" else float))
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, angle, speed=ENEMY_PROJECTILE_SPEED):
+        """ Add bullets at the positions going in the directions. Each argument can be a number or an
+        array, and numbers are used for every bullet. Bullets that don't fit in the capacity are dropped.
+        Returns how many bullets were added. """
+
+        x, y, angle = numpy.broadcast_arrays(numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float),
+                                             numpy.asarray(angle, dtype=float))
+        added = min(x.size, self.capacity - self.count)
+        if added <= 0:
+            return 0
+
+        start = self.count
+        end = start + added
+        self.x[start:end] = self.previous_x[start:end] = x.ravel()[:added]
+        self.y[start:end] = self.previous_y[start:end] = y.ravel()[:added]
+        self.velocity_x[start:end] = speed * numpy.cos(angle.ravel()[:added])
+        self.velocity_y[start:end] = speed * numpy.sin(angle.ravel()[:added])
+        self.id[start:end] = numpy.arange(self.next_id, self.next_id + added)
+        self.next_id += added
+        self.count = end
+
+        return added
+
+    def shoot_at(self, x, y, target_x, target_y):
+        """ Shoot a bullet from each of the centers towards the target, which is where the center of the
+        bullet is aimed. Returns how many bullets were added. """
+
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        angle = numpy.arctan2(target_y - y, target_x - x)
+        return self.spawn(x - (PROJECTILE_SIZE / 2), y - (PROJECTILE_SIZE / 2), angle)
+
+    def move(self):
+        """ Move every bullet by its velocity. """
+
+        count = self.count
+        self.previous_x[:count] = self.x[:count]
+        self.previous_y[:count] = self.y[:count]
+        self.x[:count] += self.velocity_x[:count]
+        self.y[:count] += self.velocity_y[:count]
+
+    def keep(self, kept):
+        """ Remove every bullet which isn't kept, moving the kept bullets to the start of the arrays in order. """
+
+        count = self.count
+        remaining = int(numpy.count_nonzero(kept))
+        if remaining == count:
+            return
+
+        for field in self.FIELDS:
+            values = getattr(self, field)
+            values[:remaining] = values[:count][kept]
+        self.count = remaining
+
+    def cull(self, left, top, right, bottom):
+        """ Remove the bullets which have left the area completely. """
+
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        self.keep((x + PROJECTILE_SIZE > left) & (x < right) & (y + PROJECTILE_SIZE > top) & (y < bottom))
+
+    def overlapping(self, left, top, size):
+        """ Return which bullets overlap the square. """
+
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        return (x + PROJECTILE_SIZE > left) & (x < left + size) & (y + PROJECTILE_SIZE > top) & (y < top + size)
+
+    def hit_player(self, player_obj):
+        """ Damage the player once if any bullet hits them and remove the bullets that did. Bullets pass
+        through the player whilst they have invincibility. Returns if the player was hit. """
+
+        if player_obj.invincibility != 0 or not self.count:
+            return False
+
+        hits = self.overlapping(player_obj.x - (PLAYER_SIZE / 2), player_obj.y - (PLAYER_SIZE / 2), PLAYER_SIZE)
+        if not hits.any():
+            return False
+
+        self.keep(~hits)
+        player_obj.health -= ENEMY_PROJECTILE_DAMAGE
+        player_obj.invincibility = PLAYER_INVINCIBILITY
+        return True
+
+    def update(self, player_obj, map_obj):
+        """ Move the bullets, remove the ones that left the map and check if any hit the player. """
+
+        if self.count:
+            self.move()
+            self.cull(map_obj.left, map_obj.top, map_obj.right, map_obj.bottom)
+            self.hit_player(player_obj)
+
+    def positions_in(self, left, top, right, bottom, alpha=1.0):
+        """ Return lists of the x and y of the bullets overlapping the rectangle, the fraction alpha of the
+        way from their previous position to their current one. """
+
+        count = self.count
+        x = self.previous_x[:count] + (self.x[:count] - self.previous_x[:count]) * alpha
+        y = self.previous_y[:count] + (self.y[:count] - self.previous_y[:count]) * alpha
+        inside = (x + PROJECTILE_SIZE > left) & (x < right) & (y + PROJECTILE_SIZE > top) & (y < bottom)
+        return x[inside].tolist(), y[inside].tolist()
+
+    def ids_in(self, left, top, right, bottom, limit=None):
+        """ Return lists of the ids, x and y of the bullets overlapping the rectangle. If there are more than
+        the limit, only the limit closest to the center of the rectangle are returned. """
+
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        inside = numpy.flatnonzero((x + PROJECTILE_SIZE > left) & (x < right) & (y + PROJECTILE_SIZE > top) & (y < bottom))
+        if limit is not None and len(inside) > limit:
+            distance = ((x[inside] + (PROJECTILE_SIZE / 2) - (left + right) / 2) ** 2 +
+                        (y[inside] + (PROJECTILE_SIZE / 2) - (top + bottom) / 2) ** 2)
+            inside = inside[numpy.argpartition(distance, limit - 1)[:limit]]
+        return self.id[inside].tolist(), x[inside].tolist(), y[inside].tolist()
+
+    def write_positions(self, buffer):
+        """ Add the position and previous position of every bullet to the end of the buffer in one copy. """
+
+        count = self.count
+        buffer.frombytes(numpy.column_stack((self.x[:count], self.y[:count],
+                                             self.previous_x[:count], self.previous_y[:count])).tobytes())
+
+    def clear(self):
+        """ Remove every bullet. """
+
+        self.count = 0
+
+    def capture(self, writer):
+        """ Add the live part of every array to a saved state. """
+
+        writer.pack(savestate.COUNT, self.count, self.next_id)
+        for field in self.FIELDS:
+            writer.array(getattr(self, field)[:self.count])
+
+    def restore(self, reader):
+        """ Read the arrays back from a saved state. Bullets past the capacity are dropped. """
+
+        count, next_id = reader.unpack(savestate.COUNT)
+        self.next_id = reader.next_id(next_id, self.next_id)
+        self.count = min(count, self.capacity)
+        for field in self.FIELDS:
+            values = getattr(self, field)
+            values[:self.count] = numpy.frombuffer(reader.bytes(), dtype=values.dtype)[:self.count]
@@ -0,0 +1,79 @@
+""" The view of the world shown on the screen. """
+
+from config import *
+
+class Camera:
+    """ Follows the player and turns world positions into screen positions. Things whose box is
+    outside of the view are culled before they are drawn, and how many things of every kind were
+    drawn and culled is counted every frame. """
+
+    def __init__(self, width=SCREEN_SIZE, height=SCREEN_SIZE):
+        self.width = width
+        self.height = height
+
+        # World position drawn in the center of the screen.
+        self.x = 0.0
+        self.y = 0.0
+
+        # Added to a world position to get its screen position.
+        self.offset_x = width / 2
+        self.offset_y = height / 2
+
+        # Drawn and culled counts of every kind of thing this frame.
+        self.counts = dict()
+
+    def follow(self, player_obj, alpha=1.0):
+        """ Center the view on the player the fraction alpha of the way from their previous position
+        to their current one and start counting a new frame. """
+
+        self.x = player_obj.previous_x + (player_obj.x - player_obj.previous_x) * alpha
+        self.y = player_obj.previous_y + (player_obj.y - player_obj.previous_y) * alpha
+        self.offset_x = (self.width / 2) - self.x
+        self.offset_y = (self.height / 2) - self.y
+        self.counts = dict()
+
+    def to_screen(self, x, y):
+        """ Return where the world position is on the screen. """
+
+        return x + self.offset_x, y + self.offset_y
+
+    def view(self, margin=0):
+        """ Return the left, top, right and bottom of the part of the world on screen, grown by the margin. """
+
+        left = -self.offset_x - margin
+        top = -self.offset_y - margin
+        return left, top, left + self.width + 2 * margin, top + self.height + 2 * margin
+
+    def visible(self, x, y, width, height):
+        """ Check if the box at the world position is at least partly on screen. """
+
+        screen_x = x + self.offset_x
+        screen_y = y + self.offset_y
+        return screen_x + width > 0 and screen_x < self.width and screen_y + height > 0 and screen_y < self.height
+
+    def cull(self, kind, candidates, total, size, margin=0):
+        """ Return the candidates whose box of the size at their position, grown by the margin, is on
+        screen. Candidates are usually what a spatial query found near the view, so total is how many
+        things of the kind there are altogether and the rest are counted as culled without being looked at. """
+
+        # Compare positions with the view grown by the size and margin instead of growing every box.
+        left, top, right, bottom = self.view(margin)
+        left -= size
+        top -= size
+        visible = [obj for obj in candidates if left < obj.x < right and top < obj.y < bottom]
+        self.count(kind, len(visible), total - len(visible))
+        return visible
+
+    def count(self, kind, drawn, culled):
+        """ Add to the drawn and culled counts of the kind. """
+
+        previous_drawn, previous_culled = self.counts.get(kind, (0, 0))
+        self.counts[kind] = (previous_drawn + drawn, previous_culled + culled)
+
+    @property
+    def drawn(self):
+        return sum(drawn for drawn, culled in self.counts.values())
+
+    @property
+    def culled(self):
+        return sum(culled for drawn, culled in self.counts.values())
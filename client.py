@@ -0,0 +1,234 @@
+#! /usr/bin/env python3
+""" Play or watch a game run by server.py. The client only sends input and draws the snapshots it
+receives, so it never simulates the world itself. The map file is read locally and has to match the
+server's. """
+
+import argparse
+import collections
+import math
+import socket
+import time
+
+import pygame
+
+from config import *
+import camera
+import display
+import hud
+import network
+import pipeline
+import render
+import rotation
+import tilemap
+
+class View:
+    """ Position the camera follows when watching the game instead of playing it. """
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.previous_x = 0.0
+        self.previous_y = 0.0
+
+class GameClient:
+    """ Sends input to the server and rebuilds the world from the snapshots it receives. The two newest
+    frames are turned into a snapshot that is drawn part of the way from the older one to the newer one. """
+
+    def __init__(self, address=(NET_HOST, NET_PORT)):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.connect(address)
+        self.socket.setblocking(False)
+
+        self.id = None
+        self.sequence = 0
+
+        # Frames received by sequence, oldest first, which the server can compress snapshots against.
+        self.frames = collections.OrderedDict()
+        self.newest = None
+        self.previous = None
+        self.received = 0.0
+        self.bytes_received = 0
+
+        self.snapshot = pipeline.Snapshot()
+        self.view = View()
+
+    @property
+    def controlling(self):
+        """ If this client controls the player instead of watching. """
+
+        return self.newest is not None and self.newest.flags & network.CONTROLLING != 0
+
+    def send(self, data):
+        # Nothing can be done about a datagram that couldn't be sent, like one lost on the way.
+        try:
+            self.socket.send(data)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass
+
+    def send_input(self, keys, clicks, position):
+        """ Send the keyboard and mouse state along with the newest snapshot received, or ask to join
+        until the server has welcomed the client. """
+
+        if self.id is None:
+            self.send(network.MESSAGE_TYPE.pack(network.HELLO))
+            return
+
+        self.sequence += 1
+        acked = self.newest.sequence if self.newest is not None else 0
+        self.send(network.encode_input(self.sequence, acked, keys, clicks, position))
+
+    def receive(self):
+        """ Handle every message waiting on the socket. Returns if a newer frame arrived. """
+
+        fresh = False
+        while True:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                return fresh
+            except ConnectionRefusedError:
+                # The server isn't running yet or has stopped.
+                return fresh
+
+            if not data:
+                continue
+
+            if data[0] == network.WELCOME and len(data) == network.WELCOME_MESSAGE.size:
+                self.id = network.WELCOME_MESSAGE.unpack(data)[1]
+            elif data[0] == network.SNAPSHOT and len(data) >= network.SNAPSHOT_HEADER.size:
+                self.bytes_received += len(data)
+                frame = network.decode_snapshot(data, self.frames)
+
+                # Snapshots whose baseline is gone and snapshots older than the newest one are dropped.
+                if frame is None or (self.newest is not None and frame.sequence <= self.newest.sequence):
+                    continue
+
+                self.frames[frame.sequence] = frame
+                while len(self.frames) > NET_HISTORY:
+                    self.frames.popitem(last=False)
+
+                self.previous = self.newest
+                self.newest = frame
+                self.received = time.perf_counter()
+                fresh = True
+
+    def fill(self):
+        """ Turn the two newest frames into the snapshot and view and return how far to draw between
+        them, from how long ago the newest frame arrived. """
+
+        newest = self.newest
+        previous = self.previous if self.previous is not None else newest
+        snapshot = self.snapshot
+        scale = NET_POSITION_SCALE
+
+        snapshot.tick = newest.sequence
+        snapshot.time = self.received
+        snapshot.x = newest.player_x / scale
+        snapshot.y = newest.player_y / scale
+        snapshot.previous_x = previous.player_x / scale
+        snapshot.previous_y = previous.player_y / scale
+        snapshot.health = newest.health
+        snapshot.kills = newest.kills
+        snapshot.invincibility = newest.invincibility
+        snapshot.aim = network.unquantise_angle(newest.aim)
+
+        self.view.x = newest.view_x / scale
+        self.view.y = newest.view_y / scale
+        self.view.previous_x = previous.view_x / scale
+        self.view.previous_y = previous.view_y / scale
+
+        # Things are drawn from where they were in the older frame, or where they are if they are new.
+        enemies, dead_enemies, projectiles, bullets = newest.things
+        old_enemies, old_dead_enemies, old_projectiles, old_bullets = previous.things
+
+        del snapshot.enemies[:]
+        snapshot.enemies.extend(value / scale for enemy_id, (x, y) in enemies.items()
+                                for value in (x, y) + old_enemies.get(enemy_id, (x, y)))
+
+        del snapshot.dead_enemies[:]
+        snapshot.dead_enemies.extend(value / scale for dead_enemy_id in sorted(dead_enemies)
+                                     for value in dead_enemies[dead_enemy_id])
+
+        del snapshot.projectiles[:]
+        for projectile_id, (x, y, angle) in projectiles.items():
+            previous_x, previous_y, previous_angle = old_projectiles.get(projectile_id, (x, y, angle))
+            snapshot.projectiles.extend((x / scale, y / scale, previous_x / scale, previous_y / scale,
+                                         network.unquantise_angle(angle)))
+
+        del snapshot.bullets[:]
+        snapshot.bullets.extend(value / scale for bullet_id, (x, y) in bullets.items()
+                                for value in (x, y) + old_bullets.get(bullet_id, (x, y)))
+
+        return min(max((time.perf_counter() - self.received) * SIMULATION_RATE / NET_SNAPSHOT_INTERVAL, 0.0), 1.0)
+
+    def close(self):
+        """ Tell the server the client is leaving. """
+
+        if self.id is not None:
+            self.send(network.MESSAGE_TYPE.pack(network.BYE))
+        self.socket.close()
+
+def game_loop(screen, client_obj, sprites, tiles, hud_obj, clock):
+    """ Send input once every simulation step and draw the newest snapshots until the window is closed. """
+
+    camera_obj = camera.Camera()
+    render_queue = render.RenderQueue()
+    step_time = 1 / SIMULATION_RATE
+    next_input = time.perf_counter()
+
+    while True:
+        clock.tick(FRAME_RATE_LIMIT)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+
+        now = time.perf_counter()
+        if now >= next_input:
+            client_obj.send_input(pygame.key.get_pressed(), pygame.mouse.get_pressed(), pygame.mouse.get_pos())
+            next_input = max(next_input + step_time, now)
+
+        client_obj.receive()
+        if client_obj.newest is None:
+            continue
+
+        alpha = client_obj.fill()
+        pipeline.draw_snapshot(screen, client_obj.snapshot, sprites, tiles, hud_obj, alpha=alpha, camera_obj=camera_obj,
+                               render_queue=render_queue, view=None if client_obj.controlling else client_obj.view)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=NET_HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=NET_PORT, help="port of the server")
+    parser.add_argument("--map", default=MAP_FILE, help="map file the server plays on")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    pygame.display.set_caption("Connecting to {}:{}".format(args.host, args.port))
+    clock = pygame.time.Clock()
+
+    assets = display.load_assets()
+    tiles = display.create_map(assets, tilemap.MapFile(args.map))
+    hud_obj = hud.Hud(pygame.font.SysFont(pygame.font.get_default_font(), 30))
+    sprites = {
+        "player": assets["player"],
+        "player_hit": assets["player_hit"],
+        "projectile": rotation.RotationCache(assets["player_projectile"]),
+        "gun": rotation.RotationCache(assets["gun"], -math.pi / 2),
+        "chaser": assets["chaser"],
+        "dead_enemy": assets["dead_enemy"],
+        "bullet": assets["shooter_projectile"],
+    }
+    sprites["projectile"].prerender()
+    sprites["gun"].prerender()
+
+    client_obj = GameClient((args.host, args.port))
+    try:
+        game_loop(screen, client_obj, sprites, tiles, hud_obj, clock)
+    finally:
+        client_obj.close()
+
+if __name__ == "__main__":
+    main()
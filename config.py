@@ -1,43 +1,120 @@
-""" Mostly configurable values for player, enemies, projectiles, powerups, tiles and screen. """
-
-# Screen
-# The screen size can be changed without completely breaking the game but I don't see a reason to
-SCREEN_SIZE = 800
-# Definitely don't change
-LEFT_BORDER = -200
-RIGHT_BORDER = 1000
-UPPER_BORDER = -200
-LOWER_BORDER = 1000
-
-# Player
-# These can be changed
-PLAYER_SPEED = 10
-PLAYER_SHOOT_COOLDOWN = 10
-PLAYER_INVINCIBILITY = 60
-PLAYER_KNOCKBACK = 25
-SPAWN_TIMER = 20
-PLAYER_SIZE = 50
-
-# Enemy
-# These can be changed
-ENEMY_SPEED = 8
-ENEMY_DAMAGE = 10
-ENEMY_RANDOM_DIRECTION_TIME = 30
-ENEMY_DEATH_TIME = 30
-MAX_ENEMIES = 30
-# Don't change yet. Eventually this will be able to be changed.
-ENEMY_SIZE = 50
-
-# Tiles
-# Definitely don't change
-TILE_SIZE = 200
-
-# Projectile
-# Can be changed
-PROJECTILE_SPEED = 25
-# Don't change
-PROJECTILE_SIZE = 15
-
-# Powerup
-POWERUP_SIZE = 25
-
+""" Mostly configurable values for player, enemies, projectiles, powerups, tiles and screen. """
+
+# Screen
+# The screen size can be changed without completely breaking the game but I don't see a reason to
+SCREEN_SIZE = 800
+# Every cooldown and timer counts simulation steps, so changing the simulation rate changes how long they take.
+SIMULATION_RATE = 60
+# Most frames drawn a second. Moving things are drawn in between simulation steps.
+FRAME_RATE_LIMIT = 144
+# Most steps run to catch up before drawing a frame and most frames skipped in a row when falling behind.
+# Setting MAX_SKIPPED_FRAMES to 0 draws every frame even under load.
+MAX_CATCH_UP_STEPS = 5
+MAX_SKIPPED_FRAMES = 1
+# Run the simulation on its own thread so drawing a frame never holds up a step.
+PIPELINED = False
+# Only update the parts of the screen that changed while the player is standing still.
+DIRTY_RECTS = False
+# Most milliseconds the menu and death screens sleep waiting for input. They wake straight away on input.
+# pygame 1 can't wait for input with a time limit, so it checks for input every IDLE_POLL milliseconds instead.
+IDLE_WAIT = 250
+IDLE_POLL = 10
+# Seconds the death screen ignores input for so a key still held from playing doesn't start the next game.
+DEATH_SCREEN_DELAY = 1
+
+# Player
+# These can be changed
+PLAYER_SPEED = 10
+PLAYER_SHOOT_COOLDOWN = 10
+PLAYER_INVINCIBILITY = 60
+PLAYER_KNOCKBACK = 25
+SPAWN_TIMER = 20
+# Most enemies spawned at once and random free cells tried before searching every free cell.
+SPAWN_BATCH = 1
+SPAWN_ATTEMPTS = 8
+PLAYER_SIZE = 50
+# The gun is drawn on the edge of the player pointing towards the mouse.
+GUN_SIZE = 30
+
+# Enemy
+# These can be changed
+ENEMY_SPEED = 8
+ENEMY_DAMAGE = 10
+ENEMY_RANDOM_DIRECTION_TIME = 30
+ENEMY_DEATH_TIME = 30
+MAX_ENEMIES = 30
+# "object" updates every Chaser one at a time, "array" updates the whole swarm at once using NumPy.
+# Rolling the world back is only fast enough for every tick with "array" once there are around a
+# thousand enemies, "object" takes around 4 ms to capture and restore them.
+ENEMY_BACKEND = "object"
+# "direct" steers every enemy straight at the player, "flow_field" steers them along the shortest
+# path around blocked tiles from one search of the map every time the player changes cell.
+ENEMY_PATHFINDING = "direct"
+# Don't change yet. Eventually this will be able to be changed.
+ENEMY_SIZE = 50
+
+# Tiles
+# Definitely don't change
+TILE_SIZE = 200
+# Number of tiles along each side of the chunks the map is drawn in.
+CHUNK_TILES = 4
+# Most chunks kept drawn at once. Chunks that haven't been on screen for a while are thrown away.
+CHUNK_CACHE_SIZE = 16
+# File the map is loaded from. The size of the map and the borders the player and enemies stay inside are stored in it.
+MAP_FILE = "maps/default.map"
+
+# Projectile
+# Can be changed
+PROJECTILE_SPEED = 25
+# Don't change
+PROJECTILE_SIZE = 15
+
+# Enemy projectile
+# Every ENEMY_SHOOT_COOLDOWN ticks each enemy on screen shoots at the player when ENEMY_SHOOTING is on. Needs NumPy.
+ENEMY_SHOOTING = False
+ENEMY_SHOOT_COOLDOWN = 60
+ENEMY_PROJECTILE_SPEED = 6
+ENEMY_PROJECTILE_DAMAGE = 5
+# Most enemy projectiles at once. The space for them is allocated up front.
+ENEMY_PROJECTILE_CAPACITY = 65536
+
+# Network
+# Address the game server listens on and clients connect to.
+NET_HOST = "127.0.0.1"
+NET_PORT = 47800
+# The server sends every client a snapshot every NET_SNAPSHOT_INTERVAL ticks with positions in steps of
+# 1 / NET_POSITION_SCALE pixels.
+NET_SNAPSHOT_INTERVAL = 2
+NET_POSITION_SCALE = 2
+# Clients are only sent things within NET_INTEREST_RADIUS of their view, at most NET_MAX_ENTITIES of every kind,
+# closest first, so a snapshot doesn't grow with the number of enemies in the world.
+NET_INTEREST_RADIUS = 600
+NET_MAX_ENTITIES = 256
+# Snapshots kept for every client to compress against and seconds without input before a client is dropped.
+NET_HISTORY = 32
+NET_TIMEOUT = 5
+
+# Powerup
+POWERUP_SIZE = 25
+
+# Rotated sprites
+# Number of evenly spaced angles rotated sprites are drawn at and most rotated copies kept of each sprite.
+ROTATION_STEPS = 64
+ROTATION_CACHE_SIZE = 64
+
+# Assets
+# Directory scaled images are stored in to speed up startup. An empty string turns it off.
+ASSET_CACHE_DIR = ".asset_cache"
+
+# HUD
+# Draw the kills counter from digits rendered once instead of rendering the text whenever it changes.
+HUD_GLYPH_ATLAS = False
+
+# Profiling
+# Time every phase of the game loop. Costs almost nothing when turned off.
+PROFILE = False
+# Number of frames kept, the overlay key and the file the frames are written to on exit (.csv or .json).
+PROFILE_FRAMES = 600
+PROFILE_OVERLAY_KEY = "F3"
+PROFILE_DUMP = "profile.csv"
+
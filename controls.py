@@ -0,0 +1,119 @@
+""" Sources of keyboard and mouse input for the player. """
+
+import math
+
+import pygame
+
+from config import *
+
+class Controls:
+    """ Reads the live keyboard and mouse state from pygame. """
+
+    def poll(self):
+        """ Nothing to do since pygame keeps the state up to date. """
+
+    def keys(self):
+        return pygame.key.get_pressed()
+
+    def clicks(self):
+        return pygame.mouse.get_pressed()
+
+    def mouse_position(self):
+        return pygame.mouse.get_pos()
+
+class SharedControls(Controls):
+    """ Input read from pygame on the main thread and handed to a simulation running on another
+    thread. The main thread calls capture every frame and the simulation sees the latest capture
+    when it polls. """
+
+    def __init__(self):
+        self.latest = ((), (False, False, False), (SCREEN_SIZE / 2, SCREEN_SIZE / 2))
+        self.current = self.latest
+
+    def capture(self):
+        """ Read the keyboard and mouse. Must be called on the main thread. """
+
+        # Replacing the whole tuple at once means the simulation never sees half of a capture.
+        self.latest = (pygame.key.get_pressed(), pygame.mouse.get_pressed(), pygame.mouse.get_pos())
+
+    def poll(self):
+        self.current = self.latest
+
+    def keys(self):
+        return self.current[0] or PressedKeys()
+
+    def clicks(self):
+        return self.current[1]
+
+    def mouse_position(self):
+        return self.current[2]
+
+class RemoteControls(Controls):
+    """ Input sent over the network by the client controlling the player. The server hands it the
+    newest input it received and the simulation keeps using it until newer input arrives. """
+
+    def __init__(self):
+        self.current = (PressedKeys(), (False, False, False), (SCREEN_SIZE / 2, SCREEN_SIZE / 2))
+
+    def receive(self, keys, clicks, position):
+        self.current = (PressedKeys(keys), clicks, position)
+
+    def poll(self):
+        """ Nothing to do since the server hands over input as it arrives. """
+
+    def keys(self):
+        return self.current[0]
+
+    def clicks(self):
+        return self.current[1]
+
+    def mouse_position(self):
+        return self.current[2]
+
+class PressedKeys:
+    """ Keys held down in a scripted frame. Can be indexed with pygame key constants like the
+    result of pygame.key.get_pressed. """
+
+    def __init__(self, keys=()):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+class ScriptedControls:
+    """ Plays back input from a script instead of reading it from pygame. The script is called with
+    the number of the frame and returns the keys held down, the mouse buttons held down and the
+    mouse position for that frame. """
+
+    def __init__(self, script):
+        self.script = script
+        self.frame = -1
+        self.current = (PressedKeys(), (False, False, False), (SCREEN_SIZE / 2, SCREEN_SIZE / 2))
+
+    def poll(self):
+        """ Move on to the next frame of the script. """
+
+        self.frame += 1
+        keys, clicks, position = self.script(self.frame)
+        self.current = (PressedKeys(keys), clicks, position)
+
+    def keys(self):
+        return self.current[0]
+
+    def clicks(self):
+        return self.current[1]
+
+    def mouse_position(self):
+        return self.current[2]
+
+def patrol_script(frame):
+    """ Walk around in a square whilst shooting in a slowly turning circle. Used for headless runs. """
+
+    directions = ([pygame.K_d], [pygame.K_s], [pygame.K_a], [pygame.K_w])
+    keys = directions[(frame // 60) % len(directions)]
+
+    # Aim at a point going round the player about once every ten seconds.
+    angle = frame * 0.01
+    position = ((SCREEN_SIZE / 2) + 100 * math.cos(angle), (SCREEN_SIZE / 2) + 100 * math.sin(angle))
+
+    return keys, (True, False, False), position
@@ -1,120 +1,230 @@
-""" Load assets, create map and draw screen for the game. """
-
-import pygame
-
-from config import *
-
-class Tile:
-
-    def __init__(self, sprite, x, y):
-        self.sprite = sprite
-        self.x = x
-        self.y = y
-
-    def draw(self, screen, player):
-
-        # Need to get the displacement of the player from the initial position to determine where the sprite should be drawn
-        # relative to the player. 
-        screen.blit(self.sprite, (self.x - player.x + (SCREEN_SIZE / 2), self.y - player.y + (SCREEN_SIZE / 2)))
-
-
-def load_assets():
-    """ Load assets and return a dictionary with the name of the assets as the keys and the pygame image objects as the values. """
-
-    assets = dict()
-
-    # Load player assets
-    assets["player"] = pygame.transform.scale(pygame.image.load("assets/player.png"), (PLAYER_SIZE, PLAYER_SIZE))
-    assets["player_hit"] = pygame.transform.scale(pygame.image.load("assets/shooter.png"), (PLAYER_SIZE, PLAYER_SIZE))
-    assets["player_projectile"] = pygame.transform.scale(pygame.image.load("assets/player.png"), (PROJECTILE_SIZE, PROJECTILE_SIZE))
-
-    # Load the enemy assets
-    assets["chaser"] = pygame.transform.scale(pygame.image.load("assets/chaser.png"), (ENEMY_SIZE, ENEMY_SIZE))
-    assets["shooter_projectile"] = pygame.transform.scale(pygame.image.load("assets/shooter.png"), (PROJECTILE_SIZE, PROJECTILE_SIZE))
-    assets["dead_enemy"] = pygame.transform.scale(pygame.image.load("assets/shooter.png"), (ENEMY_SIZE, ENEMY_SIZE))
-
-    # Load the map assets
-    assets["floor_tile"] = pygame.transform.scale(pygame.image.load("assets/floor_tile.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile1"] = pygame.transform.scale(pygame.image.load("assets/wall_tile1.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile2"] = pygame.transform.scale(pygame.image.load("assets/wall_tile2.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile3"] = pygame.transform.scale(pygame.image.load("assets/wall_tile3.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile4"] = pygame.transform.scale(pygame.image.load("assets/wall_tile4.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile5"] = pygame.transform.scale(pygame.image.load("assets/wall_tile5.png"), (TILE_SIZE, TILE_SIZE))
-    assets["wall_tile6"] = pygame.transform.scale(pygame.image.load("assets/wall_tile6.png"), (TILE_SIZE, TILE_SIZE))
-
-    # Load the powerup assets
-    assets["heart"] = pygame.transform.scale(pygame.image.load("assets/shooter.png"), (POWERUP_SIZE, POWERUP_SIZE))
-
-    return assets
-
-def create_map(assets):
-    """ Create a map by returning a list of tile objects. """
-
-    tiles = []
-
-    # Corner tiles
-    tiles.append(Tile(assets["wall_tile2"], LEFT_BORDER - 200, UPPER_BORDER - 200))
-    tiles.append(Tile(assets["wall_tile3"], RIGHT_BORDER, UPPER_BORDER - 200))
-
-    # Upper tiles with grass
-    for width in range(8):
-        tiles.append(Tile(assets["wall_tile6"], width * TILE_SIZE + LEFT_BORDER - 200, UPPER_BORDER - 400))
-
-    # Upper tiles with cliff face
-    for width in range(6):
-        tiles.append(Tile(assets["wall_tile1"], width * TILE_SIZE + LEFT_BORDER, UPPER_BORDER - 200))
-
-    # Left side with cliff face
-    for height in range(6):
-        tiles.append(Tile(assets["wall_tile4"], LEFT_BORDER - TILE_SIZE, height * TILE_SIZE - 200))
-
-    # Left side with grass
-    for height in range(8):
-        tiles.append(Tile(assets["wall_tile6"], LEFT_BORDER - 400, height * TILE_SIZE - 600))
-
-    # Right side with cliff face
-    for height in range(6):
-        tiles.append(Tile(assets["wall_tile5"], RIGHT_BORDER, height * TILE_SIZE - 200))
-
-    # Right side with grass
-    for height in range(8):
-        tiles.append(Tile(assets["wall_tile6"], RIGHT_BORDER + 200, height * TILE_SIZE - 600))
-
-    # Bottom tiles with grass
-    for width in range(10):
-        for height in range(2):
-            tiles.append(Tile(assets["wall_tile6"], width * TILE_SIZE - 600, height * TILE_SIZE + LOWER_BORDER))
-
-    # Floor tiles with grass
-    for width in range(6):
-        for height in range(6):
-            tiles.append(Tile(assets["floor_tile"], width * TILE_SIZE - 200, height * TILE_SIZE - 200))
-
-    return tiles
-
-def draw_screen(screen, player_obj, enemy_handler, tiles):
-    """ Draw the screen using the tiles, dead enemies, player_projectiles, enemies, and player in
-    that specific order. """
-
-    # Draw the map tiles.
-    for tile in tiles:
-        tile.draw(screen, player_obj)
-
-    # Draw the dead enemies.
-    for dead_enemy in enemy_handler.dead_enemies:
-        dead_enemy.draw(screen, player_obj)
-
-    # Draw the player projectiles.
-    for projectile in player_obj.projectiles:
-        projectile.draw(screen, player_obj)
-
-    # Draw the enemies.
-    for enemy in enemy_handler.enemies:
-        enemy.draw(screen, player_obj)
-
-    # Draw the player and other player things
-    player_obj.draw(screen)
-    player_obj.display_healthbar(screen)
-    player_obj.display_kills(screen)
-
-    pygame.display.update()
\ No newline at end of file
+""" Load assets, create map and draw screen for the game. """
+
+import collections
+import math
+
+import pygame
+
+from config import *
+import asset_cache
+import camera
+import render
+import tilemap
+
+# How far moving things can be drawn from their position, so they aren't culled while partly on screen.
+# Enemies are drawn up to a step behind and projectiles also half of a player to the left and above.
+ENEMY_MARGIN = ENEMY_SPEED
+PROJECTILE_MARGIN = PROJECTILE_SPEED + PROJECTILE_SIZE + (PLAYER_SIZE / 2)
+
+class TileMap:
+    """ Draws a map file as chunk surfaces. Each chunk holds CHUNK_TILES by CHUNK_TILES tiles which are
+    read from the map file and drawn onto it the first time the chunk comes into view. The most recently
+    drawn CHUNK_CACHE_SIZE chunks are kept, so a map far bigger than the screen only keeps the chunks
+    around the player in memory. """
+
+    def __init__(self, map_obj, assets, cache_size=CHUNK_CACHE_SIZE):
+        if map_obj.tile_size != TILE_SIZE:
+            raise ValueError("{} has {} pixel tiles but the tile assets are {} pixels".format(
+                map_obj.path, map_obj.tile_size, TILE_SIZE))
+
+        self.map = map_obj
+        self.sprites = [assets[name] if name is not None else None for name in tilemap.TILES]
+        self.cache_size = cache_size
+        self.chunks = collections.OrderedDict()
+
+        # Number of chunks across and down the whole map.
+        self.columns = -(-map_obj.columns // CHUNK_TILES)
+        self.rows = -(-map_obj.rows // CHUNK_TILES)
+
+    def invalidate(self):
+        """ Throw away the chunks so they are drawn again the next time they are in view. """
+
+        self.chunks.clear()
+
+    def chunk(self, chunk_x, chunk_y):
+        """ Return the surface of the chunk, drawing it from the map file if it isn't kept. """
+
+        chunk = self.chunks.get((chunk_x, chunk_y))
+        if chunk is not None:
+            self.chunks.move_to_end((chunk_x, chunk_y))
+            return chunk
+
+        chunk = self.build(chunk_x, chunk_y)
+        self.chunks[(chunk_x, chunk_y)] = chunk
+        if len(self.chunks) > self.cache_size:
+            self.chunks.popitem(last=False)
+
+        return chunk
+
+    def build(self, chunk_x, chunk_y):
+        """ Draw the tiles of the chunk onto a new surface. """
+
+        chunk = pygame.Surface((CHUNK_TILES * TILE_SIZE, CHUNK_TILES * TILE_SIZE))
+
+        first_column = chunk_x * CHUNK_TILES
+        first_row = chunk_y * CHUNK_TILES
+        for row in range(first_row, first_row + CHUNK_TILES):
+            for offset, index in enumerate(self.map.row(row, first_column, first_column + CHUNK_TILES)):
+                if index:
+                    chunk.blit(self.sprites[index], (offset * TILE_SIZE, (row - first_row) * TILE_SIZE))
+
+        # Match the pixel format of the screen so drawing the chunk doesn't need a conversion.
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+
+        return chunk
+
+    def draw(self, render_queue, camera_obj):
+        """ Queue the chunks which are in the camera's view. """
+
+        chunk_size = CHUNK_TILES * TILE_SIZE
+        view_left, view_top, view_right, view_bottom = camera_obj.view()
+        left = max(int((view_left - self.map.origin_x) // chunk_size), 0)
+        right = min(int((view_right - self.map.origin_x) // chunk_size), self.columns - 1)
+        top = max(int((view_top - self.map.origin_y) // chunk_size), 0)
+        bottom = min(int((view_bottom - self.map.origin_y) // chunk_size), self.rows - 1)
+
+        drawn = 0
+        for chunk_x in range(left, right + 1):
+            for chunk_y in range(top, bottom + 1):
+                # Round down so tiles in the same chunk stay lined up on either side of the screen edge.
+                screen_x, screen_y = camera_obj.to_screen(self.map.origin_x + chunk_x * chunk_size,
+                                                          self.map.origin_y + chunk_y * chunk_size)
+                render_queue.submit(self.chunk(chunk_x, chunk_y), (math.floor(screen_x), math.floor(screen_y)), render.TILES)
+                drawn += 1
+
+        camera_obj.count("chunks", drawn, self.columns * self.rows - drawn)
+
+def load_assets(cache=None):
+    """ Load assets and return a dictionary with the name of the assets as the keys and the pygame image objects as the values.
+    Images are loaded through the asset cache so each file is only decoded and scaled once. """
+
+    if cache is None:
+        cache = asset_cache.AssetCache()
+
+    assets = dict()
+
+    # Load player assets
+    assets["player"] = cache.get("assets/player.png", (PLAYER_SIZE, PLAYER_SIZE))
+    assets["player_hit"] = cache.get("assets/shooter.png", (PLAYER_SIZE, PLAYER_SIZE))
+    assets["player_projectile"] = cache.get("assets/player.png", (PROJECTILE_SIZE, PROJECTILE_SIZE))
+    assets["gun"] = cache.get("assets/gun.png", (GUN_SIZE, GUN_SIZE))
+
+    # Load the enemy assets
+    assets["chaser"] = cache.get("assets/chaser.png", (ENEMY_SIZE, ENEMY_SIZE))
+    assets["shooter_projectile"] = cache.get("assets/shooter.png", (PROJECTILE_SIZE, PROJECTILE_SIZE))
+    assets["dead_enemy"] = cache.get("assets/shooter.png", (ENEMY_SIZE, ENEMY_SIZE))
+
+    # Load the map assets
+    assets["floor_tile"] = cache.get("assets/floor_tile.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile1"] = cache.get("assets/wall_tile1.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile2"] = cache.get("assets/wall_tile2.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile3"] = cache.get("assets/wall_tile3.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile4"] = cache.get("assets/wall_tile4.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile5"] = cache.get("assets/wall_tile5.png", (TILE_SIZE, TILE_SIZE))
+    assets["wall_tile6"] = cache.get("assets/wall_tile6.png", (TILE_SIZE, TILE_SIZE))
+
+    # Load the powerup assets
+    assets["heart"] = cache.get("assets/shooter.png", (POWERUP_SIZE, POWERUP_SIZE))
+
+    return assets
+
+def create_map(assets, map_obj=None):
+    """ Create the tile map which draws the map file, opening MAP_FILE if no map file is given. """
+
+    return TileMap(map_obj if map_obj is not None else tilemap.MapFile(), assets)
+
+def draw_screen(screen, player_obj, enemy_handler, tiles, hud, dirty_rects=None, overlays=(), alpha=1.0, camera_obj=None,
+                render_queue=None):
+    """ Draw the screen using the tiles, dead enemies, player_projectiles, enemies, enemy projectiles, player, HUD and overlays in
+    that specific order. If dirty rects are given, only the parts of the screen that changed
+    are updated. Moving things are drawn the fraction alpha of the way from their previous
+    position to their current one. Only the things in the camera's view are drawn and the
+    camera counts how many were drawn and culled. Everything but the overlays is queued in
+    layers and drawn with one call for each layer. """
+
+    # Everything is drawn relative to where the player is drawn.
+    if camera_obj is None:
+        camera_obj = camera.Camera()
+    camera_obj.follow(player_obj, alpha)
+    offset_x = camera_obj.offset_x
+    offset_y = camera_obj.offset_y
+
+    if render_queue is None:
+        render_queue = render.RenderQueue()
+
+    # Queue the map tiles.
+    tiles.draw(render_queue, camera_obj)
+
+    # Queue the dead enemies on screen.
+    dead_enemies = camera_obj.cull("dead_enemies", enemy_handler.dead_enemies_in(*camera_obj.view()),
+                                   len(enemy_handler.dead_enemies), ENEMY_SIZE)
+    render_queue.extend(render.DEAD_ENEMIES, [(dead_enemy.sprite, (dead_enemy.x + offset_x, dead_enemy.y + offset_y))
+                                              for dead_enemy in dead_enemies])
+
+    # Queue the player projectiles on screen turned in the direction they are going. There are few of them
+    # so they are all checked. Projectiles are drawn half of a player further left and up than their position.
+    for projectile in camera_obj.cull("projectiles", player_obj.projectiles, len(player_obj.projectiles),
+                                      PROJECTILE_SIZE, PROJECTILE_MARGIN):
+        surface, half_width, half_height = projectile.sprite.get(projectile.angle)
+        x = projectile.previous_x + (projectile.x - projectile.previous_x) * alpha + offset_x
+        y = projectile.previous_y + (projectile.y - projectile.previous_y) * alpha + offset_y
+        render_queue.submit(surface, (x - (PLAYER_SIZE / 2) + (PROJECTILE_SIZE / 2) - half_width,
+                                      y - (PLAYER_SIZE / 2) + (PROJECTILE_SIZE / 2) - half_height), render.PROJECTILES)
+
+    # Queue the enemies on screen.
+    visible_enemies = camera_obj.cull("enemies", enemy_handler.enemies_in(*camera_obj.view(ENEMY_MARGIN)),
+                                      len(enemy_handler.enemies), ENEMY_SIZE, ENEMY_MARGIN)
+    render_queue.extend(render.ENEMIES, [(enemy.sprite, (enemy.previous_x + (enemy.x - enemy.previous_x) * alpha + offset_x,
+                                                         enemy.previous_y + (enemy.y - enemy.previous_y) * alpha + offset_y))
+                                         for enemy in visible_enemies])
+
+    # Queue the enemy projectiles on screen, found for every projectile at once.
+    bullets = enemy_handler.bullets
+    if bullets is not None:
+        x, y = bullets.positions_in(*camera_obj.view(), alpha)
+        sprite = enemy_handler.sprites[2]
+        render_queue.extend(render.BULLETS, [(sprite, (bullet_x + offset_x, bullet_y + offset_y))
+                                             for bullet_x, bullet_y in zip(x, y)])
+        camera_obj.count("bullets", len(x), len(bullets) - len(x))
+
+    # Queue the player
+    player_obj.draw(render_queue)
+
+    # Queue the healthbar and kills on top
+    hud.draw(render_queue, player_obj)
+
+    # Only find the areas drawn over if the dirty rects need them.
+    rects = [] if dirty_rects is not None else None
+    render_queue.flush(screen, rects)
+
+    # Draw anything shown on top of the game like the performance overlay.
+    for overlay in overlays:
+        rect = overlay.draw(screen)
+        if rect is not None and rects is not None:
+            rects.append(rect)
+
+    if dirty_rects is None:
+        pygame.display.update()
+    else:
+        dirty_rects.update(rects, (camera_obj.x, camera_obj.y))
+
+class DirtyRects:
+    """ Remembers where things were drawn last frame so only the parts of the screen where something
+    was drawn this frame or last frame are updated. Everything is updated when the camera moves since
+    the whole map moves with it. """
+
+    def __init__(self):
+        self.previous = []
+        self.camera = None
+
+    def update(self, rects, camera):
+        """ Update the parts of the screen drawn over this frame and last frame. """
+
+        if camera != self.camera:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.previous + rects)
+
+        self.previous = rects
+        self.camera = camera
\ No newline at end of file
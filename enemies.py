@@ -1,275 +1,487 @@
-""" Spawn and chase behaviour for enemies. """
-
-import math
-import random
-
-from config import *
-import player
-
-class EnemyHandler:
-    """ Holds lists of enemies and important values for enemies. """
-
-    def __init__(self, sprites):
-        self.sprites = sprites
-
-        self.spawn_timer = SPAWN_TIMER
-
-        self.enemies = []
-        self.dead_enemies = []
-
-    def spawn(self, player_obj):
-        """ If the parameters are satisfied, spawn an enemy. The location for the enemy spawn
-        is handled inside of spawn enemy. """
-
-        if self.spawn_timer == 0:
-            if len(self.enemies) < MAX_ENEMIES:
-
-                # This is required in case the random spawn quadrant is an invalid location.
-                picking_quadrant = True
-                while picking_quadrant:
-                    spawn_quadrant = random.randint(1, 4)
-
-                    # Spawn left of player.
-                    if spawn_quadrant == 1:
-                        picking_quadrant = self.horizontal_spawn_area(
-                        round(player_obj.x - (SCREEN_SIZE / 2)),
-                        LEFT_BORDER,
-                        UPPER_BORDER,
-                        LOWER_BORDER - ENEMY_SIZE)
-
-                    # Spawn right of player.
-                    if spawn_quadrant == 2:
-                        picking_quadrant = self.horizontal_spawn_area(
-                        RIGHT_BORDER - ENEMY_SIZE, 
-                        round(player_obj.x + (SCREEN_SIZE / 2)), 
-                        UPPER_BORDER, 
-                        LOWER_BORDER - ENEMY_SIZE)
-
-                    # Spawn above player.
-                    if spawn_quadrant == 3:
-                        picking_quadrant = self.vertical_spawn_area(
-                        RIGHT_BORDER - ENEMY_SIZE,
-                        LEFT_BORDER,
-                        UPPER_BORDER,
-                        round(player_obj.y - (SCREEN_SIZE / 2)))
-
-                    # Spawn below player.
-                    if spawn_quadrant == 4:
-                        picking_quadrant = self.vertical_spawn_area(
-                        RIGHT_BORDER - ENEMY_SIZE,
-                        LEFT_BORDER,
-                        round(player_obj.y + (SCREEN_SIZE / 2)), 
-                        LOWER_BORDER - ENEMY_SIZE)
-
-            # Have some variance in spawn rates.
-            self.spawn_timer = SPAWN_TIMER + random.randint(-5, 5)
-
-    def horizontal_spawn_area(self, a, b, c, d):
-        """ Definitely not nice to read but for now this works. Right now to understand how this works,
-        your gonna have to look in the spawn enemy function and look at the function call arguments. """
-
-        if a > b:
-            
-            while True:
-                x_position = random.randint(b, a)
-                y_position = random.randint(c, d)
-                # Check if the potential spawn location overlaps another enemy. If not, create the enemy.
-                overlap = self.spawn_overlap(x_position, y_position)
-                if not overlap:
-                    self.enemies.append(Chaser(self.sprites[0], x_position, y_position))
-                    return False
-
-        return True
-
-    def vertical_spawn_area(self, a, b, c, d):
-        """ Definitely not nice to read but for now this works. Right now to understand how this works,
-        your gonna have to look in the spawn enemy function and look at the function call arguments. """
-
-        if d > c:
-            
-            while True:
-                x_position = random.randint(b, a)
-                y_position = random.randint(c, d)
-                # Check if the potential spawn location overlaps another enemy. If not, create the enemy.
-                overlap = self.spawn_overlap(x_position, y_position)
-                if not overlap:
-                    self.enemies.append(Chaser(self.sprites[0], x_position, y_position))
-                    return False
-
-        return True
-
-    def spawn_overlap(self, x_position, y_position):
-        """ Check that the spawning enemy does not overlap with another enemy. If it does overlap,
-        return true. """
-
-        # Get points on potential position.
-        points = [(x_position, y_position),
-                  (x_position + ENEMY_SIZE, y_position),
-                  (x_position, y_position + ENEMY_SIZE),
-                  (x_position + ENEMY_SIZE, y_position + ENEMY_SIZE)]
-
-        # Check if potential points overlap with another enemy.
-        for enemy in self.enemies:
-            for point in points:
-                if (point[0] > enemy.x and point[0] < enemy.x + ENEMY_SIZE and 
-                    point[1] > enemy.y and point[1] < enemy.y + ENEMY_SIZE):
-                    return True
-
-        return False
-
-    def update(self, player_obj):
-        """ Calls the chase method for each enemy along with some values that
-        need to be decreased by one for every iteration. """
-
-        ordered_enemies = player.closest_enemy(player_obj, self.enemies)
-
-        # Chase the player
-        for enemy in ordered_enemies:
-            enemy.chase(player_obj, self.enemies)
-
-            # Decrease the time going in a slightly random direction
-            if enemy.random_direction_time > 0:
-                enemy.random_direction_time -= 1
-
-        # Decrease the time till next spawn
-        if self.spawn_timer > 0:
-            self.spawn_timer -= 1
-
-        for dead_enemy in self.dead_enemies:
-            # Decrease the time a dead enemy is visible for
-            if dead_enemy.death_time > 0:
-                dead_enemy.death_time -= 1
-            # Delete the enemy if that time hits zero
-            else:
-                self.dead_enemies.remove(dead_enemy)
-
-class Chaser:
-    """ One of the enemy types inside of the enemy handler. Chases the player
-    and makes attempt to hit them. """
-
-    def __init__(self, sprite, x, y):
-        self.sprite = sprite
-        self.x = x
-        self.y = y
-        self.distance = 0
-        self.random_direction = 0
-        self.random_direction_time = 0
-
-    def draw(self, screen, player_obj):
-        """ Draw the chaser enemy relative to the player. """
-
-        # Need to get the displacement of the player from the initial position to determine where the sprite should be drawn
-        # relative to the player. 
-        screen.blit(self.sprite, (self.x - player_obj.x + (SCREEN_SIZE / 2), self.y - player_obj.y + (SCREEN_SIZE / 2)))
-
-    def player_distance(self, player_obj):
-        """ Return the absolute distance to from the player. """
-
-        # Pythagorean Theorem
-        return math.sqrt(((player_obj.x - self.x) ** 2) + ((player_obj.y - self.y) ** 2))
-
-    def chase(self, player_obj, enemies):
-        """ Chase the player by obtaining the angle between the enemy and the player. Also, apply a bit of randomness
-        in that direction whilst not allowing the enemy to exit the bounds or enter another enemy. Also checks if the
-        enemy has collided with the player. """
-
-        # Get the angle between the player and the enemy for direction to chase in.
-        # Also, apply some randomness to the direction.
-        angle = math.atan2(player_obj.y - self.y - (PLAYER_SIZE / 2), player_obj.x - self.x - (PLAYER_SIZE / 2))
-        if self.random_direction_time == 0:
-            self.random_direction = random.uniform(-math.pi / 3, math.pi / 3)
-            self.random_direction_time = ENEMY_RANDOM_DIRECTION_TIME
-        angle += self.random_direction
-
-        # Apply the position change
-        self.x += ENEMY_SPEED * math.cos(angle)
-        self.y += ENEMY_SPEED * math.sin(angle)
-
-        # Check if the position change the enemy it out of bounds
-        self.check_bounds(angle)
-
-        # Get points on the enemy after the position change
-        points = [(self.x, self.y),
-                  (self.x + ENEMY_SIZE, self.y),
-                  (self.x, self.y + ENEMY_SIZE),
-                  (self.x + ENEMY_SIZE, self.y + ENEMY_SIZE)]
-
-        # Check if the position change causes overlap with other enemies
-        self.prevent_overlap(enemies, points, angle)
-
-        # Check if the position change causes overlap with the player
-        if player_obj.invincibility == 0:
-            self.check_hit_player(player_obj, points)
-
-    def check_shot(self, player_obj, enemy_handler, projectile, points):
-        """ Check if the enemy has been shot by the player by checking the points in the projectile
-        passed into the function. If so, add the enemy to the dead enemies and increment the kills. """
-
-        # Check for collision.
-        for point in points:
-            if (point[0] - (ENEMY_SIZE / 2) > self.x and point[0] < self.x + ENEMY_SIZE and 
-                point[1] > self.y and point[1] - (ENEMY_SIZE / 2) < self.y + ENEMY_SIZE):
-
-                # Actions for if enemy has been shot.
-                player_obj.kills += 1
-                enemy_handler.dead_enemies.append(Dead_Enemies(enemy_handler.sprites[1], self.x, self.y, projectile.angle))
-                enemy_handler.enemies.remove(self)
-                player_obj.projectiles.remove(projectile)
-                # Return true that the enemy has been shot
-                return True
-
-        return False
-
-    def check_bounds(self, angle):
-        """ Check if enemy exits the boundaries of the map. If so, undo the x or y change. """
-
-        if self.x < LEFT_BORDER or self.x > RIGHT_BORDER - ENEMY_SIZE:
-            self.x -= ENEMY_SPEED * math.cos(angle)
-        if self.y < UPPER_BORDER or self.y > LOWER_BORDER - ENEMY_SIZE:
-            self.y -= ENEMY_SPEED * math.sin(angle)
-
-    def prevent_overlap(self, enemies, points, angle):
-        """ Prevent overlap with other enemies by comparing the points on the enemy's new position
-        and every other enemy spawned. """
-
-        for enemy in enemies:
-            if enemy != self:
-                for point in points:
-                    # If there is overlap, move the enemy back from the position.
-                    if (point[0] > enemy.x and point[0] < enemy.x + ENEMY_SIZE and 
-                        point[1] > enemy.y and point[1] < enemy.y + ENEMY_SIZE):
-                        self.x -= ENEMY_SPEED * math.cos(angle)
-                        self.y -= ENEMY_SPEED * math.sin(angle)
-                        return
-
-    def check_hit_player(self, player_obj, points):
-        """ Check if the enemy comes in contact with the player. """
-
-        # Check for collisions with player.
-        for point in points:
-            if (point[0] + (PLAYER_SIZE / 2) > player_obj.x and point[0] < player_obj.x + (PLAYER_SIZE / 2) and
-                point[1] + (PLAYER_SIZE / 2) > player_obj.y and point[1] < player_obj.y + (PLAYER_SIZE / 2)):
-                # Damage the player and give invincibility.
-                player_obj.health -= ENEMY_DAMAGE
-                player_obj.invincibility = PLAYER_INVINCIBILITY
-                return
-
-class Dead_Enemies:
-
-    def __init__(self, sprite, x, y, angle):
-        self.sprite = sprite
-        self.x = x
-        self.y = y
-        self.angle = angle
-        self.death_time = ENEMY_DEATH_TIME
-
-        # Apply knockback to the enemy using the projectile angle.
-        self.x += PLAYER_KNOCKBACK * math.cos(angle)
-        self.y += PLAYER_KNOCKBACK * math.sin(angle)
-
-    def draw(self, screen, player):
-        """ Draw the dead enemy relative to the player. """
-
-        # Need to get the displacement of the player from the initial position to determine where the sprite should be drawn
-        # relative to the player. 
-        screen.blit(self.sprite, (self.x - player.x + (SCREEN_SIZE / 2), self.y - player.y + (SCREEN_SIZE / 2)))
\ No newline at end of file
+""" Spawn and chase behaviour for enemies. """
+
+import array
+import heapq
+import math
+import operator
+import random
+
+from config import *
+import flowfield
+import pool
+import savestate
+import scheduler
+import spatial
+import spawning
+import tilemap
+
+def create_enemy_handler(sprites, backend=ENEMY_BACKEND, rng=None, scheduler_obj=None, pathfinding=ENEMY_PATHFINDING,
+                         map_obj=None, shooting=ENEMY_SHOOTING):
+    """ Create the enemy handler for the backend. The array backend needs NumPy so it is only
+    imported when it is used. """
+
+    if backend == "object":
+        return EnemyHandler(sprites, rng, scheduler_obj, pathfinding, map_obj, shooting)
+
+    if backend == "array":
+        import swarm
+        return swarm.ArrayEnemyHandler(sprites, rng, scheduler_obj, pathfinding, map_obj, shooting)
+
+    raise ValueError("Unknown enemy backend: {}".format(backend))
+
+class EnemyHandler:
+    """ Holds lists of enemies and important values for enemies. """
+
+    def __init__(self, sprites, rng=None, scheduler_obj=None, pathfinding=ENEMY_PATHFINDING, map_obj=None,
+                 shooting=ENEMY_SHOOTING):
+        self.sprites = sprites
+
+        # The map whose borders enemies stay inside of and whose floor they walk on.
+        self.map = map_obj if map_obj is not None else tilemap.MapFile()
+
+        # Random number generator for spawning and chasing, seeded to make a run repeatable.
+        self.rng = rng if rng is not None else random.Random()
+
+        # Removes dead enemies when their time is up and tells enemies when to pick a new direction.
+        self.scheduler = scheduler_obj if scheduler_obj is not None else scheduler.Scheduler()
+
+        self.spawn_tick = 0
+        self.spawn_timer = SPAWN_TIMER
+        self.max_enemies = MAX_ENEMIES
+
+        self.enemies = pool.EntityPool(Chaser)
+        self.dead_enemies = pool.EntityPool(Dead_Enemies)
+
+        # Enemies bucketed by position so only neighbouring enemies are checked for overlap. The spawn
+        # sampler follows the grid to know where enemies can spawn.
+        self.sampler = spawning.SpawnSampler(self.map, ENEMY_SIZE)
+        self.grid = spatial.SpatialGrid(ENEMY_SIZE, self.sampler)
+
+        # Keeps the enemies ordered by distance from the player and finds the enemies projectiles hit.
+        self.proximity = spatial.ProximityIndex(self.grid)
+
+        # Dead enemies bucketed by position so only the ones on screen are drawn.
+        self.dead_grid = spatial.SpatialGrid(ENEMY_SIZE)
+
+        # Directions towards the player around blocked tiles, shared by every enemy.
+        if pathfinding == "direct":
+            self.flow_field = None
+        elif pathfinding == "flow_field":
+            self.flow_field = flowfield.FlowField(flowfield.NavigationGrid(self.map))
+        else:
+            raise ValueError("Unknown pathfinding: {}".format(pathfinding))
+
+        # Projectiles shot at the player. They need NumPy so it is only imported when enemies shoot.
+        self.bullets = None
+        self.shoot_tick = ENEMY_SHOOT_COOLDOWN
+        if shooting:
+            import bullets
+            self.bullets = bullets.BulletBuffer()
+
+    def spawn(self, player_obj):
+        """ If the spawn timer is up, spawn up to SPAWN_BATCH enemies in free places off screen. Returns how
+        many enemies were spawned. If there is no free place left, fewer enemies are spawned instead of
+        waiting for one. """
+
+        spawned = 0
+        if self.spawn_timer == 0:
+            while spawned < SPAWN_BATCH and len(self.enemies) < self.max_enemies:
+                position = self.sampler.sample(self.rng, player_obj)
+                if position is None:
+                    break
+
+                self.add_enemy(*position)
+                spawned += 1
+
+            # Have some variance in spawn rates.
+            self.spawn_timer = SPAWN_TIMER + self.rng.randint(-5, 5)
+
+        return spawned
+
+    @property
+    def spawn_timer(self):
+        """ Ticks left until the next spawn. """
+
+        return self.scheduler.remaining(self.spawn_tick)
+
+    @spawn_timer.setter
+    def spawn_timer(self, ticks):
+        self.spawn_tick = self.scheduler.tick + ticks
+
+    def add_enemy(self, x_position, y_position):
+        """ Create a chaser at the position and add it to the enemies and the grid. """
+
+        enemy = self.enemies.spawn(self.sprites[0], x_position, y_position)
+        self.grid.insert(enemy)
+        self.proximity.add(enemy)
+
+    def add_dead_enemy(self, x_position, y_position, angle):
+        """ Create a dead enemy at the position and remove it again once its time is up. """
+
+        # Dead enemies are shown for ENEMY_DEATH_TIME ticks after the tick they died on.
+        dead_enemy = self.dead_enemies.spawn(self.sprites[1], x_position, y_position, angle)
+        self.dead_grid.insert(dead_enemy)
+        dead_enemy.removal = self.scheduler.schedule(ENEMY_DEATH_TIME + 1, self.remove_dead_enemy, dead_enemy)
+
+    def remove_dead_enemy(self, dead_enemy):
+        """ Remove the dead enemy once its time is up. """
+
+        self.dead_enemies.remove(dead_enemy)
+        self.dead_grid.remove(dead_enemy)
+
+    def kill(self, enemy, angle):
+        """ Replace the enemy with a dead enemy knocked back in the direction of the angle. """
+
+        self.add_dead_enemy(enemy.x, enemy.y, angle)
+        self.enemies.remove(enemy)
+        self.grid.remove(enemy)
+        self.proximity.remove(enemy)
+
+    def shoot_enemies(self, player_obj, hits):
+        """ Kill every enemy that was hit along with the projectile that hit it and increment the kills. """
+
+        for enemy, projectile in hits:
+            player_obj.kills += 1
+            self.kill(enemy, projectile.angle)
+            player_obj.projectiles.remove(projectile)
+
+    def write_positions(self, buffer):
+        """ Add the position and previous position of every enemy to the end of the buffer. """
+
+        buffer.extend(value for enemy in self.enemies
+                      for value in (enemy.x, enemy.y, enemy.previous_x, enemy.previous_y))
+
+    def clear(self):
+        """ Remove every enemy, dead enemy and enemy projectile. """
+
+        self.enemies.clear()
+        self.clear_dead_enemies()
+        self.clear_bullets()
+        self.grid.clear()
+        self.proximity.clear()
+
+    def reseed(self):
+        """ Called after the shared random number generator was reseeded. The object handler only
+        uses the shared generator. """
+
+        pass
+
+    def clear_bullets(self):
+        """ Remove every enemy projectile and start waiting to shoot again. """
+
+        if self.bullets is not None:
+            self.bullets.clear()
+        self.shoot_tick = self.scheduler.tick + ENEMY_SHOOT_COOLDOWN
+
+    def clear_dead_enemies(self):
+        """ Remove every dead enemy and cancel their removals so a reused dead enemy isn't removed early. """
+
+        for dead_enemy in self.dead_enemies:
+            dead_enemy.removal.cancel()
+        self.dead_enemies.clear()
+        self.dead_grid.clear()
+
+    def capture(self, writer):
+        """ Add the enemies, dead enemies and enemy projectiles to a saved state. """
+
+        writer.pack(savestate.HANDLER, self.spawn_tick, self.shoot_tick)
+        self.capture_enemies(writer)
+
+        # Dead enemies due on the same tick are removed in the order their removals were scheduled in,
+        # so the order is saved as well as the tick.
+        order = {event: position for tick, position, event in self.scheduler.queue}
+        dead_enemies = self.dead_enemies.entities
+        writer.pack(savestate.COUNT, len(dead_enemies), self.dead_enemies.next_id)
+        writer.array(self.dead_enemies.pack(Dead_Enemies.SAVED))
+        writer.array(self.dead_enemies.pack(Dead_Enemies.SAVED_INTEGERS, "q"))
+        writer.array(self.dead_enemies.pack(("removal.tick",), "q"))
+        writer.array(array.array("q", sorted(range(len(dead_enemies)),
+                                             key=lambda index: order[dead_enemies[index].removal])))
+
+        if self.bullets is not None:
+            self.bullets.capture(writer)
+
+    def restore(self, reader):
+        """ Read the enemies, dead enemies and enemy projectiles back from a saved state. The scheduler
+        has to be at the saved tick already. """
+
+        self.spawn_tick, self.shoot_tick = reader.unpack(savestate.HANDLER)
+        self.restore_enemies(reader)
+
+        for dead_enemy in self.dead_enemies:
+            dead_enemy.removal.cancel()
+        self.dead_grid.clear()
+        count, next_id = reader.unpack(savestate.COUNT)
+        next_id = reader.next_id(next_id, self.dead_enemies.next_id)
+        self.dead_enemies.restore(count, next_id, (self.sprites[1], 0.0, 0.0, 0.0),
+                                  (Dead_Enemies.SAVED, reader.array("d")),
+                                  (Dead_Enemies.SAVED_INTEGERS, reader.array("q")))
+        removals = reader.array("q")
+        order = reader.array("q")
+
+        for dead_enemy in self.dead_enemies.entities:
+            self.dead_grid.insert(dead_enemy)
+        for index in order:
+            dead_enemy = self.dead_enemies[index]
+            dead_enemy.removal = self.scheduler.schedule(removals[index] - self.scheduler.tick, self.remove_dead_enemy,
+                                                         dead_enemy)
+
+        if self.bullets is not None:
+            self.bullets.restore(reader)
+
+        # Search the flow field again on the next update since the player may be somewhere else.
+        if self.flow_field is not None:
+            self.flow_field.target = None
+
+    def capture_enemies(self, writer):
+        """ Add the enemies to a saved state along with the order the grid and the proximity index keep
+        them in and the free spawn cells, which all decide what happens next. The grid order is saved as
+        every enemy's place in its cell, which is almost always the first. """
+
+        enemies = self.enemies.entities
+        writer.pack(savestate.COUNT, len(enemies), self.enemies.next_id)
+        writer.array(self.enemies.pack(Chaser.SAVED))
+        writer.array(self.enemies.pack(Chaser.SAVED_INTEGERS, "q"))
+
+        ranks = array.array("q", bytes(8 * len(enemies)))
+        for bucket in self.grid.cells.values():
+            for rank in range(1, len(bucket)):
+                ranks[bucket[rank].index] = rank
+        writer.array(ranks)
+
+        if self.proximity.removed:
+            ordered = [enemy for enemy in self.proximity.ordered if enemy not in self.proximity.removed]
+        else:
+            ordered = self.proximity.ordered
+        writer.array(array.array("q", map(operator.attrgetter("index"), ordered)))
+        self.sampler.capture(writer)
+
+    def restore_enemies(self, reader):
+        """ Read the enemies back from a saved state and put them back in the grid and proximity index in
+        the same order. Enemies still in their cell in the same order aren't touched in the grid, so
+        rolling back a few ticks only moves the enemies that changed cell. """
+
+        count, next_id = reader.unpack(savestate.COUNT)
+        saved = reader.array("d")
+        next_id = reader.next_id(next_id, self.enemies.next_id)
+        removed = self.enemies.restore(count, next_id, (self.sprites[0], 0.0, 0.0),
+                                       (Chaser.SAVED, saved), (Chaser.SAVED_INTEGERS, reader.array("q")))
+        ranks = reader.array("q")
+        proximity_order = reader.array("q")
+
+        # Work out every enemy's cell from the saved positions, the first two of the saved fields.
+        enemies = self.enemies.entities
+        cell_size = self.grid.cell_size
+        keys = [(int(x // cell_size), int(y // cell_size))
+                for x, y in zip(saved[0::len(Chaser.SAVED)], saved[1::len(Chaser.SAVED)])]
+
+        # Build the cells with the first enemy of every cell, then add the others in the order of their places.
+        cells = {key: [enemy] for enemy, key, rank in zip(enemies, keys, ranks) if not rank}
+        for index in sorted((index for index in range(count) if ranks[index]), key=ranks.__getitem__):
+            cells[keys[index]].append(enemies[index])
+
+        # Enemies that are gone leave every cell they were in, since their cells are replaced or removed.
+        for enemy in removed:
+            enemy.cell = None
+        self.grid.restore(cells)
+
+        self.proximity.clear()
+        self.proximity.ordered = list(map(enemies.__getitem__, proximity_order))
+
+        self.sampler.restore(reader)
+
+    def enemies_in(self, left, top, right, bottom):
+        """ Return the enemies which may overlap the rectangle, in the order the enemies are kept in. """
+
+        return sorted(self.grid.query(left, top, right, bottom), key=operator.attrgetter("index"), reverse=True)
+
+    def dead_enemies_in(self, left, top, right, bottom):
+        """ Return the dead enemies which may overlap the rectangle, oldest first so the newest are drawn on top. """
+
+        return sorted(self.dead_grid.query(left, top, right, bottom), key=operator.attrgetter("id"))
+
+    def centers_in(self, left, top, right, bottom):
+        """ Return lists of the x and y of the centers of the enemies overlapping the rectangle. """
+
+        found = [enemy for enemy in self.grid.query(left, top, right, bottom)
+                 if enemy.x + ENEMY_SIZE > left and enemy.x < right and enemy.y + ENEMY_SIZE > top and enemy.y < bottom]
+        return [enemy.x + (ENEMY_SIZE / 2) for enemy in found], [enemy.y + (ENEMY_SIZE / 2) for enemy in found]
+
+    def ids_in(self, left, top, right, bottom, limit=None):
+        """ Return lists of the ids, x and y of the enemies overlapping the rectangle. If there are more than
+        the limit, only the limit closest to the center of the rectangle are returned. """
+
+        found = [enemy for enemy in self.grid.query(left, top, right, bottom)
+                 if enemy.x + ENEMY_SIZE > left and enemy.x < right and enemy.y + ENEMY_SIZE > top and enemy.y < bottom]
+        if limit is not None and len(found) > limit:
+            center_x = (left + right - ENEMY_SIZE) / 2
+            center_y = (top + bottom - ENEMY_SIZE) / 2
+            found = heapq.nsmallest(limit, found, key=lambda enemy: (enemy.x - center_x) ** 2 + (enemy.y - center_y) ** 2)
+        return [enemy.id for enemy in found], [enemy.x for enemy in found], [enemy.y for enemy in found]
+
+    def update_bullets(self, player_obj):
+        """ If the shoot timer is up, every enemy on screen shoots at the player. Then move the enemy
+        projectiles, remove the ones that left the map and check if any hit the player. """
+
+        if self.bullets is None:
+            return
+
+        if self.scheduler.tick >= self.shoot_tick:
+            x, y = self.centers_in(player_obj.x - (SCREEN_SIZE / 2), player_obj.y - (SCREEN_SIZE / 2),
+                                   player_obj.x + (SCREEN_SIZE / 2), player_obj.y + (SCREEN_SIZE / 2))
+            self.bullets.shoot_at(x, y, player_obj.x, player_obj.y)
+            self.shoot_tick = self.scheduler.tick + ENEMY_SHOOT_COOLDOWN
+
+        self.bullets.update(player_obj, self.map)
+
+    def proximity_index(self):
+        """ Return the index used to find which enemies the projectiles hit. """
+
+        return self.proximity
+
+    def update(self, player_obj):
+        """ Calls the chase method for each enemy, closest to the player first. """
+
+        ordered_enemies = self.proximity.update(player_obj.x, player_obj.y)
+
+        # Search the flow field again if the player moved to another cell.
+        if self.flow_field is not None:
+            self.flow_field.update(player_obj.x, player_obj.y)
+
+        # Chase the player
+        for enemy in ordered_enemies:
+            enemy.chase(player_obj, self.grid, self.rng, self.scheduler.tick, self.map, self.flow_field)
+
+class Chaser:
+    """ One of the enemy types inside of the enemy handler. Chases the player
+    and makes attempt to hit them. """
+
+    __slots__ = ("sprite", "x", "y", "previous_x", "previous_y", "cell", "distance", "random_direction",
+                 "reroll_tick", "index", "id")
+
+    # Fields kept in a saved state, as doubles and as integers.
+    SAVED = ("x", "y", "previous_x", "previous_y", "random_direction")
+    SAVED_INTEGERS = ("reroll_tick", "id")
+
+    def __init__(self, sprite, x, y):
+        self.sprite = sprite
+        self.x = x
+        self.y = y
+        self.previous_x = x
+        self.previous_y = y
+        self.cell = None
+        self.distance = 0
+        self.random_direction = 0
+
+        # Tick to pick a new random direction on.
+        self.reroll_tick = 0
+
+        # Place in the pool of enemies and the id the pool gave it.
+        self.index = -1
+        self.id = -1
+
+    def chase(self, player_obj, grid, rng, tick, map_obj, flow_field=None):
+        """ Chase the player by obtaining the angle between the enemy and the player. Also, apply a bit of randomness
+        in that direction whilst not allowing the enemy to exit the bounds or enter another enemy. Also checks if the
+        enemy has collided with the player. If there is a flow field, the enemy follows it from its center instead of
+        heading straight for the player. """
+
+        # Remember where the enemy was for drawing in between updates.
+        self.previous_x = self.x
+        self.previous_y = self.y
+
+        # Get the angle between the player and the enemy for direction to chase in.
+        # Also, apply some randomness to the direction.
+        angle = None
+        if flow_field is not None:
+            angle = flow_field.direction(self.x + (ENEMY_SIZE / 2), self.y + (ENEMY_SIZE / 2))
+        if angle is None:
+            angle = math.atan2(player_obj.y - self.y - (PLAYER_SIZE / 2), player_obj.x - self.x - (PLAYER_SIZE / 2))
+        if tick >= self.reroll_tick:
+            self.random_direction = rng.uniform(-math.pi / 3, math.pi / 3)
+            self.reroll_tick = tick + ENEMY_RANDOM_DIRECTION_TIME
+        angle += self.random_direction
+
+        # Apply the position change
+        self.x += ENEMY_SPEED * math.cos(angle)
+        self.y += ENEMY_SPEED * math.sin(angle)
+
+        # Check if the position change the enemy it out of bounds
+        self.check_bounds(angle, map_obj)
+
+        # Get points on the enemy after the position change
+        points = [(self.x, self.y),
+                  (self.x + ENEMY_SIZE, self.y),
+                  (self.x, self.y + ENEMY_SIZE),
+                  (self.x + ENEMY_SIZE, self.y + ENEMY_SIZE)]
+
+        # Check if the position change causes overlap with other enemies
+        self.prevent_overlap(grid, points, angle)
+
+        # Keep the grid up to date with the final position
+        grid.move(self)
+
+        # Check if the position change causes overlap with the player
+        if player_obj.invincibility == 0:
+            self.check_hit_player(player_obj, grid, points)
+
+    def check_bounds(self, angle, map_obj):
+        """ Check if enemy exits the boundaries of the map. If so, undo the x or y change. """
+
+        if self.x < map_obj.left or self.x > map_obj.right - ENEMY_SIZE:
+            self.x -= ENEMY_SPEED * math.cos(angle)
+        if self.y < map_obj.top or self.y > map_obj.bottom - ENEMY_SIZE:
+            self.y -= ENEMY_SPEED * math.sin(angle)
+
+    def prevent_overlap(self, grid, points, angle):
+        """ Prevent overlap with other enemies by comparing the points on the enemy's new position
+        and every other enemy in the neighbouring cells of the grid. """
+
+        for enemy in grid.query(self.x, self.y, self.x + ENEMY_SIZE, self.y + ENEMY_SIZE):
+            if enemy != self:
+                for point in points:
+                    # If there is overlap, move the enemy back from the position.
+                    if (point[0] > enemy.x and point[0] < enemy.x + ENEMY_SIZE and 
+                        point[1] > enemy.y and point[1] < enemy.y + ENEMY_SIZE):
+                        self.x -= ENEMY_SPEED * math.cos(angle)
+                        self.y -= ENEMY_SPEED * math.sin(angle)
+                        return
+
+    def check_hit_player(self, player_obj, grid, points):
+        """ Check if the enemy comes in contact with the player. """
+
+        # Enemies outside of the cells neighbouring the player can't reach the player.
+        if not grid.near(self, player_obj.x - (PLAYER_SIZE / 2), player_obj.y - (PLAYER_SIZE / 2),
+                         player_obj.x + (PLAYER_SIZE / 2), player_obj.y + (PLAYER_SIZE / 2)):
+            return
+
+        # Check for collisions with player.
+        for point in points:
+            if (point[0] + (PLAYER_SIZE / 2) > player_obj.x and point[0] < player_obj.x + (PLAYER_SIZE / 2) and
+                point[1] + (PLAYER_SIZE / 2) > player_obj.y and point[1] < player_obj.y + (PLAYER_SIZE / 2)):
+                # Damage the player and give invincibility.
+                player_obj.health -= ENEMY_DAMAGE
+                player_obj.invincibility = PLAYER_INVINCIBILITY
+                return
+
+class Dead_Enemies:
+
+    __slots__ = ("sprite", "x", "y", "angle", "removal", "cell", "index", "id")
+
+    # Fields kept in a saved state, as doubles and as integers. When it is removed is saved by the handler.
+    SAVED = ("x", "y", "angle")
+    SAVED_INTEGERS = ("id",)
+
+    def __init__(self, sprite, x, y, angle):
+        self.sprite = sprite
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.removal = None
+        self.cell = None
+        self.index = -1
+        self.id = -1
+
+        # Apply knockback to the enemy using the projectile angle.
+        self.x += PLAYER_KNOCKBACK * math.cos(angle)
+        self.y += PLAYER_KNOCKBACK * math.sin(angle)
\ No newline at end of file
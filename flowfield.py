@@ -0,0 +1,157 @@
+""" Navigation grid and flow field used to steer every enemy towards the player around obstacles. """
+
+import array
+import heapq
+import math
+
+from config import *
+import tilemap
+
+# Neighbouring cells and the cost of stepping to them. Diagonal steps cost the length of the diagonal.
+NEIGHBOURS = ((1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2)))
+
+class NavigationGrid:
+    """ Square cells covering the area inside of the map's borders which are either walkable or blocked.
+    Cells completely covered by tiles enemies can walk on are walkable and every other cell is blocked. """
+
+    def __init__(self, map_obj, cell_size=ENEMY_SIZE):
+        self.cell_size = cell_size
+        self.left = map_obj.left
+        self.top = map_obj.top
+        self.columns = int(math.ceil((map_obj.right - map_obj.left) / cell_size))
+        self.rows = int(math.ceil((map_obj.bottom - map_obj.top) / cell_size))
+        self.mark(map_obj)
+        self.link()
+
+    def cell(self, x, y):
+        """ Return the column and row of the cell containing the position, kept inside of the grid. """
+
+        column = min(max(int((x - self.left) // self.cell_size), 0), self.columns - 1)
+        row = min(max(int((y - self.top) // self.cell_size), 0), self.rows - 1)
+        return column, row
+
+    def is_walkable(self, column, row):
+        """ Check if the cell is inside of the grid and walkable. """
+
+        return 0 <= column < self.columns and 0 <= row < self.rows and self.walkable[row * self.columns + column]
+
+    def link(self):
+        """ Find the steps that can be taken from every cell, kept as the index of the cell stepped to,
+        the cost of the step and its angle. Steps never cut the corner of a blocked cell, since an enemy
+        as big as a cell would clip it. """
+
+        self.links = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                steps = []
+                if self.walkable[row * self.columns + column]:
+                    for column_change, row_change, cost in NEIGHBOURS:
+                        if not self.is_walkable(column + column_change, row + row_change):
+                            continue
+                        if column_change and row_change and not (self.is_walkable(column + column_change, row) and
+                                                                 self.is_walkable(column, row + row_change)):
+                            continue
+                        steps.append(((row + row_change) * self.columns + column + column_change, cost,
+                                      math.atan2(row_change, column_change)))
+                self.links.append(steps)
+
+    def mark(self, map_obj):
+        """ Make the cells completely covered by walkable tiles walkable. Cells touched by any other
+        tile are blocked even if a walkable tile covers them too. """
+
+        self.walkable = bytearray(self.columns * self.rows)
+
+        for walkable in (True, False):
+            for x, y, index in map_obj.tiles():
+                if (index in tilemap.WALKABLE) != walkable:
+                    continue
+
+                left = (x - self.left) / self.cell_size
+                top = (y - self.top) / self.cell_size
+                right = (x + map_obj.tile_size - self.left) / self.cell_size
+                bottom = (y + map_obj.tile_size - self.top) / self.cell_size
+
+                # Walkable tiles only set the cells inside of them, blocked tiles every cell they touch.
+                if walkable:
+                    columns = range(max(math.ceil(left), 0), min(math.floor(right), self.columns))
+                    rows = range(max(math.ceil(top), 0), min(math.floor(bottom), self.rows))
+                else:
+                    columns = range(max(math.floor(left), 0), min(math.ceil(right), self.columns))
+                    rows = range(max(math.floor(top), 0), min(math.ceil(bottom), self.rows))
+
+                for row in rows:
+                    for column in columns:
+                        self.walkable[row * self.columns + column] = walkable
+
+class FlowField:
+    """ Distance from every walkable cell to the cell holding the target and the angle to steer in
+    from each cell to get closer. The field is only searched again when the target changes cell, so
+    every enemy reads its direction from one search.
+
+    Angles are kept in an array with a slot for every cell in row order. The target's cell, the cells
+    one step from it and cells that can't reach the target have no direction, stored as NaN, and
+    things in them should steer straight at the target. """
+
+    def __init__(self, navigation):
+        self.navigation = navigation
+        self.target = None
+        self.cost = [math.inf] * (navigation.columns * navigation.rows)
+        self.angles = array.array("d", [math.nan]) * (navigation.columns * navigation.rows)
+
+    def update(self, x, y):
+        """ Search the field again if the position is in a different cell from the last target. """
+
+        cell = self.navigation.cell(x, y)
+        if cell != self.target:
+            self.target = cell
+            self.search(cell)
+
+    def search(self, target):
+        """ Find the cost of the cheapest path from every walkable cell to the target with Dijkstra's
+        algorithm, then point every cell at its cheapest neighbour. """
+
+        links = self.navigation.links
+        cost = [math.inf] * len(links)
+
+        start = target[1] * self.navigation.columns + target[0]
+        cost[start] = 0.0
+        queue = [(0.0, start)]
+        while queue:
+            distance, index = heapq.heappop(queue)
+            if distance > cost[index]:
+                continue
+
+            for neighbour, step, angle in links[index]:
+                if distance + step < cost[neighbour]:
+                    cost[neighbour] = distance + step
+                    heapq.heappush(queue, (distance + step, neighbour))
+
+        angles = self.angles
+        for index, steps in enumerate(links):
+            angles[index] = math.nan
+
+            # Nothing is in the way of the target one step away from it.
+            if cost[index] <= math.sqrt(2) or cost[index] == math.inf:
+                continue
+
+            # Steer towards the cheapest neighbour, preferring straight steps over diagonal ones on a tie.
+            best = cost[index]
+            for neighbour, step, angle in steps:
+                if cost[neighbour] < best:
+                    best = cost[neighbour]
+                    angles[index] = angle
+
+        self.cost = cost
+
+    def direction(self, x, y):
+        """ Return the angle to steer in from the position or None if it should steer straight at the target. """
+
+        # Called for every enemy every tick, so the cell is found here rather than with the navigation grid.
+        navigation = self.navigation
+        column = min(max(int((x - navigation.left) // navigation.cell_size), 0), navigation.columns - 1)
+        row = min(max(int((y - navigation.top) // navigation.cell_size), 0), navigation.rows - 1)
+        angle = self.angles[row * navigation.columns + column]
+
+        # Only NaN isn't equal to itself.
+        return angle if angle == angle else None
@@ -0,0 +1,76 @@
+#! /usr/bin/env python3
+""" Run the simulation without a display or frame limit using scripted input and a seeded world.
+Used to measure how many ticks a second the simulation can manage and to repeat load scenarios. """
+
+import argparse
+import json
+import time
+
+from config import *
+import controls
+import world
+
+def run(ticks, seed=0, script=controls.patrol_script, max_enemies=MAX_ENEMIES, backend=ENEMY_BACKEND,
+        pathfinding=ENEMY_PATHFINDING, shooting=ENEMY_SHOOTING):
+    """ Run the world for a number of ticks as fast as possible and return what happened. The player is
+    reset when they die like in the game. """
+
+    world_obj = world.World(seed=seed, controls_obj=controls.ScriptedControls(script), backend=backend,
+                            pathfinding=pathfinding, shooting=shooting)
+    world_obj.enemy_handler.max_enemies = max_enemies
+
+    deaths = 0
+    kills = 0
+    start = time.perf_counter()
+    for tick in range(ticks):
+        world_obj.step()
+
+        if world_obj.player.health <= 0:
+            deaths += 1
+            kills += world_obj.player.kills
+            world_obj.reset()
+    elapsed = time.perf_counter() - start
+
+    player_obj = world_obj.player
+    return {
+        "ticks": ticks,
+        "seed": seed,
+        "backend": backend,
+        "pathfinding": pathfinding,
+        "shooting": shooting,
+        "max_enemies": max_enemies,
+        "seconds": elapsed,
+        "ticks_per_second": ticks / elapsed if elapsed else float("inf"),
+        "deaths": deaths,
+        "kills": kills + player_obj.kills,
+        "health": player_obj.health,
+        "player": [player_obj.x, player_obj.y],
+        "enemies": len(world_obj.enemy_handler.enemies),
+        "dead_enemies": len(world_obj.enemy_handler.dead_enemies),
+        "projectiles": len(player_obj.projectiles),
+        "bullets": len(world_obj.enemy_handler.bullets) if shooting else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=3600, help="number of ticks to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the world's random number generator")
+    parser.add_argument("--enemies", type=int, default=MAX_ENEMIES, help="maximum number of enemies")
+    parser.add_argument("--backend", choices=["object", "array"], default=ENEMY_BACKEND, help="enemy backend")
+    parser.add_argument("--pathfinding", choices=["direct", "flow_field"], default=ENEMY_PATHFINDING,
+                        help="how enemies find their way to the player")
+    parser.add_argument("--shooting", action="store_true", default=ENEMY_SHOOTING, help="let enemies shoot at the player")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.ticks, args.seed, max_enemies=args.enemies, backend=args.backend, pathfinding=args.pathfinding,
+                  shooting=args.shooting)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for key, value in results.items():
+            print("{}: {}".format(key, value))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+""" Healthbar and kills counter drawn on top of the game from cached surfaces. """
+
+import pygame
+
+from config import *
+import render
+
+class Hud:
+    """ Keeps the healthbar and the kills label as surfaces which are only redrawn when the player's
+    health or kills change. With the glyph atlas, the digits are rendered once and copied into a
+    label surface that is reused, so a change in kills never renders text or creates a surface. """
+
+    def __init__(self, font, glyph_atlas=HUD_GLYPH_ATLAS):
+        self.font = font
+
+        self.health = None
+        self.healthbar = pygame.Surface((410, 35))
+
+        self.kills = None
+        self.kills_label = None
+
+        self.glyphs = None
+        if glyph_atlas:
+            self.prefix = font.render("Kills: ", 1, (255, 255, 255))
+            self.glyphs = [font.render(str(digit), 1, (255, 255, 255)) for digit in range(10)]
+            self.atlas_label = pygame.Surface((self.prefix.get_width(), self.prefix.get_height()), pygame.SRCALPHA)
+
+    def draw(self, render_queue, player_obj):
+        """ Queue the healthbar and the kills label, redrawing them first if they changed. """
+
+        if player_obj.health != self.health:
+            self.render_healthbar(player_obj.health)
+        if player_obj.kills != self.kills:
+            self.render_kills(player_obj.kills)
+
+        render_queue.submit(self.healthbar, (195, 745), render.HUD)
+        render_queue.submit(self.kills_label, (700, 20), render.HUD)
+
+    def render_healthbar(self, health):
+        """ Create a healthbar by multiplying player health times the desired size. """
+
+        self.health = health
+        pygame.draw.rect(self.healthbar, (0, 0, 0), (0, 0, 410, 35))
+        pygame.draw.rect(self.healthbar, (255, 0, 0), (5, 5, 400, 25))
+
+        if health > 0:
+            pygame.draw.rect(self.healthbar, (0, 255, 0), (5, 5, health * 4, 25))
+
+    def render_kills(self, kills):
+        """ Render the number of kills, using the glyph atlas if there is one. """
+
+        self.kills = kills
+        if self.glyphs is None:
+            self.kills_label = self.font.render("Kills: {}".format(kills), 1, (255, 255, 255))
+            return
+
+        digits = [self.glyphs[int(digit)] for digit in str(kills)]
+        width = self.prefix.get_width() + sum(glyph.get_width() for glyph in digits)
+
+        # Only make a bigger label when the number gets a digit longer than any before.
+        if width > self.atlas_label.get_width():
+            self.atlas_label = pygame.Surface((width, self.atlas_label.get_height()), pygame.SRCALPHA)
+
+        self.atlas_label.fill((0, 0, 0, 0))
+        self.atlas_label.blit(self.prefix, (0, 0))
+        x = self.prefix.get_width()
+        for glyph in digits:
+            self.atlas_label.blit(glyph, (x, 0))
+            x += glyph.get_width()
+
+        self.kills_label = self.atlas_label
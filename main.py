@@ -1,128 +1,233 @@
-#! /usr/bin/env python3
-""" File to run to play the game. """
-
-import sys
-import time
-
-import pygame
-
-from config import *
-import player
-import enemies
-import projectile
-import display
-
-def game_loop(screen, player_obj, enemy_handler, tiles, clock):
-
-    alive = True
-    while alive:
-
-        # Iterate every 1 / 60 seconds.
-        # This means that a cooldown of 60 is translated to a cooldown of 1 second...
-        clock.tick(60)
-
-        # If the player quits
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
-
-        # Player movement and shooting
-        player_obj.movement()
-        player_obj.mouse()
-        player_obj.update()
-
-        # Enemy spawning and movement behaviour
-        enemy_handler.spawn(player_obj)
-        enemy_handler.update(player_obj)
-
-        # Projectile movement and collision checking
-        projectile.move_projectiles(player_obj)
-        projectile.check_collisions(player_obj, enemy_handler)
-
-        # Screen drawing
-        display.draw_screen(screen, player_obj, enemy_handler, tiles)
-
-        # Checking if player dies
-        if player_obj.health <= 0:
-            alive = reset(player_obj, enemy_handler)
-
-def reset(player_obj, enemy_handler):
-    """ Resets attributes in player and enemy classes to what they
-    were on startup. """
-
-    # Reset player health, kills, projectiles, and position
-    player_obj.health = 100
-    player_obj.kills = 0
-    player_obj.projectiles = []
-    player_obj.x = (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)
-    player_obj.y = (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)
-
-    # Reset enemies
-    enemy_handler.enemies = []
-    enemy_handler.dead_enemies = []
-
-    return False
-
-def main():
-    """ Initializes pygame and contains the main game loop. Eventually the game loop will be separated
-    out into a function and main will call it. """
-
-    # Initialize pygame, pygame.font, a screen, and a clock.
-    pygame.init()
-    pygame.font.init()
-    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
-    clock = pygame.time.Clock()
-
-    # Fonts and texts
-    kills_font = pygame.font.SysFont(pygame.font.get_default_font(), 30)
-    startup_font = pygame.font.SysFont(pygame.font.get_default_font(), 75)
-    death_font = pygame.font.SysFont(pygame.font.get_default_font(), 50)
-    startup_text = startup_font.render("Press any key to play.", 1, (255, 255, 255))
-    death_text1 = startup_font.render("You Died.", 1, (255, 255, 255))
-    death_text2 = death_font.render("Press any key to play again.", 1, (255, 255, 255))
-
-    # Load assets and create map
-    assets = display.load_assets()
-    tiles = display.create_map(assets)
-
-    # Create the player
-    player_obj = player.Player([assets["player"], assets["player_hit"], assets["player_projectile"]], 
-        kills_font,
-        (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2))
-
-    # Create the enemy handler
-    enemy_handler = enemies.EnemyHandler([assets["chaser"], assets["dead_enemy"]])
-
-    # This is here just so on startup a screen can be seen
-    display.draw_screen(screen, player_obj, enemy_handler, tiles)
-
-    # Draw the startup text
-    screen.blit(startup_text, (130, 100))
-    pygame.display.update()
-
-    # Loop is here so if the player dies, they can quickly start again
-    while True:
-
-        # If the player quits
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
-        
-        # If the player presses any key, start the game loop
-        clicks = pygame.mouse.get_pressed()
-        keys = pygame.key.get_pressed()
-        for key in keys:
-            if key or clicks[0] or clicks[1] or clicks[2]:
-                game_loop(screen, player_obj, enemy_handler, tiles, clock)
-
-                # Draw the death text
-                screen.blit(death_text1, (300, 125))
-                screen.blit(death_text2, (180, 550))
-                pygame.display.update()
-
-                # Weird bug where if the game is started using mouse input, the game will immediately start again.
-                clicks = [0, 0, 0]
-
-                time.sleep(1)
-
-main()
\ No newline at end of file
+#! /usr/bin/env python3
+""" File to run to play the game. """
+
+import atexit
+import time
+
+import pygame
+
+from config import *
+import camera
+import controls
+import display
+import hud
+import pipeline
+import profiler
+import render
+import world
+
+# States of the game. The menu and death screens only wait for input.
+MENU = "menu"
+PLAYING = "playing"
+DEAD = "dead"
+QUIT = "quit"
+
+# pygame 1 can't give event.wait a time limit and tells the game the window needs drawing with VIDEOEXPOSE.
+TIMED_WAIT = pygame.version.vernum[0] >= 2
+WINDOW_EXPOSED = getattr(pygame, "WINDOWEXPOSED", pygame.VIDEOEXPOSE)
+
+def wait_event(timeout):
+    """ Return the next event, waiting at most timeout milliseconds for one, or a NOEVENT event if none came. """
+
+    if TIMED_WAIT:
+        return pygame.event.wait(timeout)
+
+    deadline = pygame.time.get_ticks() + timeout
+    while True:
+        event = pygame.event.poll()
+        if event.type != pygame.NOEVENT or pygame.time.get_ticks() >= deadline:
+            return event
+        pygame.time.wait(IDLE_POLL)
+
+def game_loop(screen, world_obj, tiles, hud_obj, clock, overlays=()):
+    """ Play until the player dies or the window is closed. Returns if the player died. """
+
+    # Step the simulation on another thread instead.
+    if PIPELINED:
+        return pipeline.game_loop(screen, world_obj, tiles, hud_obj, clock, overlays)
+
+    # Start tracking dirty rects again every game since the startup and death text covered the screen.
+    dirty_rects = display.DirtyRects() if DIRTY_RECTS else None
+    camera_obj = camera.Camera()
+    render_queue = render.RenderQueue()
+
+    # The simulation always steps SIMULATION_RATE times a second no matter how often the screen is drawn.
+    # This means that a cooldown of 60 is translated to a cooldown of 1 second...
+    step_time = 1 / SIMULATION_RATE
+    accumulator = 0.0
+    previous_time = time.perf_counter()
+    skipped_frames = 0
+
+    while True:
+
+        # Draw as often as the display allows up to the frame rate limit.
+        clock.tick(FRAME_RATE_LIMIT)
+        world_obj.profiler.begin()
+
+        now = time.perf_counter()
+        accumulator += now - previous_time
+        previous_time = now
+
+        # If the player quits
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+
+            # Show or hide the performance overlay.
+            if event.type == pygame.KEYDOWN and event.key == getattr(pygame, "K_" + PROFILE_OVERLAY_KEY):
+                for overlay in overlays:
+                    overlay.toggle()
+
+        # Player, enemy and projectile updates for every step of time that has built up. If the simulation
+        # falls too far behind, the time it can't catch up on is dropped so it doesn't spiral.
+        steps = 0
+        while accumulator >= step_time and steps < MAX_CATCH_UP_STEPS and world_obj.player.health > 0:
+            world_obj.step()
+            accumulator -= step_time
+            steps += 1
+        if steps == MAX_CATCH_UP_STEPS:
+            accumulator = min(accumulator, step_time)
+
+        # Under load, skip drawing some frames to give the simulation the time to stay on time.
+        if steps > 1 and skipped_frames < MAX_SKIPPED_FRAMES and world_obj.player.health > 0:
+            skipped_frames += 1
+            world_obj.profiler.end(world_obj)
+            continue
+        skipped_frames = 0
+
+        # Screen drawing, part of the way between the last two steps
+        alpha = min(accumulator / step_time, 1.0)
+        display.draw_screen(screen, world_obj.player, world_obj.enemy_handler, tiles, hud_obj, dirty_rects, overlays,
+                            alpha, camera_obj, render_queue)
+        world_obj.profiler.mark("draw")
+        world_obj.profiler.end(world_obj)
+
+        # Checking if player dies
+        if world_obj.player.health <= 0:
+            return True
+
+class Game:
+    """ Runs the game as a state machine. The menu leads to playing, playing to the death screen and
+    the death screen back to playing. Each state runs until it returns the next one.
+
+    The menu and death screens block on pygame's event queue instead of polling it, so they use almost no
+    CPU while nothing happens and start the game as soon as a key or mouse button is pressed. They wake
+    up every IDLE_WAIT milliseconds at most, and the idle meter measures how much CPU they used. """
+
+    def __init__(self, screen, world_obj, tiles, hud_obj, clock, overlays=(), idle_meter=None):
+        self.screen = screen
+        self.world = world_obj
+        self.tiles = tiles
+        self.hud = hud_obj
+        self.clock = clock
+        self.overlays = overlays
+        self.idle_meter = idle_meter if idle_meter is not None else profiler.IdleMeter()
+        self.state = MENU
+        self.states = {MENU: self.menu, PLAYING: self.play, DEAD: self.dead}
+
+        # Fonts and texts
+        startup_font = pygame.font.SysFont(pygame.font.get_default_font(), 75)
+        death_font = pygame.font.SysFont(pygame.font.get_default_font(), 50)
+        self.startup_text = startup_font.render("Press any key to play.", 1, (255, 255, 255))
+        self.death_text1 = startup_font.render("You Died.", 1, (255, 255, 255))
+        self.death_text2 = death_font.render("Press any key to play again.", 1, (255, 255, 255))
+
+    def run(self):
+        """ Run states until the window is closed. """
+
+        while self.state != QUIT:
+            self.state = self.states[self.state]()
+
+    def wait_for_input(self, delay=0):
+        """ Sleep until a key or mouse button is pressed and return PLAYING, or QUIT if the window is
+        closed. Presses in the first delay seconds are ignored. """
+
+        start = time.perf_counter()
+        self.idle_meter.begin()
+        try:
+            while True:
+                event = wait_event(IDLE_WAIT)
+                self.idle_meter.wake()
+
+                if event.type == pygame.QUIT:
+                    return QUIT
+                if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN) and time.perf_counter() - start >= delay:
+                    return PLAYING
+
+                # Show the screen again if the window was covered up.
+                if event.type in (pygame.VIDEOEXPOSE, WINDOW_EXPOSED):
+                    pygame.display.update()
+        finally:
+            self.idle_meter.end()
+
+    def menu(self):
+        """ Show the world with the startup text until a key is pressed. """
+
+        # This is here just so on startup a screen can be seen
+        display.draw_screen(self.screen, self.world.player, self.world.enemy_handler, self.tiles, self.hud)
+
+        # Draw the startup text
+        self.screen.blit(self.startup_text, (130, 100))
+        pygame.display.update()
+
+        return self.wait_for_input()
+
+    def play(self):
+        if game_loop(self.screen, self.world, self.tiles, self.hud, self.clock, self.overlays):
+            return DEAD
+        return QUIT
+
+    def dead(self):
+        """ Show the death text over the last frame until a key is pressed, then reset the world so the
+        player can quickly start again. """
+
+        # Draw the death text
+        self.screen.blit(self.death_text1, (300, 125))
+        self.screen.blit(self.death_text2, (180, 550))
+        pygame.display.update()
+
+        # Presses from while playing, like a held mouse button, shouldn't start the next game straight away.
+        pygame.event.clear((pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN))
+        state = self.wait_for_input(DEATH_SCREEN_DELAY)
+
+        if state == PLAYING:
+            self.world.reset()
+        return state
+
+def main():
+    """ Initializes pygame, loads the game and runs it until the window is closed. """
+
+    # Initialize pygame, pygame.font, a screen, and a clock.
+    pygame.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    clock = pygame.time.Clock()
+
+    # Fonts
+    kills_font = pygame.font.SysFont(pygame.font.get_default_font(), 30)
+
+    # Load assets and create map
+    assets = display.load_assets()
+    tiles = display.create_map(assets)
+
+    # Create the player and the enemy handler. A simulation on another thread can't read pygame's input itself.
+    world_obj = world.World(assets, controls_obj=controls.SharedControls() if PIPELINED else None,
+                            map_obj=tiles.map)
+
+    # The healthbar and kills counter
+    hud_obj = hud.Hud(kills_font)
+
+    # Time every phase of the game loop, show it on the overlay and save it when the game closes, along
+    # with how much CPU the menu and death screens used.
+    overlays = []
+    idle_meter = profiler.IdleMeter()
+    if PROFILE:
+        world_obj.profiler = profiler.FrameProfiler()
+        overlays.append(profiler.PerfOverlay(world_obj.profiler, pygame.font.SysFont(pygame.font.get_default_font(), 20)))
+        atexit.register(world_obj.profiler.dump)
+        atexit.register(idle_meter.report)
+
+    Game(screen, world_obj, tiles, hud_obj, clock, overlays, idle_meter).run()
+
+if __name__ == "__main__":
+    main()
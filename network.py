@@ -0,0 +1,182 @@
+""" Messages sent between the game server and its clients over UDP. Snapshots of the world are quantised
+to whole steps and delta compressed against the last snapshot the client said it received. """
+
+import struct
+
+import pygame
+
+from config import *
+
+# Every datagram starts with one of these message types.
+HELLO = 0
+WELCOME = 1
+INPUT = 2
+SNAPSHOT = 3
+BYE = 4
+
+MESSAGE_TYPE = struct.Struct("<B")
+
+# Message type and the id the server gave the client.
+WELCOME_MESSAGE = struct.Struct("<BI")
+
+# Message type, input sequence, sequence of the newest snapshot received, keys held, mouse buttons held and mouse position.
+INPUT_MESSAGE = struct.Struct("<BIIBBhh")
+
+# Keys sent in the input, one bit each.
+KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d)
+
+# Angles are sent in steps of 1 / ANGLE_SCALE radians.
+ANGLE_SCALE = 10000
+
+# Kinds of things sent in snapshots and how many numbers each thing has after its id. Enemies, dead
+# enemies and enemy projectiles have a position and player projectiles also have an angle.
+KINDS = ("enemies", "dead_enemies", "projectiles", "bullets")
+VALUES = (2, 2, 3, 2)
+
+# A thing the client doesn't have yet is sent with its id and whole values, a thing that moved a little
+# since the baseline with its id and the change in each value and a thing that is gone with just its id.
+ADDED = tuple(struct.Struct("<I" + "i" * values) for values in VALUES)
+MOVED = tuple(struct.Struct("<I" + "b" * values) for values in VALUES)
+REMOVED = struct.Struct("<I")
+
+# Message type, sequence, baseline sequence or 0 for none, flags, player position, aim, health, kills, invincibility,
+# position of the client's view and then how many things of every kind were added, moved and removed.
+SNAPSHOT_HEADER = struct.Struct("<BIIBiihhIHii" + "HHH" * len(KINDS))
+
+# Set in the flags when the client is the one controlling the player.
+CONTROLLING = 1
+
+class Frame:
+    """ What a client can see of one tick of the world. Frames are numbered by the server from 1 up so
+    they keep counting when the world is reset. The player and view positions are quantised and every
+    kind of thing is a dictionary from id to its quantised values. """
+
+    def __init__(self, sequence=0, flags=0, player_x=0, player_y=0, aim=0, health=100, kills=0, invincibility=0,
+                 view_x=0, view_y=0, things=None):
+        self.sequence = sequence
+        self.flags = flags
+        self.player_x = player_x
+        self.player_y = player_y
+        self.aim = aim
+        self.health = health
+        self.kills = kills
+        self.invincibility = invincibility
+        self.view_x = view_x
+        self.view_y = view_y
+        self.things = things if things is not None else tuple(dict() for kind in KINDS)
+
+def quantise(value):
+    """ Return the position in steps of 1 / NET_POSITION_SCALE pixels. """
+
+    return int(round(value * NET_POSITION_SCALE))
+
+def unquantise(value):
+    return value / NET_POSITION_SCALE
+
+def quantise_angle(angle):
+    return int(round(angle * ANGLE_SCALE))
+
+def unquantise_angle(angle):
+    return angle / ANGLE_SCALE
+
+def key_mask(keys):
+    """ Pack which of KEYS are held down into one byte. """
+
+    mask = 0
+    for bit, key in enumerate(KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+def mask_keys(mask):
+    """ Return the keys held down in the packed byte. """
+
+    return [key for bit, key in enumerate(KEYS) if mask & (1 << bit)]
+
+def button_mask(clicks):
+    """ Pack which mouse buttons are held down into one byte. """
+
+    return sum(1 << bit for bit, held in enumerate(clicks[:3]) if held)
+
+def mask_buttons(mask):
+    return tuple(bool(mask & (1 << bit)) for bit in range(3))
+
+def encode_input(sequence, acked, keys, clicks, position):
+    """ Return an input message from the live or packed keyboard and mouse state. """
+
+    x = min(max(int(position[0]), -32768), 32767)
+    y = min(max(int(position[1]), -32768), 32767)
+    return INPUT_MESSAGE.pack(INPUT, sequence, acked, key_mask(keys), button_mask(clicks), x, y)
+
+def encode_snapshot(frame, baseline=None):
+    """ Return a snapshot message holding the frame. If a baseline frame is given, only what changed since
+    it is sent: things that moved less than a byte's worth of steps are sent as the change. """
+
+    baseline_sequence = baseline.sequence if baseline is not None else 0
+    counts = []
+    records = []
+
+    for kind in range(len(KINDS)):
+        things = frame.things[kind]
+        previous = baseline.things[kind] if baseline is not None else dict()
+        added = ADDED[kind]
+        moved = MOVED[kind]
+
+        added_records = []
+        moved_records = []
+        for thing_id, values in things.items():
+            old_values = previous.get(thing_id)
+            if old_values is None:
+                added_records.append(added.pack(thing_id, *values))
+            elif old_values != values:
+                changes = [value - old_value for value, old_value in zip(values, old_values)]
+                if all(-128 <= change <= 127 for change in changes):
+                    moved_records.append(moved.pack(thing_id, *changes))
+                else:
+                    added_records.append(added.pack(thing_id, *values))
+
+        removed_records = [REMOVED.pack(thing_id) for thing_id in previous if thing_id not in things]
+
+        counts += [len(added_records), len(moved_records), len(removed_records)]
+        records += added_records + moved_records + removed_records
+
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT, frame.sequence, baseline_sequence, frame.flags, frame.player_x, frame.player_y,
+                                  frame.aim, frame.health, frame.kills, frame.invincibility, frame.view_x, frame.view_y,
+                                  *counts)
+    return header + b"".join(records)
+
+def decode_snapshot(data, baselines):
+    """ Return the frame held in a snapshot message. Baselines is a dictionary from sequence to the frames
+    the client has, and None is returned if the snapshot's baseline isn't one of them. """
+
+    fields = SNAPSHOT_HEADER.unpack_from(data)
+    (message_type, sequence, baseline_sequence, flags, player_x, player_y, aim, health, kills, invincibility,
+     view_x, view_y) = fields[:12]
+    counts = fields[12:]
+
+    if baseline_sequence == 0:
+        things = tuple(dict() for kind in KINDS)
+    elif baseline_sequence in baselines:
+        things = tuple(dict(previous) for previous in baselines[baseline_sequence].things)
+    else:
+        return None
+
+    offset = SNAPSHOT_HEADER.size
+    for kind in range(len(KINDS)):
+        added_count, moved_count, removed_count = counts[3 * kind:3 * kind + 3]
+        kind_things = things[kind]
+
+        for values in ADDED[kind].iter_unpack(data[offset:offset + added_count * ADDED[kind].size]):
+            kind_things[values[0]] = values[1:]
+        offset += added_count * ADDED[kind].size
+
+        for changes in MOVED[kind].iter_unpack(data[offset:offset + moved_count * MOVED[kind].size]):
+            old_values = kind_things[changes[0]]
+            kind_things[changes[0]] = tuple(old_value + change for old_value, change in zip(old_values, changes[1:]))
+        offset += moved_count * MOVED[kind].size
+
+        for (thing_id,) in REMOVED.iter_unpack(data[offset:offset + removed_count * REMOVED.size]):
+            del kind_things[thing_id]
+        offset += removed_count * REMOVED.size
+
+    return Frame(sequence, flags, player_x, player_y, aim, health, kills, invincibility, view_x, view_y, things)
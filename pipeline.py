@@ -0,0 +1,282 @@
+""" Run the simulation on its own thread while the main thread draws the last finished step. """
+
+import array
+import operator
+import threading
+import time
+
+import pygame
+
+from config import *
+import camera
+import display
+import player
+import render
+
+class Snapshot:
+    """ Everything needed to draw one step of the world, copied into flat buffers. Enemies are stored as
+    x, y, previous x and previous y one after the other, projectiles the same followed by their angle,
+    enemy projectiles the same as enemies and dead enemies as x and y. """
+
+    def __init__(self):
+        self.tick = 0
+        self.time = 0.0
+
+        self.x = 0.0
+        self.y = 0.0
+        self.previous_x = 0.0
+        self.previous_y = 0.0
+        self.health = 100
+        self.kills = 0
+        self.invincibility = 0
+        self.aim = 0.0
+
+        self.enemies = array.array("d")
+        self.dead_enemies = array.array("d")
+        self.projectiles = array.array("d")
+        self.bullets = array.array("d")
+
+    def capture(self, world_obj, step_time):
+        """ Copy the world into the buffers, reusing their memory. """
+
+        player_obj = world_obj.player
+        self.tick = world_obj.ticks
+        self.time = step_time
+
+        self.x = player_obj.x
+        self.y = player_obj.y
+        self.previous_x = player_obj.previous_x
+        self.previous_y = player_obj.previous_y
+        self.health = player_obj.health
+        self.kills = player_obj.kills
+        self.invincibility = player_obj.invincibility
+        self.aim = player_obj.aim
+
+        del self.enemies[:]
+        world_obj.enemy_handler.write_positions(self.enemies)
+
+        # Oldest first so the newest dead enemies are drawn on top.
+        del self.dead_enemies[:]
+        self.dead_enemies.extend(value for dead_enemy in sorted(world_obj.enemy_handler.dead_enemies.entities,
+                                                                key=operator.attrgetter("id"))
+                                 for value in (dead_enemy.x, dead_enemy.y))
+
+        del self.projectiles[:]
+        self.projectiles.extend(value for projectile in player_obj.projectiles
+                                for value in (projectile.x, projectile.y, projectile.previous_x, projectile.previous_y,
+                                              projectile.angle))
+
+        del self.bullets[:]
+        if world_obj.enemy_handler.bullets is not None:
+            world_obj.enemy_handler.bullets.write_positions(self.bullets)
+
+class Pipeline:
+    """ Steps the world on a worker thread and hands finished steps to the main thread through three
+    snapshots. The worker writes the back snapshot, the main thread draws the front snapshot and the
+    ready snapshot holds the newest finished step. Only the swaps between them need the lock, so the
+    threads never wait on each other or touch the same snapshot. """
+
+    def __init__(self, world_obj):
+        self.world = world_obj
+        self.buffers = [Snapshot(), Snapshot(), Snapshot()]
+        self.front = 0
+        self.ready = 1
+        self.back = 2
+        self.fresh = False
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        # Start with the current state so there is something to draw straight away.
+        now = time.perf_counter()
+        for snapshot in self.buffers:
+            snapshot.capture(world_obj, now)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.simulate, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def simulate(self):
+        """ Step the world SIMULATION_RATE times a second until the player dies or the pipeline stops. """
+
+        step_time = 1 / SIMULATION_RATE
+        next_step = time.perf_counter()
+
+        while self.running and self.world.player.health > 0:
+            now = time.perf_counter()
+            if now < next_step:
+                time.sleep(next_step - now)
+                continue
+
+            self.world.profiler.begin()
+            self.world.step()
+            self.world.profiler.end(self.world)
+
+            # Drop the time the simulation can't catch up on so it doesn't spiral.
+            if now - next_step > MAX_CATCH_UP_STEPS * step_time:
+                next_step = now
+
+            self.buffers[self.back].capture(self.world, next_step)
+            next_step += step_time
+
+            with self.lock:
+                self.back, self.ready = self.ready, self.back
+                self.fresh = True
+
+    def acquire(self):
+        """ Return the newest finished step. The snapshot stays valid until the next call. """
+
+        with self.lock:
+            if self.fresh:
+                self.front, self.ready = self.ready, self.front
+                self.fresh = False
+
+        return self.buffers[self.front]
+
+def draw_snapshot(screen, snapshot, sprites, tiles, hud_obj, dirty_rects=None, overlays=(), alpha=1.0, camera_obj=None,
+                  render_queue=None, view=None):
+    """ Draw a snapshot in the same order and at the same places as draw_screen draws the world. The
+    snapshot has no spatial grids, so every position is checked against the camera's view. If a view
+    with a position and previous position is given, the camera follows it instead of the player. """
+
+    if camera_obj is None:
+        camera_obj = camera.Camera()
+    camera_obj.follow(snapshot if view is None else view, alpha)
+    offset_x = camera_obj.offset_x
+    offset_y = camera_obj.offset_y
+
+    if render_queue is None:
+        render_queue = render.RenderQueue()
+
+    # Queue the map tiles.
+    tiles.draw(render_queue, camera_obj)
+
+    # Queue the dead enemies on screen.
+    dead_enemies = snapshot.dead_enemies
+    sprite = sprites["dead_enemy"]
+    commands = [(sprite, (dead_enemies[index] + offset_x, dead_enemies[index + 1] + offset_y))
+                for index in range(0, len(dead_enemies), 2)
+                if camera_obj.visible(dead_enemies[index], dead_enemies[index + 1], ENEMY_SIZE, ENEMY_SIZE)]
+    render_queue.extend(render.DEAD_ENEMIES, commands)
+    camera_obj.count("dead_enemies", len(commands), len(dead_enemies) // 2 - len(commands))
+
+    # Queue the player projectiles on screen.
+    projectiles = snapshot.projectiles
+    drawn = 0
+    for index in range(0, len(projectiles), 5):
+        x = projectiles[index + 2] + (projectiles[index] - projectiles[index + 2]) * alpha
+        y = projectiles[index + 3] + (projectiles[index + 1] - projectiles[index + 3]) * alpha
+        if camera_obj.visible(x - display.PROJECTILE_MARGIN, y - display.PROJECTILE_MARGIN,
+                              PROJECTILE_SIZE + 2 * display.PROJECTILE_MARGIN, PROJECTILE_SIZE + 2 * display.PROJECTILE_MARGIN):
+            surface, half_width, half_height = sprites["projectile"].get(projectiles[index + 4])
+            render_queue.submit(surface, (x + offset_x - (PLAYER_SIZE / 2) + (PROJECTILE_SIZE / 2) - half_width,
+                                          y + offset_y - (PLAYER_SIZE / 2) + (PROJECTILE_SIZE / 2) - half_height),
+                                render.PROJECTILES)
+            drawn += 1
+    camera_obj.count("projectiles", drawn, len(projectiles) // 5 - drawn)
+
+    # Queue the enemies on screen.
+    enemies = snapshot.enemies
+    sprite = sprites["chaser"]
+    drawn = 0
+    for index in range(0, len(enemies), 4):
+        x = enemies[index + 2] + (enemies[index] - enemies[index + 2]) * alpha
+        y = enemies[index + 3] + (enemies[index + 1] - enemies[index + 3]) * alpha
+        if camera_obj.visible(x, y, ENEMY_SIZE, ENEMY_SIZE):
+            render_queue.submit(sprite, (x + offset_x, y + offset_y), render.ENEMIES)
+            drawn += 1
+    camera_obj.count("enemies", drawn, len(enemies) // 4 - drawn)
+
+    # Queue the enemy projectiles on screen.
+    bullets = snapshot.bullets
+    sprite = sprites["bullet"]
+    drawn = 0
+    for index in range(0, len(bullets), 4):
+        x = bullets[index + 2] + (bullets[index] - bullets[index + 2]) * alpha
+        y = bullets[index + 3] + (bullets[index + 1] - bullets[index + 3]) * alpha
+        if camera_obj.visible(x, y, PROJECTILE_SIZE, PROJECTILE_SIZE):
+            render_queue.submit(sprite, (x + offset_x, y + offset_y), render.BULLETS)
+            drawn += 1
+    camera_obj.count("bullets", drawn, len(bullets) // 4 - drawn)
+
+    # Queue the player, flickering whilst having invincibility, and the gun. The player is in the center
+    # of the screen unless the camera follows a view.
+    center_x = SCREEN_SIZE / 2
+    center_y = SCREEN_SIZE / 2
+    if view is not None:
+        center_x = snapshot.previous_x + (snapshot.x - snapshot.previous_x) * alpha + offset_x
+        center_y = snapshot.previous_y + (snapshot.y - snapshot.previous_y) * alpha + offset_y
+    player_sprite = sprites["player"] if snapshot.invincibility % 2 == 0 else sprites["player_hit"]
+    render_queue.submit(player_sprite, (center_x - (PLAYER_SIZE / 2), center_y - (PLAYER_SIZE / 2)), render.PLAYER)
+    player.draw_gun(render_queue, sprites["gun"], snapshot.aim, center_x, center_y)
+
+    # Queue the healthbar and kills on top
+    hud_obj.draw(render_queue, snapshot)
+
+    rects = [] if dirty_rects is not None else None
+    render_queue.flush(screen, rects)
+
+    for overlay in overlays:
+        rect = overlay.draw(screen)
+        if rect is not None and rects is not None:
+            rects.append(rect)
+
+    if dirty_rects is None:
+        pygame.display.update()
+    else:
+        dirty_rects.update(rects, (camera_obj.x, camera_obj.y))
+
+def game_loop(screen, world_obj, tiles, hud_obj, clock, overlays=()):
+    """ Game loop for the pipelined mode. The main thread handles events, reads input for the simulation
+    and draws while the simulation runs on the worker thread. The world's player has to use shared controls.
+    Returns if the player died, or False if the window was closed. """
+
+    dirty_rects = display.DirtyRects() if DIRTY_RECTS else None
+    camera_obj = camera.Camera()
+    render_queue = render.RenderQueue()
+    sprites = {
+        "player": world_obj.player.sprites[0],
+        "player_hit": world_obj.player.sprites[1],
+        "projectile": world_obj.player.projectile_sprite,
+        "gun": world_obj.player.gun,
+        "chaser": world_obj.enemy_handler.sprites[0],
+        "dead_enemy": world_obj.enemy_handler.sprites[1],
+        "bullet": world_obj.enemy_handler.sprites[2],
+    }
+    step_time = 1 / SIMULATION_RATE
+
+    pipeline = Pipeline(world_obj)
+    pipeline.start()
+    try:
+        while True:
+            clock.tick(FRAME_RATE_LIMIT)
+
+            # If the player quits
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return False
+
+                # Show or hide the performance overlay.
+                if event.type == pygame.KEYDOWN and event.key == getattr(pygame, "K_" + PROFILE_OVERLAY_KEY):
+                    for overlay in overlays:
+                        overlay.toggle()
+
+            world_obj.player.controls.capture()
+
+            # Draw the newest step part of the way towards the next one.
+            snapshot = pipeline.acquire()
+            alpha = min(max((time.perf_counter() - snapshot.time) / step_time, 0.0), 1.0)
+            draw_snapshot(screen, snapshot, sprites, tiles, hud_obj, dirty_rects, overlays, alpha, camera_obj, render_queue)
+
+            # Checking if player dies
+            if snapshot.health <= 0:
+                return True
+    finally:
+        pipeline.stop()
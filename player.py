@@ -1,154 +1,203 @@
-""" Manage player input, movement mechanics and shooting mechanics. """
-
-import math
-
-import pygame
-
-from config import *
-import projectile
-
-class Player:
-
-    def __init__(self, sprites, text, x, y):
-        self.sprites = sprites
-        self.text = text
-        self.x = x
-        self.y = y
-
-        self.health = 100
-        self.shoot_cooldown = 0
-        self.invincibility = 0
-        self.kills = 0
-
-        self.projectiles = []
-
-    def draw(self, screen):
-        """ Draw the player on the screen. If the player has been hit recently, draw a red player for a flicker effect. """
-
-        # Create a flicker effect whilst having invincibility.
-        if self.invincibility % 2 == 0:
-            screen.blit(self.sprites[0], ((SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)))
-
-        if self.invincibility % 2 == 1:
-            screen.blit(self.sprites[1], ((SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)))
-
-    def display_healthbar(self, screen):
-        """ Create a healthbar by multiplying player health times the desired size. """
-
-        pygame.draw.rect(screen, (0, 0, 0), (195, 745, 410, 35))
-        pygame.draw.rect(screen, (255, 0, 0), (200, 750, 400, 25))
-
-        if self.health > 0:
-            pygame.draw.rect(screen, (0, 255, 0), (200, 750, self.health * 4, 25))
-
-    def display_kills(self, screen):
-        """ Display a number of kills using player kills and the player text font object. """
-
-        kills_label = self.text.render("Kills: {}".format(self.kills), 1, (255, 255, 255))
-        screen.blit(kills_label, (700, 20))
-
-    def update(self):
-
-        # Player shoot cooldown.
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= 1
-
-        # Player invincibility.
-        if self.invincibility > 0:
-            self.invincibility -= 1
-
-    def shoot(self, angle):
-        """ Create a projectile object in the direction of the mouse from the center of the screen. """
-
-        # Create a new projectile
-        self.projectiles.append(projectile.Projectile(self.sprites[2],
-            self.x + (PLAYER_SIZE / 2) - (PROJECTILE_SIZE / 2), self.y + (PLAYER_SIZE / 2) - (PROJECTILE_SIZE / 2), angle))
-        
-        self.shoot_cooldown = PLAYER_SHOOT_COOLDOWN
-
-
-    def movement(self):
-        """ Movement for the player. """
-
-        keys = pygame.key.get_pressed()
-        x_change = 0
-        y_change = 0
-
-        # For diagonal movement, player speed is divided by root two so that the diagonal speed is not faster
-        # then the single directional speed.
-        # NORTH WEST
-        if keys[pygame.K_w] and keys[pygame.K_a]:
-            x_change, y_change = self.check_bounds(-PLAYER_SPEED / math.sqrt(2), -PLAYER_SPEED / math.sqrt(2))
-        # SOUTH WEST
-        elif keys[pygame.K_s] and keys[pygame.K_a]:
-            x_change, y_change = self.check_bounds(-PLAYER_SPEED / math.sqrt(2), PLAYER_SPEED / math.sqrt(2))
-        # NORTH EAST
-        elif keys[pygame.K_w] and keys[pygame.K_d]:
-            x_change, y_change = self.check_bounds(PLAYER_SPEED / math.sqrt(2), -PLAYER_SPEED / math.sqrt(2))
-        # SOUTH EAST
-        elif keys[pygame.K_s] and keys[pygame.K_d]:
-            x_change, y_change = self.check_bounds(PLAYER_SPEED / math.sqrt(2), PLAYER_SPEED / math.sqrt(2))
-        # UP
-        elif keys[pygame.K_w]:
-            x_change, y_change = self.check_bounds(0, -PLAYER_SPEED)
-        # DOWN
-        elif keys[pygame.K_s]:
-            x_change, y_change = self.check_bounds(0, PLAYER_SPEED)
-        # LEFT
-        elif keys[pygame.K_a]:
-            x_change, y_change = self.check_bounds(-PLAYER_SPEED, 0)
-        # RIGHT
-        elif keys[pygame.K_d]:
-            x_change, y_change = self.check_bounds(PLAYER_SPEED, 0)
-
-        self.x += x_change
-        self.y += y_change
-
-    def check_bounds(self, x_change, y_change):
-        """ Check if the player exits the bounds of the map. If so, do some math to put the player
-        right on the edge.
-
-        Doing something like if player.x < LEFT_BORDER, then player.x = LEFT_BORDER doesn't work because 
-        the position of the other objects will not be changed.
-        """
-
-        # LEFT BORDER
-        if self.x + x_change - (PLAYER_SIZE / 2) < LEFT_BORDER:
-            x_change = LEFT_BORDER - self.x + (PLAYER_SIZE / 2)
-
-        # RIGHT BORDER
-        if self.x + x_change > RIGHT_BORDER - (PLAYER_SIZE / 2):
-            x_change = RIGHT_BORDER - self.x - (PLAYER_SIZE / 2)
-
-        # UPPER BORDER
-        if self.y + y_change - (PLAYER_SIZE / 2) < UPPER_BORDER:
-            y_change = UPPER_BORDER - self.y + (PLAYER_SIZE / 2)
-
-        # LOWER BORDER
-        if self.y + y_change > LOWER_BORDER - (PLAYER_SIZE / 2):
-            y_change = LOWER_BORDER - self.y - (PLAYER_SIZE / 2)
-
-        return x_change, y_change
-
-    def mouse(self):
-        """ Check clicks from the mouse and get the mouse position. Also, if the player left clicks,
-        call the shoot method. """
-
-        clicks = pygame.mouse.get_pressed()
-        position = pygame.mouse.get_pos()
-
-        # If left click and if the shoot cooldown is over.
-        if clicks[0]:
-            if self.shoot_cooldown == 0:
-                angle = math.atan2(position[1] - (SCREEN_SIZE / 2), position[0] - (SCREEN_SIZE / 2))
-                self.shoot(angle)
-
-def closest_enemy(player_obj, enemies):
-    """ Get the enemies ordered by closest distance. This is needed to figure out what
-    enemy the projectile will come in contact with. """
-
-    # Get distance from player.
-    for enemy in enemies:
-        enemy.distance = enemy.player_distance(player_obj)
-
-    return sorted(enemies, key=lambda enemy: enemy.distance)
+""" Manage player input, movement mechanics and shooting mechanics. """
+
+import math
+
+import pygame
+
+from config import *
+import controls
+import pool
+import projectile
+import render
+import rotation
+import savestate
+import scheduler
+import tilemap
+
+class Player:
+
+    def __init__(self, sprites, x, y, controls_obj=None, scheduler_obj=None, map_obj=None):
+        self.sprites = sprites
+        self.x = x
+        self.y = y
+        self.previous_x = x
+        self.previous_y = y
+
+        # Where keyboard and mouse input is read from.
+        self.controls = controls_obj if controls_obj is not None else controls.Controls()
+
+        # Counts the ticks the cooldown and invincibility end on.
+        self.scheduler = scheduler_obj if scheduler_obj is not None else scheduler.Scheduler()
+
+        # The map whose borders the player and their projectiles stay inside of.
+        self.map = map_obj if map_obj is not None else tilemap.MapFile()
+
+        self.health = 100
+        self.shoot_tick = 0
+        self.invincibility_tick = 0
+        self.kills = 0
+
+        self.projectiles = pool.EntityPool(projectile.Projectile)
+
+        # Rotated copies of the projectile and the gun, which points up in its image, made when the
+        # sprites are loaded instead of the first time each angle is drawn.
+        self.projectile_sprite = rotation.RotationCache(sprites[2])
+        self.gun = rotation.RotationCache(sprites[3], -math.pi / 2)
+        if sprites[2] is not None:
+            self.projectile_sprite.prerender()
+        if sprites[3] is not None:
+            self.gun.prerender()
+
+        # Angle towards the mouse.
+        self.aim = 0.0
+
+    def draw(self, render_queue):
+        """ Queue the player and the gun. If the player has been hit recently, draw a red player for a flicker effect. """
+
+        # Create a flicker effect whilst having invincibility.
+        if self.invincibility % 2 == 0:
+            render_queue.submit(self.sprites[0], ((SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)),
+                                render.PLAYER)
+        else:
+            render_queue.submit(self.sprites[1], ((SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)),
+                                render.PLAYER)
+
+        draw_gun(render_queue, self.gun, self.aim)
+
+    @property
+    def shoot_cooldown(self):
+        """ Ticks left until the player can shoot again. """
+
+        return self.scheduler.remaining(self.shoot_tick)
+
+    @shoot_cooldown.setter
+    def shoot_cooldown(self, ticks):
+        self.shoot_tick = self.scheduler.tick + ticks
+
+    @property
+    def invincibility(self):
+        """ Ticks left until the player can be hit again. """
+
+        return self.scheduler.remaining(self.invincibility_tick)
+
+    @invincibility.setter
+    def invincibility(self, ticks):
+        self.invincibility_tick = self.scheduler.tick + ticks
+
+    def capture(self, writer):
+        """ Add the player and their projectiles to a saved state. """
+
+        writer.pack(savestate.PLAYER, self.x, self.y, self.previous_x, self.previous_y, self.health, self.kills,
+                    self.shoot_tick, self.invincibility_tick, self.aim)
+        writer.pack(savestate.COUNT, len(self.projectiles), self.projectiles.next_id)
+        writer.array(self.projectiles.pack(projectile.Projectile.SAVED))
+        writer.array(self.projectiles.pack(projectile.Projectile.SAVED_INTEGERS, "q"))
+
+    def restore(self, reader):
+        """ Read the player and their projectiles back from a saved state. """
+
+        (self.x, self.y, self.previous_x, self.previous_y, self.health, self.kills, self.shoot_tick,
+         self.invincibility_tick, self.aim) = reader.unpack(savestate.PLAYER)
+        count, next_id = reader.unpack(savestate.COUNT)
+        next_id = reader.next_id(next_id, self.projectiles.next_id)
+        self.projectiles.restore(count, next_id, (self.projectile_sprite, 0.0, 0.0, 0.0),
+                                 (projectile.Projectile.SAVED, reader.array("d")),
+                                 (projectile.Projectile.SAVED_INTEGERS, reader.array("q")))
+
+    def shoot(self, angle):
+        """ Create a projectile object in the direction of the mouse from the center of the screen. """
+
+        # Create a new projectile
+        self.projectiles.spawn(self.projectile_sprite,
+            self.x + (PLAYER_SIZE / 2) - (PROJECTILE_SIZE / 2), self.y + (PLAYER_SIZE / 2) - (PROJECTILE_SIZE / 2), angle)
+        
+        self.shoot_cooldown = PLAYER_SHOOT_COOLDOWN
+
+
+    def movement(self):
+        """ Movement for the player. """
+
+        # Remember where the player was for drawing in between updates.
+        self.previous_x = self.x
+        self.previous_y = self.y
+
+        keys = self.controls.keys()
+        x_change = 0
+        y_change = 0
+
+        # For diagonal movement, player speed is divided by root two so that the diagonal speed is not faster
+        # then the single directional speed.
+        # NORTH WEST
+        if keys[pygame.K_w] and keys[pygame.K_a]:
+            x_change, y_change = self.check_bounds(-PLAYER_SPEED / math.sqrt(2), -PLAYER_SPEED / math.sqrt(2))
+        # SOUTH WEST
+        elif keys[pygame.K_s] and keys[pygame.K_a]:
+            x_change, y_change = self.check_bounds(-PLAYER_SPEED / math.sqrt(2), PLAYER_SPEED / math.sqrt(2))
+        # NORTH EAST
+        elif keys[pygame.K_w] and keys[pygame.K_d]:
+            x_change, y_change = self.check_bounds(PLAYER_SPEED / math.sqrt(2), -PLAYER_SPEED / math.sqrt(2))
+        # SOUTH EAST
+        elif keys[pygame.K_s] and keys[pygame.K_d]:
+            x_change, y_change = self.check_bounds(PLAYER_SPEED / math.sqrt(2), PLAYER_SPEED / math.sqrt(2))
+        # UP
+        elif keys[pygame.K_w]:
+            x_change, y_change = self.check_bounds(0, -PLAYER_SPEED)
+        # DOWN
+        elif keys[pygame.K_s]:
+            x_change, y_change = self.check_bounds(0, PLAYER_SPEED)
+        # LEFT
+        elif keys[pygame.K_a]:
+            x_change, y_change = self.check_bounds(-PLAYER_SPEED, 0)
+        # RIGHT
+        elif keys[pygame.K_d]:
+            x_change, y_change = self.check_bounds(PLAYER_SPEED, 0)
+
+        self.x += x_change
+        self.y += y_change
+
+    def check_bounds(self, x_change, y_change):
+        """ Check if the player exits the bounds of the map. If so, do some math to put the player
+        right on the edge.
+
+        Doing something like if player.x < map.left, then player.x = map.left doesn't work because 
+        the position of the other objects will not be changed.
+        """
+
+        # LEFT BORDER
+        if self.x + x_change - (PLAYER_SIZE / 2) < self.map.left:
+            x_change = self.map.left - self.x + (PLAYER_SIZE / 2)
+
+        # RIGHT BORDER
+        if self.x + x_change > self.map.right - (PLAYER_SIZE / 2):
+            x_change = self.map.right - self.x - (PLAYER_SIZE / 2)
+
+        # UPPER BORDER
+        if self.y + y_change - (PLAYER_SIZE / 2) < self.map.top:
+            y_change = self.map.top - self.y + (PLAYER_SIZE / 2)
+
+        # LOWER BORDER
+        if self.y + y_change > self.map.bottom - (PLAYER_SIZE / 2):
+            y_change = self.map.bottom - self.y - (PLAYER_SIZE / 2)
+
+        return x_change, y_change
+
+    def mouse(self):
+        """ Check clicks from the mouse and aim at the mouse position. Also, if the player left clicks,
+        call the shoot method. """
+
+        clicks = self.controls.clicks()
+        position = self.controls.mouse_position()
+        self.aim = math.atan2(position[1] - (SCREEN_SIZE / 2), position[0] - (SCREEN_SIZE / 2))
+
+        # If left click and if the shoot cooldown is over.
+        if clicks[0]:
+            if self.shoot_cooldown == 0:
+                self.shoot(self.aim)
+
+def draw_gun(render_queue, gun, aim, x=SCREEN_SIZE / 2, y=SCREEN_SIZE / 2):
+    """ Queue the gun on the edge of the player drawn centered on the screen position, which is the center
+    of the screen unless someone else's view is shown, pointing at the aim. """
+
+    surface, half_width, half_height = gun.get(aim)
+    render_queue.submit(surface, (x + (PLAYER_SIZE / 2) * math.cos(aim) - half_width,
+                                  y + (PLAYER_SIZE / 2) * math.sin(aim) - half_height), render.PLAYER)
@@ -0,0 +1,118 @@
+""" Storage for entities that are created and removed all the time, like projectiles and enemies. """
+
+import array
+import collections
+import itertools
+import operator
+
+class EntityPool:
+    """ Holds the live entities of one class in a list and keeps removed entities to be reused by the
+    next spawn, so shooting and killing don't create new objects once the pool has warmed up. Every
+    entity knows its place in the list, so it is removed by moving the last entity into its place
+    instead of searching the list.
+
+    Iterating goes from the last entity to the first, which makes it safe to remove the entity being
+    visited or any entity visited before it: only entities that were already visited are moved.
+
+    Every spawned entity is given an id that no other entity of the pool has had, so it can be told
+    apart from a reused entity, like when the game is sent over the network. """
+
+    def __init__(self, entity_class):
+        self.entity_class = entity_class
+        self.entities = []
+        self.free = []
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        entities = self.entities
+        index = len(entities) - 1
+        while index >= 0:
+            if index < len(entities):
+                yield entities[index]
+            index -= 1
+
+    def __getitem__(self, index):
+        return self.entities[index]
+
+    def __contains__(self, entity):
+        return 0 <= entity.index < len(self.entities) and self.entities[entity.index] is entity
+
+    def spawn(self, *args):
+        """ Add an entity made from the arguments to the pool, reusing a removed entity if there is one. """
+
+        if self.free:
+            entity = self.free.pop()
+            self.entity_class.__init__(entity, *args)
+        else:
+            entity = self.entity_class(*args)
+
+        entity.index = len(self.entities)
+        entity.id = self.next_id
+        self.next_id += 1
+        self.entities.append(entity)
+        return entity
+
+    def remove(self, entity):
+        """ Remove the entity by moving the last entity into its place. """
+
+        if entity not in self:
+            raise ValueError("entity is not in the pool")
+
+        last = self.entities.pop()
+        if last is not entity:
+            self.entities[entity.index] = last
+            last.index = entity.index
+
+        entity.index = -1
+        self.free.append(entity)
+
+    def clear(self):
+        """ Remove every entity, keeping them all to be reused. """
+
+        for entity in self.entities:
+            entity.index = -1
+        self.free.extend(self.entities)
+        self.entities = []
+
+    def pack(self, fields, typecode="d"):
+        """ Return the fields of every entity in order, one entity after another, in an array of the type. """
+
+        getter = operator.attrgetter(*fields)
+        if len(fields) == 1:
+            return array.array(typecode, map(getter, self.entities))
+        return array.array(typecode, itertools.chain.from_iterable(map(getter, self.entities)))
+
+    def restore(self, count, next_id, args, *columns):
+        """ Make the pool hold count entities and set their fields from the columns, which are pairs of the
+        fields and the array pack returned for them. Entities already in the pool keep their places, extra
+        entities are removed and missing ones are made from the arguments like spawn does, but with the ids
+        from the columns. Returns the entities that were removed. """
+
+        entities = self.entities
+        removed = entities[count:]
+        del entities[count:]
+        for entity in removed:
+            entity.index = -1
+        self.free.extend(removed)
+
+        free = self.free
+        initialise = self.entity_class.__init__
+        for index in range(len(entities), count):
+            if free:
+                entity = free.pop()
+                initialise(entity, *args)
+            else:
+                entity = self.entity_class(*args)
+            entity.index = index
+            entities.append(entity)
+
+        # Set one field of every entity at a time, letting map make the setattr calls.
+        for fields, values in columns:
+            for offset, field in enumerate(fields):
+                collections.deque(map(setattr, entities, itertools.repeat(field), values[offset::len(fields)]), 0)
+
+        self.next_id = next_id
+        return removed
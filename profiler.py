@@ -0,0 +1,186 @@
+""" Per phase frame timings kept in a ring buffer, an overlay to show them and dumping them to a file, and
+measuring how much CPU the game uses while it waits for input. """
+
+import array
+import csv
+import json
+import time
+
+import pygame
+
+from config import *
+
+PHASES = ("timers", "input", "spawn", "enemies", "projectiles", "collisions", "bullets", "draw")
+COUNTS = ("enemies", "dead_enemies", "projectiles", "bullets")
+
+class NullProfiler:
+    """ Does nothing so the game can always call the profiler without checking if it is enabled. """
+
+    enabled = False
+
+    def begin(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end(self, world_obj):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+class FrameProfiler:
+    """ Records how long each phase of the game loop took for the last PROFILE_FRAMES frames. A frame
+    starts with begin, every phase ends with a call to mark and the frame ends with end. """
+
+    enabled = True
+
+    def __init__(self, size=PROFILE_FRAMES):
+        self.size = size
+        self.index = 0
+        self.count = 0
+
+        # One ring buffer for every phase, the whole frame and every entity count.
+        self.times = {phase: array.array("d", bytes(8 * size)) for phase in PHASES}
+        self.frames = array.array("d", bytes(8 * size))
+        self.counts = {name: array.array("l", bytes(array.array("l").itemsize * size)) for name in COUNTS}
+
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = None
+        self.last = 0.0
+
+    def begin(self):
+        """ Start timing a frame. The whole frame is timed from the start of one frame to the next. """
+
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frames[self.index] = now - self.frame_start
+        self.frame_start = now
+        self.last = now
+
+        for phase in PHASES:
+            self.current[phase] = 0.0
+
+    def mark(self, phase):
+        """ Add the time since the last mark to the phase. """
+
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end(self, world_obj):
+        """ Store the frame's timings and entity counts and move on to the next slot. """
+
+        for phase in PHASES:
+            self.times[phase][self.index] = self.current[phase]
+        self.counts["enemies"][self.index] = len(world_obj.enemy_handler.enemies)
+        self.counts["dead_enemies"][self.index] = len(world_obj.enemy_handler.dead_enemies)
+        self.counts["projectiles"][self.index] = len(world_obj.player.projectiles)
+        bullets = world_obj.enemy_handler.bullets
+        self.counts["bullets"][self.index] = len(bullets) if bullets is not None else 0
+
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def recent(self):
+        """ Return the slots of the recorded frames from oldest to newest. """
+
+        if self.count < self.size:
+            return range(self.count)
+        return [(self.index + offset) % self.size for offset in range(self.size)]
+
+    def averages(self):
+        """ Return the average milliseconds of every phase and the frames per second. """
+
+        slots = self.recent()
+        if not slots:
+            return dict.fromkeys(PHASES, 0.0), 0.0
+
+        averages = {phase: 1000 * sum(self.times[phase][slot] for slot in slots) / len(slots) for phase in PHASES}
+        frame_times = [self.frames[slot] for slot in slots if self.frames[slot] > 0]
+        fps = len(frame_times) / sum(frame_times) if frame_times else 0.0
+        return averages, fps
+
+    def rows(self):
+        """ Return every recorded frame from oldest to newest with its timings in milliseconds. """
+
+        rows = []
+        for slot in self.recent():
+            row = {"frame_ms": 1000 * self.frames[slot]}
+            row.update({phase + "_ms": 1000 * self.times[phase][slot] for phase in PHASES})
+            row.update({name: self.counts[name][slot] for name in COUNTS})
+            rows.append(row)
+        return rows
+
+    def dump(self, path=PROFILE_DUMP):
+        """ Write the recorded frames to a CSV file, or a JSON file if the path ends with .json. """
+
+        rows = self.rows()
+        with open(path, "w", newline="") as dump_file:
+            if path.endswith(".json"):
+                json.dump(rows, dump_file, indent=4)
+            else:
+                writer = csv.DictWriter(dump_file, ["frame_ms"] + [phase + "_ms" for phase in PHASES] + list(COUNTS))
+                writer.writeheader()
+                writer.writerows(rows)
+
+class IdleMeter:
+    """ Measures how much CPU the process uses while the game waits for input, as a fraction of one
+    core, and how often it woke up. Waiting starts with begin and ends with end. """
+
+    def __init__(self):
+        self.cpu = 0.0
+        self.wall = 0.0
+        self.wakeups = 0
+        self.start = None
+
+    def begin(self):
+        self.start = (time.process_time(), time.perf_counter())
+
+    def wake(self):
+        self.wakeups += 1
+
+    def end(self):
+        cpu, wall = self.start
+        self.cpu += time.process_time() - cpu
+        self.wall += time.perf_counter() - wall
+        self.start = None
+
+    def usage(self):
+        """ Return the fraction of a core used while waiting. """
+
+        return self.cpu / self.wall if self.wall else 0.0
+
+    def report(self):
+        print("Idle for {:.1f} s using {:.2%} of a core, woke up {} times".format(self.wall, self.usage(), self.wakeups))
+
+class PerfOverlay:
+    """ Shows the average time of every phase, the frames per second and the entity counts in the
+    top left corner. Toggled with PROFILE_OVERLAY_KEY. """
+
+    def __init__(self, profiler, font):
+        self.profiler = profiler
+        self.font = font
+        self.visible = False
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def draw(self, screen):
+        """ Draw the overlay and return the area it covered, or None if it is hidden. """
+
+        if not self.visible or not self.profiler.count:
+            return None
+
+        averages, fps = self.profiler.averages()
+        newest = (self.profiler.index - 1) % self.profiler.size
+        lines = ["FPS: {:.1f}".format(fps)]
+        lines += ["{}: {:.2f} ms".format(phase, averages[phase]) for phase in PHASES]
+        lines += ["{}: {}".format(name, self.profiler.counts[name][newest]) for name in COUNTS]
+
+        area = pygame.Rect(10, 10, 0, 0)
+        for line in lines:
+            label = self.font.render(line, 1, (255, 255, 255), (0, 0, 0))
+            area.union_ip(screen.blit(label, (10, area.bottom)))
+
+        return area
@@ -1,71 +1,83 @@
-""" Manage projectile movement and collision detection. """
-
-import math
-
-from config import *
-import player
-
-class Projectile:
-
-    def __init__(self, sprite, x, y, angle):
-        self.sprite = sprite
-        self.x = x
-        self.y = y
-        self.angle = angle
-
-    def draw(self, screen, player_obj):
-
-        # Need to get the displacement of the player from the initial position to determine where the sprite should be drawn
-        # relative to the player.
-        screen.blit(self.sprite, (self.x - player_obj.x + (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), self.y - player_obj.y + (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2)))
-
-    def move(self):
-        """ Move the projectile using the angle. """
-
-        self.x += PROJECTILE_SPEED * math.cos(self.angle)
-        self.y += PROJECTILE_SPEED * math.sin(self.angle)
-
-def move_projectiles(player_obj):
-    """ Move the projectiles and check if the projectile runs into a wall. """
-
-    for projectile in player_obj.projectiles:
-        projectile.move()
-
-        # If the projectile collides with a wall.
-        # LEFT BORDER
-        if projectile.x - PROJECTILE_SIZE < LEFT_BORDER:
-            player_obj.projectiles.remove(projectile)
-
-        # RIGHT BORDER
-        elif projectile.x > RIGHT_BORDER + PROJECTILE_SIZE:
-            player_obj.projectiles.remove(projectile)
-
-        # UPPER BORDER
-        elif projectile.y - PROJECTILE_SIZE < UPPER_BORDER:
-            player_obj.projectiles.remove(projectile)
-
-        # LOWER BORDER
-        elif projectile.y > LOWER_BORDER + PROJECTILE_SIZE:
-            player_obj.projectiles.remove(projectile)
-
-def check_collisions(player_obj, enemy_handler):
-    """ Check if the projectiles collide with any enemies. """
-
-    # Needed to determine which enemy is shot first.
-    ordered_enemies = player.closest_enemy(player_obj, enemy_handler.enemies)
-
-    for projectile in player_obj.projectiles:
-        points = [(projectile.x, projectile.y),
-                  (projectile.x + PROJECTILE_SIZE, projectile.y),
-                  (projectile.x, projectile.y + PROJECTILE_SIZE),
-                  (projectile.x + PROJECTILE_SIZE, projectile.y + PROJECTILE_SIZE)]
-
-        for enemy in enemy_handler.enemies:
-            enemy_shot = enemy.check_shot(player_obj, enemy_handler, projectile, points)
-            if enemy_shot:
-                break
-            
-
-
-
-
+""" Manage projectile movement and collision detection. """
+
+import math
+
+from config import *
+
+# The area the top left corner of a projectile has to be inside of to hit an enemy, relative to
+# the top left corner of the enemy.
+HIT_LEFT = (ENEMY_SIZE / 2) - PROJECTILE_SIZE
+HIT_RIGHT = ENEMY_SIZE
+HIT_TOP = -PROJECTILE_SIZE
+HIT_BOTTOM = ENEMY_SIZE * 1.5
+
+class Projectile:
+
+    __slots__ = ("sprite", "x", "y", "angle", "previous_x", "previous_y", "index", "id")
+
+    # Fields kept in a saved state, as doubles and as integers.
+    SAVED = ("x", "y", "angle", "previous_x", "previous_y")
+    SAVED_INTEGERS = ("id",)
+
+    def __init__(self, sprite, x, y, angle):
+        self.sprite = sprite
+        self.x = x
+        self.y = y
+        self.angle = angle
+
+        # Position before the last move, used to check everything the projectile passed through.
+        self.previous_x = x
+        self.previous_y = y
+
+        # Place in the pool of projectiles and the id the pool gave it.
+        self.index = -1
+        self.id = -1
+
+    def move(self):
+        """ Move the projectile using the angle. """
+
+        self.previous_x = self.x
+        self.previous_y = self.y
+        self.x += PROJECTILE_SPEED * math.cos(self.angle)
+        self.y += PROJECTILE_SPEED * math.sin(self.angle)
+
+def move_projectiles(player_obj):
+    """ Move the projectiles and check if the projectile runs into a wall. """
+
+    map_obj = player_obj.map
+    for projectile in player_obj.projectiles:
+        projectile.move()
+
+        # If the projectile collides with a wall.
+        # LEFT BORDER
+        if projectile.x - PROJECTILE_SIZE < map_obj.left:
+            player_obj.projectiles.remove(projectile)
+
+        # RIGHT BORDER
+        elif projectile.x > map_obj.right + PROJECTILE_SIZE:
+            player_obj.projectiles.remove(projectile)
+
+        # UPPER BORDER
+        elif projectile.y - PROJECTILE_SIZE < map_obj.top:
+            player_obj.projectiles.remove(projectile)
+
+        # LOWER BORDER
+        elif projectile.y > map_obj.bottom + PROJECTILE_SIZE:
+            player_obj.projectiles.remove(projectile)
+
+def check_collisions(player_obj, enemy_handler):
+    """ Check if the projectiles collide with any enemies. The path each projectile took since the last move
+    is checked, so a fast projectile can't pass through an enemy, and the first enemy on that path is shot. """
+
+    index = enemy_handler.proximity_index()
+
+    hits = []
+    shot = set()
+    for projectile in player_obj.projectiles:
+        enemy = index.first_along(projectile.previous_x, projectile.previous_y, projectile.x, projectile.y,
+                                  HIT_LEFT, HIT_TOP, HIT_RIGHT, HIT_BOTTOM, shot)
+        if enemy is not None:
+            shot.add(enemy)
+            hits.append((enemy, projectile))
+
+    enemy_handler.shoot_enemies(player_obj, hits)
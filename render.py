@@ -0,0 +1,54 @@
+""" Queue of blits drawn one layer at a time with a single call for each layer. """
+
+from config import *
+
+# Layers from the bottom up. Everything in a layer is drawn before anything in the layer above it.
+TILES = 0
+DEAD_ENEMIES = 1
+PROJECTILES = 2
+ENEMIES = 3
+BULLETS = 4
+PLAYER = 5
+HUD = 6
+LAYERS = 7
+
+class RenderQueue:
+    """ Collects (surface, position) commands in layers and draws each layer with one Surface.blits
+    call, in the order the commands were submitted, so drawing thousands of sprites doesn't make a
+    Python call for every one of them. Surface.fblits is used instead when pygame has it and the
+    areas drawn over aren't needed. The queue is emptied when it is flushed and can be reused. """
+
+    def __init__(self):
+        self.layers = [[] for layer in range(LAYERS)]
+
+    def __len__(self):
+        return sum(len(commands) for commands in self.layers)
+
+    def submit(self, surface, position, layer):
+        """ Queue a surface to be drawn at the position in the layer. """
+
+        self.layers[layer].append((surface, position))
+
+    def extend(self, layer, commands):
+        """ Queue a list of (surface, position) commands in the layer. """
+
+        self.layers[layer].extend(commands)
+
+    def flush(self, screen, rects=None, collect_from=DEAD_ENEMIES):
+        """ Draw every layer from the bottom up and empty the queue. If a list of rects is given, the
+        areas drawn over by the layers from collect_from up are added to it. The tiles only change when
+        the camera moves, which updates the whole screen anyway, so they are left out by default. """
+
+        fblits = getattr(screen, "fblits", None)
+
+        for layer, commands in enumerate(self.layers):
+            if not commands:
+                continue
+
+            if rects is not None and layer >= collect_from:
+                rects.extend(screen.blits(commands))
+            elif fblits is not None:
+                fblits(commands)
+            else:
+                screen.blits(commands, False)
+            commands.clear()
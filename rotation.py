@@ -0,0 +1,67 @@
+""" Rotated copies of sprites so things can be drawn facing any direction without rotating them every frame. """
+
+import collections
+import math
+
+import pygame
+
+from config import *
+
+class RotationCache:
+    """ Rotates a sprite to ROTATION_STEPS evenly spaced angles the first time each angle is needed
+    and keeps the most recently used ROTATION_CACHE_SIZE of them, so drawing something at an angle is
+    a lookup and one blit. Facing is the angle the unrotated sprite points in, using the same angles
+    as math.atan2 with the screen's y axis pointing down. """
+
+    def __init__(self, sprite, facing=0.0, steps=ROTATION_STEPS, size=ROTATION_CACHE_SIZE):
+        self.sprite = sprite
+        self.facing = facing
+        self.steps = steps
+        self.size = size
+        self.rotated = collections.OrderedDict()
+
+    def step(self, angle):
+        """ Return which of the evenly spaced angles is closest to the angle. """
+
+        return round(angle * self.steps / (2 * math.pi)) % self.steps
+
+    def get(self, angle):
+        """ Return the sprite rotated to the angle along with half of its width and height so it can
+        be drawn centered on a position. """
+
+        step = self.step(angle)
+        rotated = self.rotated.get(step)
+        if rotated is None:
+            rotated = self.render(step)
+            self.rotated[step] = rotated
+            if len(self.rotated) > self.size:
+                self.rotated.popitem(last=False)
+        else:
+            self.rotated.move_to_end(step)
+
+        return rotated
+
+    def render(self, step):
+        """ Rotate the sprite to the step. Rotating a sprite without transparency would fill the corners
+        it grows by with a colour, so it is given transparency first. """
+
+        sprite = self.sprite
+        if not sprite.get_flags() & pygame.SRCALPHA:
+            sprite = pygame.Surface(sprite.get_size(), pygame.SRCALPHA)
+            sprite.blit(self.sprite, (0, 0))
+
+        # Pygame rotates counterclockwise on the screen while the angles turn clockwise.
+        degrees = -math.degrees(step * 2 * math.pi / self.steps - self.facing)
+        surface = pygame.transform.rotate(sprite, degrees)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+
+        return surface, surface.get_width() / 2, surface.get_height() / 2
+
+    def prerender(self):
+        """ Rotate the sprite to every step up front, as many as the cache holds, so no rotation is done
+        while playing. The display should be set up first so the rotated sprites can be converted. """
+
+        for step in range(min(self.steps, self.size)):
+            if step not in self.rotated:
+                self.rotated[step] = self.render(step)
@@ -0,0 +1,86 @@
+""" The whole state of a world packed into a compact binary form, so it can be captured and restored for
+checkpoints, rolling back and simulating ticks again, and restarting. Things that can be worked out
+from the state again, like the flow field, aren't stored. """
+
+import array
+import struct
+
+# Every state starts with the magic bytes, the format version, the enemy backend it was captured from
+# and if enemies were shooting.
+MAGIC = b"WRLD"
+VERSION = 1
+HEADER = struct.Struct("<4sHB?")
+BACKENDS = ("object", "array")
+
+# World ticks, scheduler tick and the random number generator's spare gaussian, if it has one.
+WORLD = struct.Struct("<qq?d")
+
+# Position, previous position, health, kills, the ticks the shoot cooldown and invincibility end on and the aim.
+PLAYER = struct.Struct("<ddddqqqqd")
+
+# Ticks the enemy handler spawns and shoots on.
+HANDLER = struct.Struct("<qq")
+
+# Number of entities and the next id to give out.
+COUNT = struct.Struct("<qq")
+
+# State of NumPy's PCG64 generator: its 128 bit state and increment and a spare 32 bits.
+ARRAY_RANDOM = struct.Struct("<16s16s?I")
+
+# Length in bytes of an array of values that follows.
+LENGTH = struct.Struct("<I")
+
+class StateWriter:
+    """ Collects the packed parts of a state to be joined together once at the end. """
+
+    def __init__(self):
+        self.parts = []
+
+    def pack(self, layout, *values):
+        self.parts.append(layout.pack(*values))
+
+    def array(self, values):
+        """ Add an array from the array module or NumPy with its length in bytes first. """
+
+        data = values.tobytes()
+        self.parts.append(LENGTH.pack(len(data)))
+        self.parts.append(data)
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+class StateReader:
+    """ Reads the parts of a state in the order they were written. With keep_ids, ids keep counting up
+    from where they are instead of going back to the saved next ids. """
+
+    def __init__(self, data, keep_ids=False):
+        self.data = memoryview(data)
+        self.offset = 0
+        self.keep_ids = keep_ids
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def bytes(self):
+        """ Return the bytes of the next array without copying them. """
+
+        (length,) = self.unpack(LENGTH)
+        data = self.data[self.offset:self.offset + length]
+        self.offset += length
+        return data
+
+    def array(self, typecode):
+        """ Return the next array as an array of the type from the array module. """
+
+        values = array.array(typecode)
+        values.frombytes(self.bytes())
+        return values
+
+    def next_id(self, saved, live):
+        """ Return the next id to give out from the saved one and the one in use now. """
+
+        if self.keep_ids:
+            return max(saved, live)
+        return saved
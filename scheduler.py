@@ -0,0 +1,70 @@
+""" Runs things at a later simulation tick without counting down every tick. """
+
+import heapq
+import itertools
+
+class Event:
+    """ A callback waiting for its tick in the scheduler. Cancelling it leaves it in the queue
+    but stops it from running. """
+
+    __slots__ = ("tick", "callback", "args")
+
+    def __init__(self, tick, callback, args):
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        self.callback = None
+
+    @property
+    def cancelled(self):
+        return self.callback is None
+
+class Scheduler:
+    """ Counts the simulation ticks and keeps events in a min heap ordered by the tick they are due
+    on, so advancing a tick only looks at the events that are due instead of every entity with a
+    countdown. Events due on the same tick run in the order they were scheduled.
+
+    Timers that are only ever checked, like a cooldown, don't need an event at all: storing the tick
+    they end on and comparing it with the current tick is enough. """
+
+    def __init__(self):
+        self.tick = 0
+        self.queue = []
+        self.order = itertools.count()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def schedule(self, delay, callback, *args):
+        """ Call the callback with the arguments when the tick is delay ticks from now. Returns the
+        event so it can be cancelled. """
+
+        event = Event(self.tick + delay, callback, args)
+        heapq.heappush(self.queue, (event.tick, next(self.order), event))
+        return event
+
+    def remaining(self, tick):
+        """ Return how many ticks are left until the tick, or 0 if it has passed. """
+
+        return max(tick - self.tick, 0)
+
+    def advance(self):
+        """ Move on to the next tick and run every event due by then. Returns how many events ran. """
+
+        self.tick += 1
+
+        ran = 0
+        while self.queue and self.queue[0][0] <= self.tick:
+            event = heapq.heappop(self.queue)[2]
+            if not event.cancelled:
+                event.callback(*event.args)
+                ran += 1
+
+        return ran
+
+    def clear(self):
+        """ Drop every waiting event without running it. The tick keeps counting. """
+
+        self.queue = []
@@ -0,0 +1,300 @@
+#! /usr/bin/env python3
+""" Run the game as an authoritative server over UDP. The server is the only thing simulating the world
+and sends every client snapshots of what is near its view. The first client to join controls the player
+and the others watch, moving their own view around with the movement keys. """
+
+import argparse
+import collections
+import socket
+import time
+
+import pygame
+
+from config import *
+import controls
+import network
+import tilemap
+import world
+
+class RemoteClient:
+    """ A client the server has heard from, the input it last sent and the frames sent to it which it
+    may have received and can be used as a baseline. """
+
+    def __init__(self, client_id, address, view_x, view_y):
+        self.id = client_id
+        self.address = address
+        self.heard = time.perf_counter()
+
+        # Newest input and the sequence of the newest snapshot the client said it received.
+        self.sequence = 0
+        self.acked = 0
+        self.keys = []
+        self.clicks = (False, False, False)
+        self.position = (SCREEN_SIZE / 2, SCREEN_SIZE / 2)
+
+        # Where the client is watching from when it isn't controlling the player.
+        self.view_x = view_x
+        self.view_y = view_y
+
+        # Frames sent to the client by sequence, oldest first.
+        self.frames = collections.OrderedDict()
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+
+class GameServer:
+    """ Steps the world and sends snapshots to the clients. A client is only sent the things within
+    NET_INTEREST_RADIUS of its view, closest first, and only what changed since the newest snapshot it
+    said it received, so the size of a snapshot depends on what is around the client and not on how
+    many things there are in the world. The world's player has to use remote controls. """
+
+    def __init__(self, world_obj, address=(NET_HOST, NET_PORT)):
+        self.world = world_obj
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+
+        self.clients = dict()
+        self.next_id = 1
+        self.owner = None
+        self.running = False
+
+        # Steps taken and snapshots sent, which keep counting when the world is reset.
+        self.steps = 0
+        self.sequence = 0
+
+    def receive(self):
+        """ Handle every message waiting on the socket. """
+
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65536)
+            except BlockingIOError:
+                return
+            except ConnectionResetError:
+                # Windows reports a client that went away on the next read instead of dropping its datagrams.
+                continue
+
+            if not data:
+                continue
+
+            client = self.clients.get(address)
+            if data[0] == network.HELLO:
+                if client is None:
+                    client = self.join(address)
+                self.socket.sendto(network.WELCOME_MESSAGE.pack(network.WELCOME, client.id), address)
+            elif client is None:
+                continue
+            elif data[0] == network.INPUT and len(data) == network.INPUT_MESSAGE.size:
+                self.handle_input(client, data)
+            elif data[0] == network.BYE:
+                self.leave(client)
+
+    def handle_input(self, client, data):
+        """ Keep the client's input unless newer input already arrived. """
+
+        message_type, sequence, acked, keys, buttons, x, y = network.INPUT_MESSAGE.unpack(data)
+        if sequence <= client.sequence:
+            return
+
+        client.sequence = sequence
+        client.acked = acked
+        client.keys = network.mask_keys(keys)
+        client.clicks = network.mask_buttons(buttons)
+        client.position = (x, y)
+        client.heard = time.perf_counter()
+
+        if client is self.owner:
+            self.world.player.controls.receive(client.keys, client.clicks, client.position)
+
+    def join(self, address):
+        """ Add a client watching from where the player is. The first client controls the player. """
+
+        client = RemoteClient(self.next_id, address, self.world.player.x, self.world.player.y)
+        self.next_id += 1
+        self.clients[address] = client
+
+        if self.owner is None:
+            self.owner = client
+
+        return client
+
+    def leave(self, client):
+        """ Remove the client. If it controlled the player, the client that joined after it takes over. """
+
+        del self.clients[client.address]
+
+        if client is self.owner:
+            self.owner = next(iter(self.clients.values()), None)
+            if self.owner is not None:
+                self.world.player.controls.receive(self.owner.keys, self.owner.clicks, self.owner.position)
+            else:
+                self.world.player.controls.receive([], (False, False, False), (SCREEN_SIZE / 2, SCREEN_SIZE / 2))
+
+    def drop_quiet_clients(self):
+        """ Remove the clients that haven't sent anything for NET_TIMEOUT seconds. """
+
+        now = time.perf_counter()
+        for client in [client for client in self.clients.values() if now - client.heard > NET_TIMEOUT]:
+            self.leave(client)
+
+    def move_views(self):
+        """ Move the view of every watching client with its movement keys, keeping it inside of the map. """
+
+        map_obj = self.world.map
+        for client in self.clients.values():
+            if client is self.owner or not client.keys:
+                continue
+
+            keys = controls.PressedKeys(client.keys)
+            x_change = (keys[pygame.K_d] - keys[pygame.K_a]) * PLAYER_SPEED
+            y_change = (keys[pygame.K_s] - keys[pygame.K_w]) * PLAYER_SPEED
+            client.view_x = min(max(client.view_x + x_change, map_obj.left), map_obj.right)
+            client.view_y = min(max(client.view_y + y_change, map_obj.top), map_obj.bottom)
+
+    def frame(self, client):
+        """ Return what the client can see of the world this tick. """
+
+        player_obj = self.world.player
+        enemy_handler = self.world.enemy_handler
+
+        if client is self.owner:
+            flags = network.CONTROLLING
+            view_x = player_obj.x
+            view_y = player_obj.y
+        else:
+            flags = 0
+            view_x = client.view_x
+            view_y = client.view_y
+
+        left = view_x - NET_INTEREST_RADIUS
+        top = view_y - NET_INTEREST_RADIUS
+        right = view_x + NET_INTEREST_RADIUS
+        bottom = view_y + NET_INTEREST_RADIUS
+
+        ids, x, y = enemy_handler.ids_in(left, top, right, bottom, NET_MAX_ENTITIES)
+        enemies = {thing_id: (network.quantise(thing_x), network.quantise(thing_y))
+                   for thing_id, thing_x, thing_y in zip(ids, x, y)}
+
+        found = enemy_handler.dead_enemies_in(left, top, right, bottom)
+        dead_enemies = {found[index].id: (network.quantise(found[index].x), network.quantise(found[index].y))
+                        for index in nearest([dead_enemy.x for dead_enemy in found], [dead_enemy.y for dead_enemy in found],
+                                             view_x - (ENEMY_SIZE / 2), view_y - (ENEMY_SIZE / 2))}
+
+        found = [projectile for projectile in player_obj.projectiles
+                 if left < projectile.x < right and top < projectile.y < bottom]
+        projectiles = {found[index].id: (network.quantise(found[index].x), network.quantise(found[index].y),
+                                         network.quantise_angle(found[index].angle))
+                       for index in nearest([projectile.x for projectile in found], [projectile.y for projectile in found],
+                                            view_x, view_y)}
+
+        bullets = dict()
+        if enemy_handler.bullets is not None:
+            ids, x, y = enemy_handler.bullets.ids_in(left, top, right, bottom, NET_MAX_ENTITIES)
+            bullets = {thing_id: (network.quantise(thing_x), network.quantise(thing_y))
+                       for thing_id, thing_x, thing_y in zip(ids, x, y)}
+
+        return network.Frame(self.sequence, flags, network.quantise(player_obj.x), network.quantise(player_obj.y),
+                             network.quantise_angle(player_obj.aim), player_obj.health, player_obj.kills,
+                             player_obj.invincibility, network.quantise(view_x), network.quantise(view_y),
+                             (enemies, dead_enemies, projectiles, bullets))
+
+    def send_snapshots(self):
+        """ Send every client what it can see, compressed against the newest frame it received. """
+
+        self.sequence += 1
+        for client in self.clients.values():
+            frame = self.frame(client)
+            data = network.encode_snapshot(frame, client.frames.get(client.acked))
+
+            # The datagram is thrown away if the socket's buffer is full, like one lost on the way.
+            try:
+                self.socket.sendto(data, client.address)
+            except BlockingIOError:
+                pass
+
+            client.frames[frame.sequence] = frame
+            while len(client.frames) > NET_HISTORY:
+                client.frames.popitem(last=False)
+            client.bytes_sent += len(data)
+            client.snapshots_sent += 1
+
+    def step(self):
+        """ Handle the clients' messages, step the world and send snapshots every NET_SNAPSHOT_INTERVAL
+        ticks. The world waits while there are no clients and the player is reset when they die. """
+
+        self.receive()
+        self.drop_quiet_clients()
+        if not self.clients:
+            return
+
+        self.move_views()
+        self.world.step()
+        if self.world.player.health <= 0:
+            self.world.reset()
+
+        self.steps += 1
+        if self.steps % NET_SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots()
+
+    def serve(self):
+        """ Step SIMULATION_RATE times a second until stopped. """
+
+        step_time = 1 / SIMULATION_RATE
+        next_step = time.perf_counter()
+        self.running = True
+
+        while self.running:
+            now = time.perf_counter()
+            if now < next_step:
+                time.sleep(next_step - now)
+                continue
+
+            self.step()
+
+            # Drop the time the server can't catch up on so it doesn't spiral.
+            if now - next_step > MAX_CATCH_UP_STEPS * step_time:
+                next_step = now
+            next_step += step_time
+
+    def close(self):
+        self.running = False
+        self.socket.close()
+
+def nearest(x, y, view_x, view_y):
+    """ Return the indices of at most NET_MAX_ENTITIES of the positions, closest to the view first if
+    there are more than that. """
+
+    if len(x) <= NET_MAX_ENTITIES:
+        return range(len(x))
+
+    return sorted(range(len(x)), key=lambda index: (x[index] - view_x) ** 2 + (y[index] - view_y) ** 2)[:NET_MAX_ENTITIES]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=NET_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=NET_PORT, help="port to listen on")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the world's random number generator")
+    parser.add_argument("--enemies", type=int, default=MAX_ENEMIES, help="maximum number of enemies")
+    parser.add_argument("--backend", choices=["object", "array"], default=ENEMY_BACKEND, help="enemy backend")
+    parser.add_argument("--pathfinding", choices=["direct", "flow_field"], default=ENEMY_PATHFINDING,
+                        help="how enemies find their way to the player")
+    parser.add_argument("--shooting", action="store_true", default=ENEMY_SHOOTING, help="let enemies shoot at the player")
+    parser.add_argument("--map", default=MAP_FILE, help="map file to play on, which the clients need too")
+    args = parser.parse_args()
+
+    world_obj = world.World(seed=args.seed, controls_obj=controls.RemoteControls(), backend=args.backend,
+                            map_obj=tilemap.MapFile(args.map), pathfinding=args.pathfinding, shooting=args.shooting)
+    world_obj.enemy_handler.max_enemies = args.enemies
+
+    server_obj = GameServer(world_obj, (args.host, args.port))
+    print("Serving on {}:{}".format(*server_obj.address))
+    try:
+        server_obj.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_obj.close()
+
+if __name__ == "__main__":
+    main()
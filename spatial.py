@@ -0,0 +1,296 @@
+""" Uniform spatial hash grid and the indexes built on it, used to find nearby enemies without checking every enemy. """
+
+import bisect
+import operator
+
+from config import *
+
+class SpatialGrid:
+    """ Buckets objects with an x and y position into square cells. Every object is stored in the
+    cell containing its top left corner, so an object no bigger than a cell can only overlap objects
+    stored in the neighbouring cells. The listener, if there is one, is told whenever a cell gets its
+    first object or loses its last one. """
+
+    def __init__(self, cell_size=ENEMY_SIZE, listener=None):
+        self.cell_size = cell_size
+        self.cells = dict()
+        self.listener = listener
+
+    def cell(self, x, y):
+        """ Return the key of the cell containing the position. """
+
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def insert(self, obj):
+        """ Add an object to the cell containing its position. """
+
+        obj.cell = self.cell(obj.x, obj.y)
+        bucket = self.cells.get(obj.cell)
+        if bucket is None:
+            bucket = self.cells[obj.cell] = []
+            if self.listener is not None:
+                self.listener.cell_filled(obj.cell)
+        bucket.append(obj)
+
+    def remove(self, obj):
+        """ Remove an object from the cell it was last stored in. """
+
+        bucket = self.cells[obj.cell]
+        bucket.remove(obj)
+        if not bucket:
+            del self.cells[obj.cell]
+            if self.listener is not None:
+                self.listener.cell_emptied(obj.cell)
+
+    def move(self, obj):
+        """ Move an object to a new cell if its position has changed cell since it was last stored. """
+
+        if self.cell(obj.x, obj.y) != obj.cell:
+            self.remove(obj)
+            self.insert(obj)
+
+    def restore(self, cells):
+        """ Replace what the grid holds with the cells, a dictionary from cell to the list of objects in it.
+        Cells holding the same objects in the same order are left alone, so the listener only hears about
+        cells that gained their first object or lost their last one. """
+
+        for cell in [cell for cell in self.cells if cell not in cells]:
+            del self.cells[cell]
+            if self.listener is not None:
+                self.listener.cell_emptied(cell)
+
+        for cell, bucket in cells.items():
+            old_bucket = self.cells.get(cell)
+            if old_bucket == bucket:
+                continue
+            if old_bucket is None and self.listener is not None:
+                self.listener.cell_filled(cell)
+            self.cells[cell] = bucket
+            for obj in bucket:
+                obj.cell = cell
+
+    def clear(self):
+        """ Remove every object from the grid. """
+
+        if self.listener is not None:
+            for cell in self.cells:
+                self.listener.cell_emptied(cell)
+        self.cells.clear()
+
+    def cell_range(self, left, top, right, bottom):
+        """ Return the range of cells that may hold an object of cell size which overlaps the rectangle. """
+
+        first = self.cell(left - self.cell_size, top - self.cell_size)
+        last = self.cell(right, bottom)
+        return first[0], first[1], last[0], last[1]
+
+    def query(self, left, top, right, bottom):
+        """ Return the objects whose cells are close enough for them to overlap the rectangle. """
+
+        first_x, first_y, last_x, last_y = self.cell_range(left, top, right, bottom)
+
+        found = []
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    found.extend(bucket)
+
+        return found
+
+    def near(self, obj, left, top, right, bottom):
+        """ Check if the object's cell is close enough for it to overlap the rectangle. """
+
+        first_x, first_y, last_x, last_y = self.cell_range(left, top, right, bottom)
+        return first_x <= obj.cell[0] <= last_x and first_y <= obj.cell[1] <= last_y
+
+class ProximityIndex:
+    """ Answers nearest, radius and first along a path queries about the objects in a spatial grid and
+    keeps the objects ordered by distance from a point, usually the player. The order is kept between
+    updates, and since every object only moves a little each tick, the list is already nearly sorted
+    and sorting it again takes close to a single pass. Distances are stored squared in each object's
+    distance so no square roots are needed. """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.ordered = []
+        self.removed = set()
+
+    def __len__(self):
+        return len(self.ordered) - len(self.removed)
+
+    def add(self, obj):
+        """ Start keeping the object in order. The object has to be in the grid as well. """
+
+        # A pooled object can be removed and added again before the next update.
+        if obj in self.removed:
+            self.removed.discard(obj)
+        else:
+            self.ordered.append(obj)
+
+    def remove(self, obj):
+        """ Stop keeping the object in order. It is dropped from the list on the next update. """
+
+        self.removed.add(obj)
+
+    def clear(self):
+        self.ordered = []
+        self.removed = set()
+
+    def update(self, x, y):
+        """ Measure the distance of every object to the position and return the objects from closest to furthest. """
+
+        if self.removed:
+            self.ordered = [obj for obj in self.ordered if obj not in self.removed]
+            self.removed = set()
+
+        for obj in self.ordered:
+            obj.distance = (obj.x - x) ** 2 + (obj.y - y) ** 2
+        self.ordered.sort(key=operator.attrgetter("distance"))
+
+        return self.ordered
+
+    def nearest(self, x, y, count):
+        """ Return up to count objects closest to the position, closest first. Rings of cells around the
+        position are searched outwards until no object further out could be closer. """
+
+        if count <= 0:
+            return []
+
+        center_x, center_y = self.grid.cell(x, y)
+        total = len(self)
+
+        found = []
+        seen = 0
+        ring = 0
+        while seen < total:
+            for cell in ring_cells(center_x, center_y, ring):
+                bucket = self.grid.cells.get(cell)
+                if bucket:
+                    seen += len(bucket)
+                    found.extend(((obj.x - x) ** 2 + (obj.y - y) ** 2, index, obj)
+                                 for index, obj in enumerate(bucket, len(found)))
+
+            # Anything outside of the rings searched is at least this far away.
+            if len(found) >= count:
+                found.sort()
+                if found[count - 1][0] <= (ring * self.grid.cell_size) ** 2:
+                    break
+            ring += 1
+
+        found.sort()
+        return [obj for distance, index, obj in found[:count]]
+
+    def within(self, x, y, radius):
+        """ Return the objects whose position is within the radius of the position. """
+
+        return [obj for obj in self.grid.query(x - radius, y - radius, x + radius, y + radius)
+                if (obj.x - x) ** 2 + (obj.y - y) ** 2 <= radius ** 2]
+
+    def first_along(self, start_x, start_y, end_x, end_y, left, top, right, bottom, skip=()):
+        """ Return the object whose box the path from the start to the end enters first or None if it
+        enters none. The box is left, top, right and bottom relative to the object's position. Objects
+        in skip are ignored. Only the cells around the path are searched, which for the distance
+        something moves in one tick is a handful. """
+
+        low_x = min(start_x, end_x)
+        high_x = max(start_x, end_x)
+        low_y = min(start_y, end_y)
+        high_y = max(start_y, end_y)
+        first_x, first_y = self.grid.cell(low_x - right, low_y - bottom)
+        last_x, last_y = self.grid.cell(high_x - left, high_y - top)
+
+        closest = None
+        closest_time = 2
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                for obj in self.grid.cells.get((cell_x, cell_y), ()):
+                    # Skip objects whose box is out of the way of the path or that are skipped.
+                    if (obj.x + right <= low_x or obj.x + left >= high_x or
+                        obj.y + bottom <= low_y or obj.y + top >= high_y or obj in skip):
+                        continue
+
+                    time = segment_time(start_x, start_y, end_x, end_y,
+                                        obj.x + left, obj.y + top, obj.x + right, obj.y + bottom)
+                    if time is not None and time < closest_time:
+                        closest = obj
+                        closest_time = time
+
+        return closest
+
+class SweepIndex:
+    """ Sort and sweep along the x axis for objects that aren't kept in a grid. Objects are sorted by
+    x position once, so each path only checks the objects whose box overlaps it horizontally. """
+
+    def __init__(self, objects):
+        self.objects = sorted(objects, key=operator.attrgetter("x"))
+        self.positions = [obj.x for obj in self.objects]
+
+    def first_along(self, start_x, start_y, end_x, end_y, left, top, right, bottom, skip=()):
+        """ Return the object whose box the path from the start to the end enters first or None if it
+        enters none, the same way ProximityIndex.first_along does. """
+
+        first = bisect.bisect_right(self.positions, min(start_x, end_x) - right)
+        last = bisect.bisect_left(self.positions, max(start_x, end_x) - left)
+        low_y = min(start_y, end_y)
+        high_y = max(start_y, end_y)
+
+        closest = None
+        closest_time = 2
+        for index in range(first, last):
+            obj = self.objects[index]
+
+            # Skip objects that are vertically out of the way or skipped.
+            if obj.y + top >= high_y or obj.y + bottom <= low_y or obj in skip:
+                continue
+
+            time = segment_time(start_x, start_y, end_x, end_y,
+                                obj.x + left, obj.y + top, obj.x + right, obj.y + bottom)
+            if time is not None and time < closest_time:
+                closest = obj
+                closest_time = time
+
+        return closest
+
+def ring_cells(center_x, center_y, ring):
+    """ Return the cells on the square ring the distance of ring cells around the center cell. """
+
+    if ring == 0:
+        return [(center_x, center_y)]
+
+    cells = []
+    for cell_x in range(center_x - ring, center_x + ring + 1):
+        cells.append((cell_x, center_y - ring))
+        cells.append((cell_x, center_y + ring))
+    for cell_y in range(center_y - ring + 1, center_y + ring):
+        cells.append((center_x - ring, cell_y))
+        cells.append((center_x + ring, cell_y))
+    return cells
+
+def segment_time(start_x, start_y, end_x, end_y, left, top, right, bottom):
+    """ Return the fraction of the way along the segment where it enters the inside of the box
+    or None if it never does. """
+
+    enter = 0
+    leave = 1
+    for start, end, low, high in ((start_x, end_x, left, right), (start_y, end_y, top, bottom)):
+        change = end - start
+
+        # Moving parallel to the sides, so the segment is either always or never between them.
+        if change == 0:
+            if not low < start < high:
+                return None
+            continue
+
+        low_time = (low - start) / change
+        high_time = (high - start) / change
+        if low_time > high_time:
+            low_time, high_time = high_time, low_time
+
+        enter = max(enter, low_time)
+        leave = min(leave, high_time)
+
+    if enter < leave:
+        return enter
+
+    return None
@@ -0,0 +1,118 @@
+""" Picks free places off screen for enemies to spawn without retrying random positions. """
+
+import array
+import itertools
+import math
+
+from config import *
+
+class SpawnSampler:
+    """ Keeps track of which ENEMY_SIZE cells of the map an enemy could spawn in without overlapping
+    another enemy. Listens to the spatial grid of enemies: an enemy stored in a grid cell can reach into
+    that cell and the cells right and below of it, so those cells are blocked while the grid cell has
+    any enemies in it. The free cells are kept in a list so one can be picked at random straight away. """
+
+    def __init__(self, map_obj, cell_size=ENEMY_SIZE, attempts=SPAWN_ATTEMPTS):
+        self.cell_size = cell_size
+        self.attempts = attempts
+
+        # Cells whose whole area is inside of the map borders.
+        self.first_x = math.ceil(map_obj.left / cell_size)
+        self.last_x = math.floor((map_obj.right - ENEMY_SIZE) / cell_size)
+        self.first_y = math.ceil(map_obj.top / cell_size)
+        self.last_y = math.floor((map_obj.bottom - ENEMY_SIZE) / cell_size)
+
+        self.blocked = dict()
+        self.free = []
+        self.free_index = dict()
+        self.reset()
+
+    def reset(self):
+        """ Mark every cell as free. """
+
+        self.blocked = dict()
+        self.free = [(cell_x, cell_y)
+                     for cell_x in range(self.first_x, self.last_x + 1)
+                     for cell_y in range(self.first_y, self.last_y + 1)]
+        self.free_index = {cell: index for index, cell in enumerate(self.free)}
+
+    def capture(self, writer):
+        """ Add the free cells to a saved state in the order they are kept in, which decides where enemies spawn. """
+
+        writer.array(array.array("i", itertools.chain.from_iterable(self.free)))
+
+    def restore(self, reader):
+        """ Read the free cells back from a saved state. Which cells are blocked comes from the grid, so the
+        enemies have to be back in the grid first. """
+
+        cells = reader.array("i")
+        self.free = list(zip(cells[0::2], cells[1::2]))
+        self.free_index = {cell: index for index, cell in enumerate(self.free)}
+
+    def blocked_cells(self, cell):
+        """ Return the cells an enemy stored in the grid cell could overlap. """
+
+        cell_x, cell_y = cell
+        return ((cell_x, cell_y), (cell_x + 1, cell_y), (cell_x, cell_y + 1), (cell_x + 1, cell_y + 1))
+
+    def cell_filled(self, cell):
+        """ Called by the spatial grid when a cell gets its first enemy. """
+
+        for blocked in self.blocked_cells(cell):
+            count = self.blocked.get(blocked, 0)
+            self.blocked[blocked] = count + 1
+            if count == 0 and blocked in self.free_index:
+                self.remove_free(blocked)
+
+    def cell_emptied(self, cell):
+        """ Called by the spatial grid when a cell loses its last enemy. """
+
+        for blocked in self.blocked_cells(cell):
+            count = self.blocked.get(blocked, 0) - 1
+            if count > 0:
+                self.blocked[blocked] = count
+                continue
+
+            self.blocked.pop(blocked, None)
+            if self.first_x <= blocked[0] <= self.last_x and self.first_y <= blocked[1] <= self.last_y:
+                self.free_index[blocked] = len(self.free)
+                self.free.append(blocked)
+
+    def remove_free(self, cell):
+        """ Remove the cell from the free list by moving the last free cell into its place. """
+
+        index = self.free_index.pop(cell)
+        last = self.free.pop()
+        if index < len(self.free):
+            self.free[index] = last
+            self.free_index[last] = index
+
+    def off_screen(self, cell, player_obj):
+        """ Check if an enemy in the cell would be outside of the player's view, the same way the
+        old spawn areas left, right, above and below the screen did. """
+
+        x = cell[0] * self.cell_size
+        y = cell[1] * self.cell_size
+        return (x <= player_obj.x - (SCREEN_SIZE / 2) or x >= player_obj.x + (SCREEN_SIZE / 2) or
+                y <= player_obj.y - (SCREEN_SIZE / 2) or y >= player_obj.y + (SCREEN_SIZE / 2))
+
+    def sample(self, rng, player_obj):
+        """ Return the position of a random free cell off screen or None if there isn't one. A few random
+        free cells are tried first, then every free cell is checked, so this never takes longer than a
+        pass over the free cells. """
+
+        if not self.free:
+            return None
+
+        for attempt in range(self.attempts):
+            cell = self.free[rng.randrange(len(self.free))]
+            if self.off_screen(cell, player_obj):
+                return cell[0] * self.cell_size, cell[1] * self.cell_size
+
+        # Most of the free cells are on screen so pick from the ones that aren't.
+        cells = [cell for cell in self.free if self.off_screen(cell, player_obj)]
+        if not cells:
+            return None
+
+        cell = cells[rng.randrange(len(cells))]
+        return cell[0] * self.cell_size, cell[1] * self.cell_size
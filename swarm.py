@@ -0,0 +1,385 @@
+""" Enemy handler that keeps the enemies in NumPy arrays and updates the whole swarm at once. """
+
+import math
+
+import numpy
+
+from config import *
+import enemies
+import savestate
+import spatial
+
+class EnemyArrays:
+    """ Structure of arrays holding the position, previous position, random direction and id of every enemy.
+    Behaves like the list of enemies in the object handler by handing out views of the enemies. """
+
+    FIELDS = ("x", "y", "previous_x", "previous_y", "random_direction", "reroll_tick", "id")
+
+    def __init__(self, sprite, capacity=64):
+        self.sprite = sprite
+        self.count = 0
+        self.next_id = 0
+
+        self.x = numpy.zeros(capacity)
+        self.y = numpy.zeros(capacity)
+        self.previous_x = numpy.zeros(capacity)
+        self.previous_y = numpy.zeros(capacity)
+        self.random_direction = numpy.zeros(capacity)
+        self.reroll_tick = numpy.zeros(capacity, dtype=numpy.int64)
+        self.id = numpy.zeros(capacity, dtype=numpy.int64)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter([ChaserView(self, index) for index in range(self.count)])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("enemy index out of range")
+        return ChaserView(self, index)
+
+    def append(self, x, y):
+        """ Add an enemy at the position, doubling the size of the arrays if they are full. """
+
+        if self.count == len(self.x):
+            for field in self.FIELDS:
+                setattr(self, field, numpy.resize(getattr(self, field), self.count * 2))
+
+        self.x[self.count] = self.previous_x[self.count] = x
+        self.y[self.count] = self.previous_y[self.count] = y
+        self.random_direction[self.count] = 0
+        self.reroll_tick[self.count] = 0
+        self.id[self.count] = self.next_id
+        self.next_id += 1
+        self.count += 1
+
+    def remove(self, view):
+        """ Remove the enemy by moving the last enemy into its place. Views of the last enemy are
+        no longer valid afterwards. """
+
+        index = view.index
+        last = self.count - 1
+        for field in self.FIELDS:
+            values = getattr(self, field)
+            values[index] = values[last]
+        self.count = last
+
+    def clear(self):
+        """ Remove every enemy. """
+
+        self.count = 0
+
+    def capture(self, writer):
+        """ Add the live part of every array to a saved state. """
+
+        writer.pack(savestate.COUNT, self.count, self.next_id)
+        for field in self.FIELDS:
+            writer.array(getattr(self, field)[:self.count])
+
+    def restore(self, reader):
+        """ Read the arrays back from a saved state, growing them if they are too small. """
+
+        self.count, next_id = reader.unpack(savestate.COUNT)
+        self.next_id = reader.next_id(next_id, self.next_id)
+        capacity = max(len(self.x), self.count)
+        for field in self.FIELDS:
+            values = getattr(self, field)
+            if len(values) < capacity:
+                values = numpy.resize(values, capacity)
+                setattr(self, field, values)
+            values[:self.count] = numpy.frombuffer(reader.bytes(), dtype=values.dtype)
+
+class ChaserView(enemies.Chaser):
+    """ A chaser that reads and writes its position in the enemy arrays. Only valid until an enemy
+    is removed from the arrays. """
+
+    __slots__ = ("arrays",)
+
+    def __init__(self, arrays, index):
+        self.sprite = arrays.sprite
+        self.arrays = arrays
+        self.index = index
+        self.distance = 0
+
+    @property
+    def x(self):
+        return self.arrays.x[self.index]
+
+    @x.setter
+    def x(self, value):
+        self.arrays.x[self.index] = value
+
+    @property
+    def y(self):
+        return self.arrays.y[self.index]
+
+    @y.setter
+    def y(self, value):
+        self.arrays.y[self.index] = value
+
+    @property
+    def previous_x(self):
+        return self.arrays.previous_x[self.index]
+
+    @property
+    def previous_y(self):
+        return self.arrays.previous_y[self.index]
+
+    @property
+    def random_direction(self):
+        return self.arrays.random_direction[self.index]
+
+    @property
+    def reroll_tick(self):
+        return self.arrays.reroll_tick[self.index]
+
+    @property
+    def id(self):
+        return self.arrays.id[self.index]
+
+class ArrayEnemyHandler(enemies.EnemyHandler):
+    """ Enemy handler for large swarms. Chase angles, random directions, movement, border checks,
+    overlap and player collisions are calculated for every enemy at once.
+
+    Unlike the object handler, every enemy moves at the same time, so an enemy only backs off
+    from where the other enemies have moved to this update rather than in closest first order. """
+
+    def __init__(self, sprites, rng=None, scheduler_obj=None, pathfinding=ENEMY_PATHFINDING, map_obj=None,
+                 shooting=ENEMY_SHOOTING):
+        super().__init__(sprites, rng, scheduler_obj, pathfinding, map_obj, shooting)
+
+        self.enemies = EnemyArrays(sprites[0])
+        self.grid = None
+        self.proximity = None
+        self.filled = set()
+
+        # Seeded from the handler's generator so one seed repeats both spawning and chasing.
+        self.array_rng = numpy.random.default_rng(self.rng.getrandbits(64))
+
+    def add_enemy(self, x_position, y_position):
+        """ Add an enemy at the position to the enemy arrays and block its cell from spawning. """
+
+        self.enemies.append(x_position, y_position)
+
+        cell = (int(x_position // ENEMY_SIZE), int(y_position // ENEMY_SIZE))
+        if cell not in self.filled:
+            self.filled.add(cell)
+            self.sampler.cell_filled(cell)
+
+    def kill(self, enemy, angle):
+        """ Replace the enemy with a dead enemy knocked back in the direction of the angle. """
+
+        self.add_dead_enemy(enemy.x, enemy.y, angle)
+        self.enemies.remove(enemy)
+
+    def shoot_enemies(self, player_obj, hits):
+        """ Kill the enemies that were hit starting from the end of the arrays, so removing one enemy
+        never moves another enemy that still has to be killed. """
+
+        super().shoot_enemies(player_obj, sorted(hits, key=lambda hit: hit[0].index, reverse=True))
+
+    def enemies_in(self, left, top, right, bottom):
+        """ Return views of the enemies which overlap the rectangle, found for every enemy at once. """
+
+        count = self.enemies.count
+        x = self.enemies.x[:count]
+        y = self.enemies.y[:count]
+        inside = numpy.flatnonzero((x + ENEMY_SIZE > left) & (x < right) & (y + ENEMY_SIZE > top) & (y < bottom))
+        return [ChaserView(self.enemies, index) for index in inside.tolist()]
+
+    def centers_in(self, left, top, right, bottom):
+        """ Return arrays of the x and y of the centers of the enemies overlapping the rectangle. """
+
+        count = self.enemies.count
+        x = self.enemies.x[:count]
+        y = self.enemies.y[:count]
+        inside = (x + ENEMY_SIZE > left) & (x < right) & (y + ENEMY_SIZE > top) & (y < bottom)
+        return x[inside] + (ENEMY_SIZE / 2), y[inside] + (ENEMY_SIZE / 2)
+
+    def ids_in(self, left, top, right, bottom, limit=None):
+        """ Return lists of the ids, x and y of the enemies overlapping the rectangle, found for every enemy at once.
+        If there are more than the limit, only the limit closest to the center of the rectangle are returned. """
+
+        count = self.enemies.count
+        x = self.enemies.x[:count]
+        y = self.enemies.y[:count]
+        inside = numpy.flatnonzero((x + ENEMY_SIZE > left) & (x < right) & (y + ENEMY_SIZE > top) & (y < bottom))
+        if limit is not None and len(inside) > limit:
+            distance = ((x[inside] + (ENEMY_SIZE / 2) - (left + right) / 2) ** 2 +
+                        (y[inside] + (ENEMY_SIZE / 2) - (top + bottom) / 2) ** 2)
+            inside = inside[numpy.argpartition(distance, limit - 1)[:limit]]
+        return self.enemies.id[inside].tolist(), x[inside].tolist(), y[inside].tolist()
+
+    def proximity_index(self):
+        """ Sort the enemies once to find which enemies the projectiles hit since there is no grid to search. """
+
+        return spatial.SweepIndex(self.enemies)
+
+    def flow_angles(self, x, y):
+        """ Return the flow field's direction from the center of every enemy, NaN where there is none. """
+
+        navigation = self.flow_field.navigation
+        column = numpy.clip(numpy.floor_divide(x + (ENEMY_SIZE / 2) - navigation.left, navigation.cell_size),
+                            0, navigation.columns - 1).astype(numpy.int64)
+        row = numpy.clip(numpy.floor_divide(y + (ENEMY_SIZE / 2) - navigation.top, navigation.cell_size),
+                         0, navigation.rows - 1).astype(numpy.int64)
+        return numpy.frombuffer(self.flow_field.angles)[row * navigation.columns + column]
+
+    def write_positions(self, buffer):
+        """ Add the position and previous position of every enemy to the end of the buffer in one copy. """
+
+        count = self.enemies.count
+        buffer.frombytes(numpy.column_stack((self.enemies.x[:count], self.enemies.y[:count],
+                                             self.enemies.previous_x[:count], self.enemies.previous_y[:count])).tobytes())
+
+    def clear(self):
+        """ Remove every enemy, dead enemy and enemy projectile. """
+
+        self.enemies.clear()
+        self.clear_dead_enemies()
+        self.clear_bullets()
+        self.filled = set()
+        self.sampler.reset()
+
+    def reseed(self):
+        """ Seed the NumPy generator from the shared generator again. """
+
+        self.array_rng = numpy.random.default_rng(self.rng.getrandbits(64))
+
+    def capture_enemies(self, writer):
+        """ Add the enemy arrays and the state of the NumPy generator to a saved state. """
+
+        self.enemies.capture(writer)
+        state = self.array_rng.bit_generator.state
+        writer.pack(savestate.ARRAY_RANDOM, state["state"]["state"].to_bytes(16, "little"),
+                    state["state"]["inc"].to_bytes(16, "little"), bool(state["has_uint32"]), state["uinteger"])
+
+    def restore_enemies(self, reader):
+        """ Read the enemy arrays and the state of the NumPy generator back from a saved state. The free
+        cells are rebuilt from the arrays before they are next needed, when spawning. """
+
+        self.enemies.restore(reader)
+        state, increment, has_uint32, uinteger = reader.unpack(savestate.ARRAY_RANDOM)
+        self.array_rng.bit_generator.state = {
+            "bit_generator": self.array_rng.bit_generator.state["bit_generator"],
+            "state": {"state": int.from_bytes(state, "little"), "inc": int.from_bytes(increment, "little")},
+            "has_uint32": int(has_uint32),
+            "uinteger": uinteger,
+        }
+        self.filled = set()
+
+    def spawn(self, player_obj):
+        """ Rebuild the free cells from the enemy arrays before spawning since the arrays have no grid
+        to keep them up to date. """
+
+        if self.spawn_timer == 0:
+            count = self.enemies.count
+            cell_x = numpy.floor_divide(self.enemies.x[:count], ENEMY_SIZE).astype(numpy.int64)
+            cell_y = numpy.floor_divide(self.enemies.y[:count], ENEMY_SIZE).astype(numpy.int64)
+
+            self.sampler.reset()
+            self.filled = set(zip(cell_x.tolist(), cell_y.tolist()))
+            for cell in self.filled:
+                self.sampler.cell_filled(cell)
+
+        return super().spawn(player_obj)
+
+    def update(self, player_obj):
+        """ Move every enemy towards the player and check for overlap and collisions with the player. """
+
+        count = self.enemies.count
+        x = self.enemies.x[:count]
+        y = self.enemies.y[:count]
+        random_direction = self.enemies.random_direction[:count]
+        reroll_tick = self.enemies.reroll_tick[:count]
+        tick = self.scheduler.tick
+
+        if count:
+            # Remember where the enemies were for drawing in between updates.
+            self.enemies.previous_x[:count] = x
+            self.enemies.previous_y[:count] = y
+
+            # Get the angle between the player and every enemy and pick new random directions
+            # for the enemies that have finished going in their last one.
+            angle = numpy.arctan2(player_obj.y - y - (PLAYER_SIZE / 2), player_obj.x - x - (PLAYER_SIZE / 2))
+
+            # Follow the flow field from the center of every enemy where it has a direction.
+            if self.flow_field is not None:
+                self.flow_field.update(player_obj.x, player_obj.y)
+                flow = self.flow_angles(x, y)
+                angle = numpy.where(numpy.isnan(flow), angle, flow)
+            refresh = reroll_tick <= tick
+            random_direction[refresh] = self.array_rng.uniform(-math.pi / 3, math.pi / 3, numpy.count_nonzero(refresh))
+            reroll_tick[refresh] = tick + ENEMY_RANDOM_DIRECTION_TIME
+            angle += random_direction
+
+            x_change = ENEMY_SPEED * numpy.cos(angle)
+            y_change = ENEMY_SPEED * numpy.sin(angle)
+            new_x = x + x_change
+            new_y = y + y_change
+
+            # Undo the x or y change for enemies that left the bounds of the map.
+            outside = (new_x < self.map.left) | (new_x > self.map.right - ENEMY_SIZE)
+            new_x[outside] -= x_change[outside]
+            outside = (new_y < self.map.top) | (new_y > self.map.bottom - ENEMY_SIZE)
+            new_y[outside] -= y_change[outside]
+
+            # Undo the whole change for enemies that moved into another enemy.
+            overlap = find_overlap(new_x, new_y)
+            new_x[overlap] -= x_change[overlap]
+            new_y[overlap] -= y_change[overlap]
+
+            x[:] = new_x
+            y[:] = new_y
+
+            # Damage the player once if any enemy comes in contact with them.
+            if player_obj.invincibility == 0:
+                if corners_inside(player_obj.x - (PLAYER_SIZE / 2), player_obj.y - (PLAYER_SIZE / 2),
+                                  x, y, ENEMY_SIZE, PLAYER_SIZE).any():
+                    player_obj.health -= ENEMY_DAMAGE
+                    player_obj.invincibility = PLAYER_INVINCIBILITY
+
+def corners_inside(box_x, box_y, x, y, size, box_size):
+    """ Return which squares of the size at the x and y arrays have a corner strictly inside of
+    the box. """
+
+    inside_x = (((x > box_x) & (x < box_x + box_size)) |
+                ((x + size > box_x) & (x + size < box_x + box_size)))
+    inside_y = (((y > box_y) & (y < box_y + box_size)) |
+                ((y + size > box_y) & (y + size < box_y + box_size)))
+    return inside_x & inside_y
+
+def find_overlap(x, y):
+    """ Return which enemies have a corner inside of another enemy. Enemies are sorted into
+    ENEMY_SIZE cells so every enemy is only compared with the enemies in the neighbouring cells. """
+
+    count = len(x)
+    cell_x = numpy.floor_divide(x, ENEMY_SIZE).astype(numpy.int64)
+    cell_y = numpy.floor_divide(y, ENEMY_SIZE).astype(numpy.int64)
+
+    # Combine the cell coordinates into a single sortable key.
+    offset_y = cell_y.min() - 1
+    height = cell_y.max() - offset_y + 2
+    keys = cell_x * height + (cell_y - offset_y)
+    order = numpy.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    indices = numpy.arange(count)
+    overlap = numpy.zeros(count, dtype=bool)
+    for cell_x_change in (-1, 0, 1):
+        for cell_y_change in (-1, 0, 1):
+            neighbour_keys = keys + cell_x_change * height + cell_y_change
+            first = numpy.searchsorted(sorted_keys, neighbour_keys, side="left")
+            last = numpy.searchsorted(sorted_keys, neighbour_keys, side="right")
+
+            # Compare every enemy with the nth enemy in the neighbouring cell until the fullest cell is done.
+            for nth in range(int((last - first).max())):
+                valid = first + nth < last
+                other = order[numpy.minimum(first + nth, count - 1)]
+                valid &= other != indices
+                overlap |= valid & corners_inside(x[other], y[other], x, y, ENEMY_SIZE, ENEMY_SIZE)
+
+    return overlap
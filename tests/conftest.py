@@ -0,0 +1,7 @@
+""" Lets the tests import the game's modules and draw without a window. """
+
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
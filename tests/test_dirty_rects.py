@@ -0,0 +1,50 @@
+""" Checks that updating only the dirty rects shows the same picture as updating the whole screen. """
+
+import pygame
+
+from config import *
+import camera
+import display
+import hud
+import render
+import world
+
+def test_dirty_rects_match_full_redraw(monkeypatch):
+    """ Copy only the areas the dirty rects update into a front buffer while enemies move around a still
+    player, then compare the front buffer with the whole screen drawn for the last frame. """
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    assets = display.load_assets()
+    tiles = display.create_map(assets)
+    world_obj = world.World(assets, seed=2, map_obj=tiles.map)
+    for tick in range(300):
+        world_obj.step()
+
+    # Stands in for the window: the screen is copied into it wherever pygame would update the display.
+    front = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
+    updated = []
+
+    def update(rects=None):
+        if rects is None:
+            rects = [screen.get_rect()]
+        for rect in rects:
+            front.blit(screen, rect, rect)
+        updated.append(sum(rect.width * rect.height for rect in rects))
+
+    monkeypatch.setattr(pygame.display, "update", update)
+
+    dirty_rects = display.DirtyRects()
+    camera_obj = camera.Camera()
+    render_queue = render.RenderQueue()
+    hud_obj = hud.Hud(pygame.font.Font(None, 30))
+    for frame in range(20):
+        world_obj.step()
+        display.draw_screen(screen, world_obj.player, world_obj.enemy_handler, tiles, hud_obj, dirty_rects,
+                            camera_obj=camera_obj, render_queue=render_queue)
+
+    assert len(world_obj.enemy_handler.enemies) > 0
+    assert pygame.image.tostring(front, "RGB") == pygame.image.tostring(screen, "RGB")
+
+    # Only the first frame, before the camera has a position, updates the whole screen.
+    assert max(updated[1:]) < SCREEN_SIZE * SCREEN_SIZE / 2
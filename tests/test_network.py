@@ -0,0 +1,113 @@
+""" Checks the snapshot delta codec and that clients on the same machine rebuild exactly the frames the
+server sent them, even when datagrams are lost. """
+
+import random
+
+import pygame
+
+from config import *
+import client
+import controls
+import network
+import server
+import world
+
+def frame(sequence, enemies):
+    """ Return a frame holding only the enemies, a dictionary from id to position in steps. """
+
+    return network.Frame(sequence, things=(dict(enemies), dict(), dict(), dict()))
+
+def counts(data):
+    """ Return how many enemies the snapshot message added, moved and removed. """
+
+    return network.SNAPSHOT_HEADER.unpack_from(data)[12:15]
+
+def test_full_snapshot_without_baseline():
+    sent = frame(1, {1: (10, 20), 2: (-5, 7)})
+    data = network.encode_snapshot(sent)
+
+    assert counts(data) == (2, 0, 0)
+    assert network.decode_snapshot(data, dict()).things == sent.things
+
+def test_small_moves_are_sent_as_changes():
+    baseline = frame(1, {1: (10, 20)})
+    sent = frame(2, {1: (10 + 127, 20 - 128)})
+    data = network.encode_snapshot(sent, baseline)
+
+    assert counts(data) == (0, 1, 0)
+    assert network.decode_snapshot(data, {1: baseline}).things == sent.things
+
+def test_large_moves_are_sent_in_full():
+    baseline = frame(1, {1: (10, 20), 2: (0, 0)})
+    sent = frame(2, {1: (10 + 128, 20), 2: (0, -129)})
+    data = network.encode_snapshot(sent, baseline)
+
+    assert counts(data) == (2, 0, 0)
+    assert network.decode_snapshot(data, {1: baseline}).things == sent.things
+
+def test_removed_things_are_gone():
+    baseline = frame(1, {1: (10, 20), 2: (30, 40)})
+    sent = frame(2, {2: (30, 40)})
+    data = network.encode_snapshot(sent, baseline)
+
+    assert counts(data) == (0, 0, 1)
+    assert network.decode_snapshot(data, {1: baseline}).things == sent.things
+
+def test_missing_baseline_is_dropped():
+    baseline = frame(1, {1: (10, 20)})
+    data = network.encode_snapshot(frame(2, {1: (11, 20)}), baseline)
+
+    assert network.decode_snapshot(data, dict()) is None
+    assert network.decode_snapshot(data, {3: frame(3, {})}) is None
+
+def test_loopback_clients_match_sent_frames():
+    """ Run a server with three clients for 600 ticks. One client controls the player, one watches while
+    moving its view and one loses a third of the datagrams sent to it. Every frame a client holds has to
+    match the frame the server sent it. """
+
+    pygame.init()
+    world_obj = world.World(seed=3, controls_obj=controls.RemoteControls(), shooting=True)
+    world_obj.enemy_handler.max_enemies = 100
+    server_obj = server.GameServer(world_obj, ("127.0.0.1", 0))
+    clients = [client.GameClient(server_obj.address) for index in range(3)]
+    rng = random.Random(1)
+    checked = 0
+
+    try:
+        for tick in range(600):
+            keys, clicks, position = controls.patrol_script(tick)
+            for index, client_obj in enumerate(clients):
+                if index == 1:
+                    keys = [pygame.K_d] if (tick // 200) % 2 else [pygame.K_s]
+                client_obj.send_input(controls.PressedKeys(keys), clicks, position)
+
+            server_obj.step()
+
+            for index, client_obj in enumerate(clients):
+                # Throw away what arrived for the last client a third of the time, like a lossy connection.
+                if index == 2 and rng.random() < 0.33:
+                    try:
+                        while True:
+                            client_obj.socket.recv(65536)
+                    except BlockingIOError:
+                        pass
+                    continue
+                client_obj.receive()
+
+            for client_obj in clients:
+                if client_obj.newest is None:
+                    continue
+                remote = next(remote for remote in server_obj.clients.values() if remote.id == client_obj.id)
+                sent = remote.frames[client_obj.newest.sequence]
+                assert client_obj.newest.things == sent.things
+                assert ((client_obj.newest.player_x, client_obj.newest.player_y, client_obj.newest.health) ==
+                        (sent.player_x, sent.player_y, sent.health))
+                checked += 1
+    finally:
+        for client_obj in clients:
+            client_obj.close()
+        server_obj.close()
+
+    # Every client kept up, including the one losing datagrams.
+    assert checked > 3 * 600 * 0.9
+    assert all(client_obj.newest.sequence > 200 for client_obj in clients)
@@ -0,0 +1,67 @@
+""" Checks the proximity index's queries against measuring the distance to every object. """
+
+import random
+
+import spatial
+
+class Point:
+    """ Just enough of an enemy for the grid and the proximity index. """
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.cell = None
+        self.distance = 0
+
+def build(rng, count, cell_size=25):
+    """ Return a proximity index over count points scattered around the origin, some sharing cells. """
+
+    grid = spatial.SpatialGrid(cell_size)
+    proximity = spatial.ProximityIndex(grid)
+    points = [Point(rng.uniform(-500, 500), rng.uniform(-500, 500)) for index in range(count)]
+    for point in points:
+        grid.insert(point)
+        proximity.add(point)
+    return proximity, points
+
+def squared_distance(point, x, y):
+    return (point.x - x) ** 2 + (point.y - y) ** 2
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(1)
+    proximity, points = build(rng, 300)
+
+    for query in range(200):
+        x = rng.uniform(-700, 700)
+        y = rng.uniform(-700, 700)
+        count = rng.choice((0, 1, 5, 20, 300, 400))
+
+        found = proximity.nearest(x, y, count)
+        expected = sorted(squared_distance(point, x, y) for point in points)[:count]
+        assert [squared_distance(point, x, y) for point in found] == expected
+        assert len(set(map(id, found))) == len(found)
+
+def test_within_matches_brute_force():
+    rng = random.Random(2)
+    proximity, points = build(rng, 300)
+
+    for query in range(200):
+        x = rng.uniform(-700, 700)
+        y = rng.uniform(-700, 700)
+        radius = rng.uniform(0, 300)
+
+        found = proximity.within(x, y, radius)
+        expected = [point for point in points if squared_distance(point, x, y) <= radius ** 2]
+        assert sorted(map(id, found)) == sorted(map(id, expected))
+
+def test_removed_points_are_not_found():
+    rng = random.Random(3)
+    proximity, points = build(rng, 100)
+    for point in points[:50]:
+        proximity.grid.remove(point)
+        proximity.remove(point)
+
+    found = proximity.nearest(0, 0, 100)
+    assert len(found) == 50
+    assert all(point in points[50:] for point in found)
+    assert all(point in points[50:] for point in proximity.within(0, 0, 1000))
@@ -0,0 +1,78 @@
+""" Maps stored as a grid of tile indices in a compact binary file which is memory mapped, so only
+the parts of a large map that are read take up memory. """
+
+import mmap
+import struct
+
+from config import *
+
+# Every map file starts with the magic bytes, the format version, the size of the tiles, the number of
+# columns and rows of tiles, the world position of the first tile and the left, top, right and bottom
+# of the area the player and enemies can move in. One byte for every tile follows, row by row.
+MAGIC = b"TMAP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIiiiiii")
+
+# Assets drawn for each tile index. Index 0 is empty and isn't drawn.
+TILES = (None, "floor_tile", "wall_tile1", "wall_tile2", "wall_tile3", "wall_tile4", "wall_tile5", "wall_tile6")
+
+# Tile indices enemies can walk on.
+WALKABLE = frozenset([TILES.index("floor_tile")])
+
+class MapFile:
+    """ A map file opened for reading. The tiles are read straight from the memory mapped file
+    whenever they are needed instead of being loaded all at once. """
+
+    def __init__(self, path=MAP_FILE):
+        self.path = path
+
+        with open(path, "rb") as map_file:
+            self.data = mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            raise ValueError("{} is too short to be a map file".format(path))
+
+        (magic, version, self.tile_size, self.columns, self.rows, self.origin_x, self.origin_y,
+         self.left, self.top, self.right, self.bottom) = HEADER.unpack_from(self.data)
+
+        if magic != MAGIC:
+            raise ValueError("{} is not a map file".format(path))
+        if version != VERSION:
+            raise ValueError("{} is version {} of the map format, expected {}".format(path, version, VERSION))
+        if len(self.data) != HEADER.size + self.columns * self.rows:
+            raise ValueError("{} should hold {} by {} tiles".format(path, self.columns, self.rows))
+
+    def row(self, row, first_column, last_column):
+        """ Return the tile indices of the row from the first column up to but not including the last
+        column, leaving out any columns outside of the map. """
+
+        if not 0 <= row < self.rows:
+            return b""
+
+        start = HEADER.size + row * self.columns
+        return self.data[start + max(first_column, 0):start + min(last_column, self.columns)]
+
+    def tiles(self):
+        """ Yield the world position and index of every tile that isn't empty, row by row. """
+
+        for row in range(self.rows):
+            for column, index in enumerate(self.row(row, 0, self.columns)):
+                if index:
+                    yield self.origin_x + column * self.tile_size, self.origin_y + row * self.tile_size, index
+
+    def close(self):
+        """ Unmap the file. Tiles can't be read after this. """
+
+        self.data.close()
+
+def save(path, tiles, columns, rows, origin_x, origin_y, left, top, right, bottom, tile_size=TILE_SIZE):
+    """ Write a map file from the tile indices given row by row. """
+
+    tiles = bytes(tiles)
+    if len(tiles) != columns * rows:
+        raise ValueError("Expected {} by {} tiles, got {}".format(columns, rows, len(tiles)))
+
+    with open(path, "wb") as map_file:
+        map_file.write(HEADER.pack(MAGIC, VERSION, tile_size, columns, rows, origin_x, origin_y,
+                                   left, top, right, bottom))
+        map_file.write(tiles)
@@ -0,0 +1,134 @@
+""" Holds everything the simulation needs and advances it one tick at a time. """
+
+import array
+import random
+
+from config import *
+import enemies
+import player
+import profiler
+import projectile
+import savestate
+import scheduler
+import tilemap
+
+class World:
+    """ The player, the enemies and the random number generator they share. Giving the same seed
+    and the same input gives the same run. Assets are optional so a world can be simulated
+    without a display. The map file is opened from MAP_FILE if one isn't given.
+
+    The whole state can be captured as bytes and restored later, and resetting restores the state the
+    world started in. """
+
+    def __init__(self, assets=None, seed=None, controls_obj=None, backend=ENEMY_BACKEND, map_obj=None,
+                 pathfinding=ENEMY_PATHFINDING, shooting=ENEMY_SHOOTING):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.ticks = 0
+
+        # Borders of the world and where enemies can walk.
+        self.map = map_obj if map_obj is not None else tilemap.MapFile()
+
+        # Runs timed events like removing dead enemies and tells timers what tick it is.
+        self.scheduler = scheduler.Scheduler()
+
+        # Times each phase of a step when profiling is turned on.
+        self.profiler = profiler.NULL_PROFILER
+
+        if assets is None:
+            assets = dict.fromkeys(["player", "player_hit", "player_projectile", "gun", "chaser", "dead_enemy",
+                                    "shooter_projectile"])
+
+        # Create the player
+        self.player = player.Player([assets["player"], assets["player_hit"], assets["player_projectile"], assets["gun"]],
+            (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2), (SCREEN_SIZE / 2) - (PLAYER_SIZE / 2),
+            controls_obj, self.scheduler, self.map)
+
+        # Create the enemy handler
+        self.enemy_handler = enemies.create_enemy_handler(
+            [assets["chaser"], assets["dead_enemy"], assets["shooter_projectile"]], backend, self.rng,
+            self.scheduler, pathfinding, self.map, shooting)
+        self.backend = backend
+        self.shooting = shooting
+
+        # State to go back to when resetting.
+        self.initial = self.capture()
+
+    def step(self):
+        """ Advance the simulation by one tick. """
+
+        # Run the events due this tick
+        self.scheduler.advance()
+        self.profiler.mark("timers")
+
+        # Player movement and shooting
+        self.player.controls.poll()
+        self.player.movement()
+        self.player.mouse()
+        self.profiler.mark("input")
+
+        # Enemy spawning and movement behaviour
+        self.enemy_handler.spawn(self.player)
+        self.profiler.mark("spawn")
+        self.enemy_handler.update(self.player)
+        self.profiler.mark("enemies")
+
+        # Projectile movement and collision checking
+        projectile.move_projectiles(self.player)
+        self.profiler.mark("projectiles")
+        projectile.check_collisions(self.player, self.enemy_handler)
+        self.profiler.mark("collisions")
+
+        # Enemy projectile shooting, movement and hitting the player
+        self.enemy_handler.update_bullets(self.player)
+        self.profiler.mark("bullets")
+
+        self.ticks += 1
+
+    def capture(self):
+        """ Return the whole state of the world packed into bytes. """
+
+        writer = savestate.StateWriter()
+        writer.pack(savestate.HEADER, savestate.MAGIC, savestate.VERSION, savestate.BACKENDS.index(self.backend),
+                    self.shooting)
+
+        version, state, gauss = self.rng.getstate()
+        writer.pack(savestate.WORLD, self.ticks, self.scheduler.tick, gauss is not None, gauss or 0.0)
+        writer.array(array.array("I", state))
+
+        self.player.capture(writer)
+        self.enemy_handler.capture(writer)
+        return writer.getvalue()
+
+    def restore(self, data, keep_ids=False):
+        """ Put the world back in the state captured in the bytes. The state has to come from a world
+        with the same backend and with enemies shooting or not the same way. The object backend restores
+        every enemy one attribute at a time, so rolling back every tick with many enemies needs the array
+        backend. With keep_ids, ids already given out aren't given out again. """
+
+        reader = savestate.StateReader(data, keep_ids)
+        magic, version, backend, shooting = reader.unpack(savestate.HEADER)
+        if magic != savestate.MAGIC or version != savestate.VERSION:
+            raise ValueError("not a saved world state")
+        if savestate.BACKENDS[backend] != self.backend or shooting != self.shooting:
+            raise ValueError("saved world state is for a different backend or shooting setting")
+
+        self.ticks, tick, has_gauss, gauss = reader.unpack(savestate.WORLD)
+        self.rng.setstate((3, tuple(reader.array("I")), gauss if has_gauss else None))
+
+        # Events are scheduled again by whatever restores them.
+        self.scheduler.clear()
+        self.scheduler.tick = tick
+
+        self.player.restore(reader)
+        self.enemy_handler.restore(reader)
+
+    def reset(self):
+        """ Put the world back in the state it started in. A world with a seed plays the same game
+        again, and a world without one reseeds its random number generators so every game is different.
+        Ids keep counting up so clients never mistake a new enemy for one from the last game. """
+
+        self.restore(self.initial, keep_ids=True)
+        if self.seed is None:
+            self.rng.seed()
+            self.enemy_handler.reseed()